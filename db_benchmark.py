@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Dashboard query benchmark on a synthetic database.
+
+    python db_benchmark.py                          # 1M transactions
+    python db_benchmark.py --transactions 200000 --users 500 --runs 100
+
+Builds a throwaway SQLite database through the app's own models, fills it
+with synthetic users, companies, positions and transactions, then times the
+queries behind /dashboard and the trade routes twice: with the model indexes
+and again after dropping them, which is how databases created before those
+indexes behaved.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Indexes added for the hot queries; dropped for the "before" run
+BENCHMARK_INDEXES = [
+    'ix_transaction_user_created',
+    'ix_transaction_created_at',
+    'uq_portfolio_item_user_company',
+    'ix_dividend_portfolio_item',
+]
+
+
+def populate(db, models, args):
+    User, Company, PortfolioItem, Transaction = models
+    rng = random.Random(args.seed)
+    started = time.monotonic()
+
+    db.session.execute(User.__table__.insert(), [
+        {'id': i, 'email': f'user{i}@example.com', 'username': f'user{i}', 'password_hash': 'x',
+         'role': 'user', 'wallet_balance': 100000, 'is_active': True}
+        for i in range(1, args.users + 1)
+    ])
+    db.session.execute(Company.__table__.insert(), [
+        {'id': i, 'symbol': f'SYM{i:04d}', 'name': f'Company {i}', 'is_active': True}
+        for i in range(1, args.companies + 1)
+    ])
+    positions = []
+    for user_id in range(1, args.users + 1):
+        for company_id in rng.sample(range(1, args.companies + 1), min(10, args.companies)):
+            positions.append({'user_id': user_id, 'company_id': company_id,
+                              'quantity': rng.randint(0, 500), 'average_buy_price': rng.uniform(5, 500)})
+    db.session.execute(PortfolioItem.__table__.insert(), positions)
+
+    start = datetime.now() - timedelta(days=730)
+    txn_types = ['BUY', 'BUY', 'SELL', 'DIVIDEND']
+    chunk = 50000
+    for offset in range(0, args.transactions, chunk):
+        rows = []
+        for _ in range(min(chunk, args.transactions - offset)):
+            quantity = rng.randint(1, 100)
+            price = rng.uniform(5, 500)
+            rows.append({
+                'user_id': rng.randint(1, args.users), 'company_id': rng.randint(1, args.companies),
+                'txn_type': rng.choice(txn_types), 'quantity': quantity, 'price': price,
+                'total_amount': quantity * price, 'commission_amount': quantity * price * 0.005,
+                'created_at': start + timedelta(seconds=rng.randint(0, 730 * 86400)),
+                'description': 'Synthetic',
+            })
+        db.session.execute(Transaction.__table__.insert(), rows)
+        db.session.commit()
+    print(f"  inserted {args.transactions:,} transactions in {time.monotonic() - started:.1f}s")
+
+
+def time_queries(db, models, args):
+    from sqlalchemy import text
+    User, Company, PortfolioItem, Transaction = models
+    rng = random.Random(args.seed + 1)
+    queries = {
+        'holdings': lambda u, c, s: PortfolioItem.query.filter_by(user_id=u).filter(PortfolioItem.quantity > 0).all(),
+        'recent_transactions': lambda u, c, s: Transaction.query.filter_by(user_id=u)
+            .order_by(Transaction.created_at.desc()).limit(20).all(),
+        'all_user_transactions': lambda u, c, s: Transaction.query.filter_by(user_id=u).all(),
+        'company_by_symbol': lambda u, c, s: Company.query.filter_by(symbol=s).first(),
+        'position_lookup': lambda u, c, s: PortfolioItem.query.filter_by(user_id=u, company_id=c).first(),
+        'admin_recent': lambda u, c, s: Transaction.query.order_by(Transaction.created_at.desc()).limit(25).all(),
+    }
+    results = {}
+    for name, query in queries.items():
+        # Untimed first call so both runs start with warm page caches
+        query(1, 1, 'SYM0001')
+        samples = []
+        for _ in range(args.runs):
+            user_id = rng.randint(1, args.users)
+            company_id = rng.randint(1, args.companies)
+            started = time.perf_counter()
+            query(user_id, company_id, f'SYM{company_id:04d}')
+            samples.append((time.perf_counter() - started) * 1000)
+            db.session.expunge_all()
+        samples.sort()
+        results[name] = (statistics.median(samples), samples[int(0.95 * (len(samples) - 1))])
+    plan = db.session.execute(text(
+        'EXPLAIN QUERY PLAN SELECT * FROM "transaction" WHERE user_id = 1 ORDER BY created_at DESC LIMIT 20'
+    )).fetchall()
+    results['_plan'] = '; '.join(row[-1] for row in plan)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark dashboard queries with and without indexes')
+    parser.add_argument('--transactions', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--companies', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=50, help='timed executions per query')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db', help='SQLite file to build (default: a temporary file)')
+    args = parser.parse_args(argv)
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix='sams-bench-'), 'bench.db')
+    if os.path.exists(path):
+        os.remove(path)
+    # main builds its engine from DATABASE_URL at import
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(path)}'
+    from sqlalchemy import text
+    from main import app, db, User, Company, PortfolioItem, Transaction
+    models = (User, Company, PortfolioItem, Transaction)
+
+    print(f"Building {path}")
+    with app.app_context():
+        populate(db, models, args)
+        db.session.execute(text('ANALYZE'))
+        with_indexes = time_queries(db, models, args)
+
+        for name in BENCHMARK_INDEXES:
+            db.session.execute(text(f'DROP INDEX IF EXISTS {name}'))
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        without_indexes = time_queries(db, models, args)
+
+    print()
+    print(f"{'query':<24}{'no index p50':>14}{'p95':>10}{'indexed p50':>14}{'p95':>10}{'speedup':>10}  (ms)")
+    for name in with_indexes:
+        if name.startswith('_'):
+            continue
+        before, after = without_indexes[name], with_indexes[name]
+        speedup = before[0] / after[0] if after[0] else float('inf')
+        print(f"{name:<24}{before[0]:>14.2f}{before[1]:>10.2f}{after[0]:>14.2f}{after[1]:>10.2f}{speedup:>9.1f}x")
+    print()
+    print(f"recent_transactions plan without indexes: {without_indexes['_plan']}")
+    print(f"recent_transactions plan with indexes:    {with_indexes['_plan']}")
+    if not args.db:
+        os.remove(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Database concurrency benchmark for the engine profiles (see db_profiles).
+
+    python db_load_test.py                                  # default vs sqlite, 20s each
+    python db_load_test.py --workers 4 --threads 8 --duration 60
+    python db_load_test.py --profiles postgres --database-url postgresql://localhost/sams_bench
+
+Each profile runs against a fresh database in its own interpreter, because
+main builds its engine at import. Like the gunicorn profile, the app is
+imported once and --workers processes are forked from it, each running
+--threads client threads. A thread registers and logs in a user, tops up
+its wallet, then loops over buy, sell and dashboard until the deadline.
+Quotes come from the replay market-data provider (the stored CSVs, after
+--quote-latency-ms), so no request leaves the machine and runs are
+repeatable. Reports
+operations/sec, latency percentiles per operation, failed requests and
+the "database is locked" errors that run_in_transaction had to retry.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+OPERATIONS = ('register', 'login', 'topup', 'buy', 'sell', 'dashboard')
+
+
+def client_thread(app, worker, index, deadline, results):
+    """One simulated user; appends (operation, seconds, ok) to results"""
+    client = app.test_client()
+    name = f'load{worker}x{index}x{os.getpid()}'
+    token = 'load-test-token'
+    with client.session_transaction() as sess:
+        sess['csrf_token'] = token
+
+    def timed(operation, method, path, **data):
+        started = time.perf_counter()
+        try:
+            response = getattr(client, method)(path, data=dict(data, csrf_token=token))
+            ok = response.status_code < 400
+        except Exception:
+            ok = False
+        results.append((operation, time.perf_counter() - started, ok))
+        return ok
+
+    password = 'LoadTest123!'
+    timed('register', 'post', '/register', email=f'{name}@example.com', username=name,
+          password=password, confirm_password=password)
+    timed('login', 'post', '/login', email=f'{name}@example.com', password=password)
+    with client.session_transaction() as sess:
+        # Login rotates the session; keep the token the forms are posted with
+        sess['csrf_token'] = token
+    timed('topup', 'post', '/funds/topup', amount='100000')
+    symbols = ('AAPL', 'MSFT', 'TSLA')
+    step = 0
+    while time.monotonic() < deadline:
+        symbol = symbols[step % len(symbols)]
+        timed('buy', 'post', '/trade/buy', symbol=symbol, quantity='2')
+        timed('sell', 'post', '/trade/sell', symbol=symbol, quantity='1')
+        timed('dashboard', 'get', '/dashboard')
+        step += 1
+
+
+def worker_process(worker, threads, deadline, queue):
+    import main
+    results = []
+    lock_errors = []
+
+    def count_lock_error(context):
+        # run_in_transaction retries these, so they cost latency rather than failures
+        if 'locked' in str(context.original_exception).lower():
+            lock_errors.append(1)
+
+    with main.app.app_context():
+        # Same as gunicorn.conf.post_fork: never reuse the parent's connections
+        main.db.engine.dispose(close=False)
+        main.db.event.listen(main.db.engine, 'handle_error', count_lock_error)
+    pool = [threading.Thread(target=client_thread, args=(main.app, worker, i, deadline, results))
+            for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    queue.put((results, len(lock_errors)))
+
+
+def run_profile(args):
+    """Child interpreter: benchmark one profile and print its summary as JSON"""
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['DATABASE_PROFILE'] = args.run_profile
+    os.environ['MARKET_DATA_PROVIDER'] = 'replay'
+    os.environ['MARKET_DATA_REPLAY_DIR'] = ROOT
+    os.environ['MARKET_DATA_REPLAY_LATENCY_MS'] = str(args.quote_latency_ms)
+    import main
+    import db_profiles
+    with main.app.app_context():
+        settings = db_profiles.describe(main.db.engine)
+        main.db.engine.dispose()
+
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    deadline = time.monotonic() + args.duration
+    started = time.monotonic()
+    processes = [context.Process(target=worker_process, args=(w, args.threads, deadline, queue))
+                 for w in range(args.workers)]
+    for p in processes:
+        p.start()
+    # A worker that died would leave the queue short; fail instead of waiting forever
+    reports = [queue.get(timeout=args.duration + 300) for _ in processes]
+    results = [row for rows, _ in reports for row in rows]
+    for p in processes:
+        p.join()
+    elapsed = time.monotonic() - started
+
+    summary = {'profile': args.run_profile, 'settings': settings, 'seconds': round(elapsed, 1),
+               'operations': len(results), 'failed': sum(1 for _, _, ok in results if not ok),
+               'lock_errors': sum(count for _, count in reports), 'latency': {}}
+    for operation in OPERATIONS:
+        samples = sorted(seconds * 1000 for op, seconds, _ in results if op == operation)
+        if not samples:
+            continue
+        summary['latency'][operation] = {
+            'count': len(samples),
+            'failed': sum(1 for op, _, ok in results if op == operation and not ok),
+            'p50': statistics.median(samples),
+            'p95': samples[int(0.95 * (len(samples) - 1))],
+            'max': samples[-1],
+        }
+    print(json.dumps(summary))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark register/trade/dashboard per engine profile')
+    parser.add_argument('--profiles', nargs='+', default=['default', 'sqlite'])
+    parser.add_argument('--workers', type=int, default=4, help='forked processes, like gunicorn workers')
+    parser.add_argument('--threads', type=int, default=4, help='client threads per worker')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds of trading per profile')
+    parser.add_argument('--database-url', help='database to use (default: a fresh temporary SQLite file)')
+    parser.add_argument('--quote-latency-ms', type=float, default=0.0, help='simulated market-data latency')
+    parser.add_argument('--run-profile', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_profile:
+        run_profile(args)
+        return 0
+
+    reports = []
+    for profile in args.profiles:
+        database_url = args.database_url
+        if not database_url:
+            path = os.path.join(tempfile.mkdtemp(prefix='sams-load-'), 'load.db')
+            database_url = f'sqlite:///{path}'
+        print(f"Running profile {profile} on {database_url} ...", flush=True)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run-profile', profile, '--database-url', database_url,
+             '--workers', str(args.workers), '--threads', str(args.threads), '--duration', str(args.duration),
+             '--quote-latency-ms', str(args.quote_latency_ms)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        reports.append(json.loads(output.strip().splitlines()[-1]))
+
+    for report in reports:
+        print()
+        ops = report['operations'] / report['seconds']
+        print(f"{report['profile']}: {report['settings']}")
+        print(f"  {report['operations']} requests in {report['seconds']}s ({ops:.0f}/s), {report['failed']} failed, "
+              f"{report['lock_errors']} 'database is locked' errors retried")
+        print(f"  {'operation':<12}{'count':>8}{'failed':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for operation, row in report['latency'].items():
+            print(f"  {operation:<12}{row['count']:>8}{row['failed']:>8}"
+                  f"{row['p50']:>10.1f}{row['p95']:>10.1f}{row['max']:>10.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Database engine profiles.
+
+DATABASE_PROFILE picks how the SQLAlchemy engine is tuned:
+
+    auto      (default) from the DATABASE_URL scheme: sqlite or postgres
+    sqlite    WAL journal, busy timeout and synchronous=NORMAL, so readers
+              never block the writer and concurrent gunicorn workers queue
+              for the write lock instead of failing with "database is locked"
+    postgres  a QueuePool sized to the worker's threads, pre-ping and
+              recycling against dropped connections, and server-side
+              statement and lock timeouts
+    default   SQLAlchemy's own defaults, the behaviour before profiles
+
+Every knob can be overridden with the environment variable named next to it.
+main.py passes engine_options() to Flask-SQLAlchemy and install() adds the
+per-connection settings to the engine it builds.
+"""
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+PROFILES = ('auto', 'sqlite', 'postgres', 'default')
+
+# SQLite: how long a writer waits for the lock before "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '15000'))
+# NORMAL is durable in WAL mode except for the last commits on power loss
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+
+# Postgres: one pooled connection per gunicorn thread, a few spare for bursts
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', os.environ.get('GUNICORN_THREADS', '8')))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '4'))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', '10'))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', '30000'))
+DB_LOCK_TIMEOUT_MS = int(os.environ.get('DB_LOCK_TIMEOUT_MS', '10000'))
+
+
+def resolve_profile(uri, profile=None):
+    """The concrete profile for a database URI; ValueError if unknown"""
+    profile = (profile or os.environ.get('DATABASE_PROFILE', 'auto')).lower()
+    if profile not in PROFILES:
+        raise ValueError(f"DATABASE_PROFILE must be one of {', '.join(PROFILES)}, not {profile!r}")
+    if profile != 'auto':
+        return profile
+    backend = make_url(uri).get_backend_name()
+    if backend == 'sqlite':
+        return 'sqlite'
+    if backend == 'postgresql':
+        return 'postgres'
+    return 'default'
+
+
+def engine_options(uri, profile=None):
+    """SQLALCHEMY_ENGINE_OPTIONS for the profile"""
+    profile = resolve_profile(uri, profile)
+    if profile == 'sqlite':
+        # Python-side wait as well, for the connect itself
+        return {'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    if profile == 'postgres':
+        return {
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_timeout': DB_POOL_TIMEOUT,
+            'pool_recycle': DB_POOL_RECYCLE,
+            'pool_pre_ping': True,
+            'connect_args': {
+                'application_name': 'sams',
+                'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS} -c lock_timeout={DB_LOCK_TIMEOUT_MS}',
+            },
+        }
+    return {}
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        # journal_mode is stored in the file; in-memory databases answer 'memory'
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        cursor.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+    finally:
+        cursor.close()
+
+
+def install(engine, profile=None):
+    """Add the profile's per-connection settings to engine; returns the profile"""
+    profile = resolve_profile(str(engine.url), profile)
+    if profile == 'sqlite' and not event.contains(engine, 'connect', _sqlite_pragmas):
+        event.listen(engine, 'connect', _sqlite_pragmas)
+    return profile
+
+
+def describe(engine):
+    """Settings in effect on a live connection, for logs and the benchmark"""
+    with engine.connect() as connection:
+        if engine.dialect.name == 'sqlite':
+            return {name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+                    for name in ('journal_mode', 'busy_timeout', 'synchronous')}
+        if engine.dialect.name == 'postgresql':
+            return {name: connection.exec_driver_sql(f'SHOW {name}').scalar()
+                    for name in ('statement_timeout', 'lock_timeout')}
+    return {}
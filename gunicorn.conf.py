@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Gunicorn production profile.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The master preloads the app and warms models, lexicons and price history
+(wsgi.preload) before forking. gc.freeze() then moves those objects out of
+the collector's reach so workers do not dirty the shared pages just by
+running a GC cycle. Workers use threads because the heavy routes (/predict,
+trades, dashboard quotes) mostly wait on yfinance and news providers.
+
+Every setting below can be overridden with the environment variable shown
+or on the gunicorn command line.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+preload_app = True
+
+# Threads absorb the I/O waits, so one process per core (+1) is enough;
+# each extra process costs memory that is not shared.
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
+
+# /predict downloads history, trains and fetches news in one request
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers to bound slow leaks; new workers fork from the warm master
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = 100
+
+# Heartbeat files on tmpfs so a slow disk cannot make workers look hung
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before any worker forks
+    import wsgi
+    summary = wsgi.preload()
+    server.log.info("Preloaded %d price histories in %.2fs",
+                    len(summary['price_history']), summary['seconds'])
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Never share database connections opened in the master with a worker
+    from main import app, db, price_prewarmer
+    with app.app_context():
+        db.engine.dispose(close=False)
+    # Threads do not survive fork, so the scheduler starts here; the workers
+    # share a file lock and only its holder refreshes (see price_scheduler)
+    if os.environ.get('PREWARM_ENABLED', '1') != '0':
+        price_prewarmer.start()
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Optional Investing.com scraper plugin.
+
+Selenium and webdriver_manager are imported only when a browser is actually
+launched, so importing news_sentiment (and this module) stays cheap for web
+workers. Headless Chrome instances are kept in a small DriverPool and reused
+across get_news_links calls instead of being launched per call.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from bs4 import BeautifulSoup
+
+import rate_limiter
+
+# Chrome processes kept alive for reuse; each holds a few hundred MB
+DEFAULT_POOL_SIZE = int(os.environ.get('SELENIUM_POOL_SIZE', '2'))
+
+CHROME_ARGUMENTS = [
+    '--headless',
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    # Add user agent to avoid detection
+    'user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    # Add options to prevent Google API registration errors
+    '--disable-background-networking',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-breakpad',
+    '--disable-client-side-phishing-detection',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-domain-reliability',
+    '--disable-extensions',
+    '--disable-features=AudioServiceOutOfProcess',
+    '--disable-hang-monitor',
+    '--disable-ipc-flooding-protection',
+    '--disable-notifications',
+    '--disable-offer-store-unmasked-wallet-cards',
+    '--disable-popup-blocking',
+    '--disable-print-preview',
+    '--disable-prompt-on-repost',
+    '--disable-renderer-backgrounding',
+    '--disable-setuid-sandbox',
+    '--disable-site-isolation-trials',
+    '--disable-sync',
+    '--ignore-certificate-errors',
+    '--ignore-ssl-errors',
+    '--metrics-recording-only',
+    '--mute-audio',
+    '--no-default-browser-check',
+    '--no-first-run',
+    '--no-ping',
+    '--password-store=basic',
+    '--use-mock-keychain',
+]
+
+
+def launch_chrome(arguments=None):
+    """Start a headless Chrome driver (imports selenium on first use)"""
+    try:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+    except ImportError as e:
+        raise ImportError("The Investing.com scraper needs selenium: pip install selenium webdriver-manager") from e
+
+    options = Options()
+    for argument in arguments or CHROME_ARGUMENTS:
+        options.add_argument(argument)
+
+    # Try using Selenium 4.x built-in manager first (simplest)
+    try:
+        driver = webdriver.Chrome(options=options)
+    except Exception as e:
+        print(f"Built-in Selenium Manager failed, trying webdriver_manager: {e}")
+        # Fallback to webdriver_manager
+        try:
+            from webdriver_manager.chrome import ChromeDriverManager
+            from selenium.webdriver.chrome.service import Service
+
+            driver_path = ChromeDriverManager().install()
+            # Ensure we point to the executable
+            if "chromedriver.exe" not in driver_path:
+                driver_path = os.path.join(os.path.dirname(driver_path), "chromedriver.exe")
+
+            service = Service(driver_path)
+            driver = webdriver.Chrome(service=service, options=options)
+        except Exception as e2:
+            print(f"webdriver_manager also failed: {e2}")
+            raise e
+    # Set implicit wait
+    driver.implicitly_wait(10)
+    return driver
+
+
+class DriverPool:
+    """
+    Bounded pool of reusable WebDriver sessions.
+    At most max_size drivers exist at once; callers block until one is free.
+    A driver that raised during use is quit instead of being returned.
+    """
+    def __init__(self, max_size: int = DEFAULT_POOL_SIZE, factory=launch_chrome):
+        self.max_size = max_size
+        self.factory = factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._all = set()
+        self.launched = 0
+
+    @staticmethod
+    def _alive(driver) -> bool:
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _quit(self, driver):
+        with self._lock:
+            self._all.discard(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass  # Ignore errors when closing driver
+
+    def _checkout(self):
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self._alive(driver):
+                return driver
+            self._quit(driver)
+        driver = self.factory()
+        with self._lock:
+            self._all.add(driver)
+            self.launched += 1
+        return driver
+
+    @contextmanager
+    def driver(self, timeout: float = None):
+        """Borrow a driver for the duration of the block"""
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No WebDriver free within {timeout}s")
+        driver = None
+        try:
+            driver = self._checkout()
+            yield driver
+        except BaseException:
+            if driver is not None:
+                self._quit(driver)
+                driver = None
+            raise
+        finally:
+            if driver is not None:
+                self._idle.put(driver)
+            self._slots.release()
+
+    def close(self):
+        """Quit every driver the pool started"""
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        with self._lock:
+            drivers = list(self._all)
+        for driver in drivers:
+            self._quit(driver)
+
+
+_driver_pool = None
+_driver_pool_lock = threading.Lock()
+
+
+def get_driver_pool() -> DriverPool:
+    """Process-wide driver pool, created on first use and closed at exit"""
+    global _driver_pool
+    with _driver_pool_lock:
+        if _driver_pool is None:
+            _driver_pool = DriverPool()
+            atexit.register(_driver_pool.close)
+        return _driver_pool
+
+
+class InvestingComScraper:
+    """
+    Implements the exact scraping logic from the Stock-Prediction repo
+    Uses Selenium to scroll and scrape Investing.com
+    Kept for backward compatibility but not used in optimized flow
+    """
+    def __init__(self, pool: DriverPool = None):
+        self.pool = pool
+
+    def get_news_links(self, ticker, num_articles=10, company_name=None):
+        """
+        Enhanced version with improvements from Stock-Prediction repo analysis:
+        - Direct URL pattern (no search step)
+        - Position-checking scroll loop
+        - Multiple XPath strategies for article extraction
+        - Publish date extraction
+        - Pagination support
+        - UK domain option
+        Browsers come from the shared DriverPool and are reused across calls.
+        """
+        links = []
+        try:
+            print(f"Getting Selenium driver for Investing.com scraping ({ticker})...")
+            with (self.pool or get_driver_pool()).driver() as driver:
+                links = self._scrape(driver, ticker, num_articles, company_name)
+            print(f"Found {len(links)} articles on Investing.com")
+        except Exception as e:
+            print(f"Selenium scraping error: {e}")
+
+        return links[:num_articles]
+
+    def _scrape(self, driver, ticker, num_articles, company_name):
+        from selenium.webdriver.common.by import By
+
+        links = []
+        # Use direct URL pattern when company name is known (improvement #1)
+        if company_name:
+            # Try UK domain for better results (improvement #6)
+            # Handle different naming conventions
+            clean_name = company_name.lower().replace(' ', '-').replace('.', '').replace(',', '')
+            news_url = f"https://uk.investing.com/equities/{clean_name}-news"
+        else:
+            # Fallback to original approach
+            news_url = f"https://www.investing.com/equities/{ticker.lower()}-news"
+
+        print(f"Scraping news from: {news_url}")
+
+        # Support pagination (improvement #5)
+        max_pages = 3  # Limit to avoid excessive scraping
+        for page in range(1, max_pages + 1):
+            page_url = f"{news_url}/{page}" if page > 1 else news_url
+            try:
+                rate_limiter.acquire(page_url)
+                driver.get(page_url)
+                time.sleep(2)  # Wait for page to load
+            except Exception as e:
+                print(f"Failed to load page {page_url}: {e}")
+                continue
+
+            # Improved scrolling mechanism (improvement #2)
+            old_position = 0
+            new_position = None
+            scroll_attempts = 0
+            max_scroll_attempts = 5
+
+            while scroll_attempts < max_scroll_attempts and (new_position != old_position):
+                old_position = driver.execute_script(
+                    ("return (window.pageYOffset !== undefined) ?"
+                     " window.pageYOffset : (document.documentElement ||"
+                     " document.body.parentNode || document.body);"))
+                time.sleep(1)
+                driver.execute_script((
+                    "var scrollingElement = (document.scrollingElement ||"
+                    " document.body);scrollingElement.scrollTop ="
+                    " scrollingElement.scrollHeight;"))
+                new_position = driver.execute_script(
+                    ("return (window.pageYOffset !== undefined) ?"
+                     " window.pageYOffset : (document.documentElement ||"
+                     " document.body.parentNode || document.body);"))
+                scroll_attempts += 1
+
+            # Use range(1,11) for 10 articles per page (repo approach)
+            cleaned_links = []  # Initialize cleaned_links
+
+            for article_number in range(1, 11):
+                if len(links) >= num_articles:
+                    break
+
+                try:
+                    # Use XPath for article extraction (more reliable) (repo approach)
+                    article = driver.find_element(By.XPATH,
+                        f'/html/body/div[5]/section/div[8]/article[{article_number}]')
+
+                    # Extract innerHTML and parse with BeautifulSoup (repo approach)
+                    article_html = article.get_attribute('innerHTML')
+                    if article_html:
+                        # Use "lxml" parser (repo approach)
+                        soup = BeautifulSoup(article_html, "lxml")
+
+                        # Find all links in the article (repo approach)
+                        for link_elem in soup.find_all('a'):
+                            partial_link = link_elem.get('href')
+                            if not partial_link:
+                                continue
+
+                            # Link validation: Check for 'https' first, then handle relative paths (repo approach)
+                            if 'https' in partial_link:
+                                cleaned_links.append(partial_link)
+                            elif partial_link[0] == '/':
+                                cleaned_links.append('https://uk.investing.com/' + partial_link)
+                except:
+                    # More specific error message (repo approach)
+                    print("I didn't get this")
+                    continue
+
+            # Process all collected links
+            found_links = set()  # To avoid duplicates
+            for link in cleaned_links:
+                # Skip if not a news link or already processed
+                if 'news' not in link.lower() or link in found_links:
+                    continue
+
+                found_links.add(link)
+
+                # Store link with metadata
+                links.append({
+                    'url': link,
+                    'source': 'Investing.com'
+                })
+
+            # Break if we have enough articles
+            if len(links) >= num_articles:
+                break
+
+            # Small delay between pages
+            time.sleep(1)
+
+        # Use np.unique() for deduplication (repo approach)
+        if links:
+            urls = [link['url'] for link in links]
+            unique_urls = np.unique(urls)
+            # Filter links to keep only unique ones
+            unique_links = []
+            seen_urls = set()
+            for link in links:
+                if link['url'] not in seen_urls:
+                    unique_links.append(link)
+                    seen_urls.add(link['url'])
+            links = unique_links
+
+        return links
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Load test comparing gunicorn's default setup with the preforked profile.
+
+    python load_test.py                       # per-worker vs preload, 20s each
+    python load_test.py --profiles preload --duration 60 --concurrency 32
+    python load_test.py --paths / /login /predict?nm=AAPL
+
+For each profile the script starts gunicorn on a free local port, drives
+the given paths from a thread pool, then reports requests/sec, latency
+percentiles and memory per worker. RSS counts shared pages in every worker;
+PSS splits them between the processes sharing them, so the copy-on-write
+saving of the preloaded profile shows up as a lower PSS per worker.
+Memory figures need Linux (/proc).
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Profile name -> (gunicorn config source or path, app)
+PROFILES = {
+    # Plain `gunicorn main:app`: sync workers, libraries loaded lazily per worker
+    'default': ('', 'main:app'),
+    # The old behaviour: every worker warms models, lexicon and history itself
+    'per-worker': ('def post_worker_init(worker):\n    import wsgi\n    wsgi.preload()\n', 'main:app'),
+    # gunicorn.conf.py: warmed once in the master, shared copy-on-write
+    'preload': (os.path.join(ROOT, 'gunicorn.conf.py'), 'wsgi:app'),
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url, server, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {server.returncode} before serving")
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                if response.status < 500:
+                    return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not become ready within {timeout}s")
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Fields after the parenthesised command name; ppid is the second
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return children
+
+
+def memory_kb(pid):
+    """RSS and PSS of a process in kB"""
+    usage = {'rss': 0, 'pss': 0}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    usage['rss'] = int(line.split()[1])
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    usage['pss'] = int(line.split()[1])
+    except OSError:
+        pass
+    return usage
+
+
+def run_load(base_url, paths, concurrency, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def worker(offset):
+        i = offset
+        while time.monotonic() < stop_at:
+            url = base_url + paths[i % len(paths)]
+            i += 1
+            started = time.monotonic()
+            try:
+                with urllib.request.urlopen(url, timeout=60) as response:
+                    response.read()
+                    ok = response.status < 500
+            except urllib.error.HTTPError as e:
+                ok = e.code < 500
+            except Exception:
+                ok = False
+            elapsed = time.monotonic() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.monotonic() - started
+
+    latencies.sort()
+
+    def pct(p):
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1) if latencies else None
+
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': round(len(latencies) / wall, 1),
+        'p50_ms': pct(0.50),
+        'p95_ms': pct(0.95),
+        'p99_ms': pct(0.99),
+    }
+
+
+def bench_profile(name, args):
+    port = free_port()
+    config, app = PROFILES[name]
+    temp_config = None
+    if not config.endswith('.py'):
+        with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False) as temp_config:
+            temp_config.write(config)
+        config = temp_config.name
+    command = [sys.executable, '-m', 'gunicorn', '-c', config, app,
+        '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers), '--log-level', 'warning',
+        '--access-logfile', os.devnull,
+    ]
+    print(f"[{name}] {' '.join(command[2:])}")
+    boot_started = time.monotonic()
+    server = subprocess.Popen(command, cwd=ROOT)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        wait_ready(base_url + args.paths[0], server)
+        boot = time.monotonic() - boot_started
+        load = run_load(base_url, args.paths, args.concurrency, args.duration)
+        workers = [memory_kb(pid) for pid in child_pids(server.pid)]
+        master = memory_kb(server.pid)
+    finally:
+        server.terminate()
+        try:
+            server.wait(30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        if temp_config is not None:
+            os.unlink(temp_config.name)
+
+    return dict(load, profile=name, boot_seconds=round(boot, 1), workers=len(workers),
+                master_rss_mb=round(master['rss'] / 1024, 1),
+                worker_rss_mb=round(sum(w['rss'] for w in workers) / max(len(workers), 1) / 1024, 1),
+                worker_pss_mb=round(sum(w['pss'] for w in workers) / max(len(workers), 1) / 1024, 1),
+                total_pss_mb=round((master['pss'] + sum(w['pss'] for w in workers)) / 1024, 1))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--profiles', nargs='+', choices=sorted(PROFILES), default=['per-worker', 'preload'])
+    parser.add_argument('--paths', nargs='+', default=['/', '/login'])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args(argv)
+
+    results = [bench_profile(name, args) for name in args.profiles]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    columns = ['profile', 'boot_seconds', 'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'errors',
+               'workers', 'master_rss_mb', 'worker_rss_mb', 'worker_pss_mb', 'total_pss_mb']
+    print()
+    print('  '.join(f'{c:>13}' for c in columns))
+    for result in results:
+        print('  '.join(f'{str(result[c]):>13}' for c in columns))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
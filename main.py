@@ -5,31 +5,34 @@ Created on Fri Sep 27 14:36:49 2019
 @author: Kaushik
 """
 #**************** IMPORT PACKAGES ********************
-from flask import Flask, render_template, request, flash, redirect, url_for, session, abort
-from alpha_vantage.timeseries import TimeSeries
+from flask import Flask, render_template, request, flash, redirect, url_for, session, abort, jsonify
+from flask import Response, stream_with_context
+import base64
+import click
+import csv
+import io
 import pandas as pd
 import numpy as np
-from statsmodels.tsa.arima.model import ARIMA
-from sklearn.metrics import mean_squared_error
-import matplotlib.pyplot as plt
-plt.style.use('ggplot')
 import math, random
+import threading
+import time
+from bisect import bisect_right
+from collections import namedtuple
 from datetime import datetime
 import datetime as dt
-import yfinance as yf
 # Replaced Twitter API with free news-based sentiment analysis
 # Twitter imports removed - using Finviz + FinVADER instead
 import re
-from sklearn.linear_model import LinearRegression
-from textblob import TextBlob
-from news_sentiment import retrieving_news_polarity, finviz_finvader_sentiment
-import nltk
-nltk.download('punkt')
-nltk.download('vader_lexicon')
+import rate_limiter
+# Model, market-data and scraper libraries (statsmodels, sklearn, keras,
+# yfinance, alpha_vantage, news_sentiment with selenium/nltk) are imported
+# on first use so workers and test collection boot fast and without network.
+# Importing main must not trigger any download; see tests/test_startup.py.
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from decimal import Decimal
 from functools import wraps
+from itertools import groupby
 import secrets
 
 # Ignore Warnings
@@ -43,9 +46,19 @@ app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'CHANGE_ME_IN_PRODUCTION')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///sams_database.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Engine tuning per backend (WAL for SQLite, pooling for Postgres); see db_profiles
+import db_profiles
+import market_data
+import price_scheduler
+import symbol_index
+app.config['DATABASE_PROFILE'] = db_profiles.resolve_profile(app.config['SQLALCHEMY_DATABASE_URI'])
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = db_profiles.engine_options(
+    app.config['SQLALCHEMY_DATABASE_URI'], app.config['DATABASE_PROFILE'])
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 db = SQLAlchemy(app)
+with app.app_context():
+    db_profiles.install(db.engine, app.config['DATABASE_PROFILE'])
 
 
 class User(db.Model):
@@ -58,6 +71,9 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_login_at = db.Column(db.DateTime)
     is_active = db.Column(db.Boolean, default=True)
+    # Optimistic lock: every UPDATE checks and bumps it (see run_in_transaction)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -80,6 +96,21 @@ class Broker(db.Model):
     is_active = db.Column(db.Boolean, default=True)
 
 
+class CommissionTier(db.Model):
+    """
+    Commission rate that applies from min_amount upward, measured as order
+    value ('notional') or shares ('quantity'). Below the lowest tier the
+    broker's own commission_rate applies.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    broker_id = db.Column(db.Integer, db.ForeignKey('broker.id'), nullable=False, index=True)
+    basis = db.Column(db.String(16), nullable=False, default='notional')
+    min_amount = db.Column(db.Numeric(16, 2), nullable=False, default=0)
+    commission_rate = db.Column(db.Numeric(5, 2), nullable=False)
+    broker = db.relationship('Broker', backref=db.backref('commission_tiers', lazy=True,
+                                                          order_by='CommissionTier.min_amount'))
+
+
 class PortfolioItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -87,8 +118,16 @@ class PortfolioItem(db.Model):
     quantity = db.Column(db.Integer, nullable=False, default=0)
     average_buy_price = db.Column(db.Numeric(12, 2), nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
     user = db.relationship('User', backref=db.backref('portfolio_items', lazy=True))
     company = db.relationship('Company')
+    __table_args__ = (
+        # One position per user and company; also serves filter_by(user_id=...)
+        db.Index('uq_portfolio_item_user_company', 'user_id', 'company_id', unique=True),
+        # Holders of a company, for bulk dividend payouts
+        db.Index('ix_portfolio_item_company_quantity', 'company_id', 'quantity'),
+    )
 
 
 class Transaction(db.Model):
@@ -106,6 +145,28 @@ class Transaction(db.Model):
     user = db.relationship('User', backref=db.backref('transactions', lazy=True))
     company = db.relationship('Company')
     broker = db.relationship('Broker')
+    __table_args__ = (
+        # Dashboard history and its keyset pages: WHERE user_id = ? ORDER BY
+        # created_at DESC, id DESC. SQLite appends the rowid (id) to every
+        # index, so databases indexed before id was listed behave the same
+        db.Index('ix_transaction_user_created', 'user_id', 'created_at', 'id'),
+        # History filtered by symbol; also the per-position replay order
+        db.Index('ix_transaction_user_company_created', 'user_id', 'company_id', 'created_at', 'id'),
+        # Admin recent activity across all users
+        db.Index('ix_transaction_created_at', 'created_at', 'id'),
+    )
+
+
+class DividendPayout(db.Model):
+    # One company-wide dividend paid to every holder (see pay_company_dividend)
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False, index=True)
+    amount_per_share = db.Column(db.Numeric(12, 4), nullable=False)
+    payable_date = db.Column(db.Date)
+    holder_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Numeric(16, 2), nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    company = db.relationship('Company')
 
 
 class Dividend(db.Model):
@@ -115,7 +176,63 @@ class Dividend(db.Model):
     total_amount = db.Column(db.Numeric(12, 2), nullable=False)
     payable_date = db.Column(db.Date)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    payout_id = db.Column(db.Integer, db.ForeignKey('dividend_payout.id'))
     portfolio_item = db.relationship('PortfolioItem', backref=db.backref('dividends', lazy=True))
+    __table_args__ = (
+        db.Index('ix_dividend_portfolio_item', 'portfolio_item_id'),
+        db.Index('ix_dividend_payout_item', 'payout_id', 'portfolio_item_id'),
+    )
+
+
+# Admin analytics, maintained with every Transaction (see record_transaction_stats)
+class TransactionTypeStats(db.Model):
+    txn_type = db.Column(db.String(16), primary_key=True)
+    txn_count = db.Column(db.Integer, nullable=False, default=0)
+    quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    total_amount = db.Column(db.Numeric(16, 2), nullable=False, default=0)
+    commission_amount = db.Column(db.Numeric(16, 2), nullable=False, default=0)
+
+
+class SymbolStats(db.Model):
+    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), primary_key=True)
+    quantity = db.Column(db.BigInteger, nullable=False, default=0)
+    total_value = db.Column(db.Numeric(16, 2), nullable=False, default=0)
+    company = db.relationship('Company')
+    __table_args__ = (
+        # Top symbols by traded value
+        db.Index('ix_symbol_stats_total_value', 'total_value'),
+    )
+
+
+class PositionLedger(db.Model):
+    """
+    Running totals per (user, company), updated with every trade and
+    dividend. Cost basis uses the average-cost method: a sale removes
+    cost_basis * sold / quantity and books the rest of the proceeds as
+    realized P&L. check_position_ledger() replays Transaction to verify it.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    cost_basis = db.Column(db.Numeric(18, 4), nullable=False, default=0)
+    realized_pnl = db.Column(db.Numeric(18, 4), nullable=False, default=0)
+    dividends = db.Column(db.Numeric(18, 4), nullable=False, default=0)
+    commissions = db.Column(db.Numeric(18, 4), nullable=False, default=0)
+
+
+class AnalyticsTotals(db.Model):
+    # Single row, id 1
+    id = db.Column(db.Integer, primary_key=True)
+    transaction_count = db.Column(db.BigInteger, nullable=False, default=0)
+    total_commission = db.Column(db.Numeric(16, 2), nullable=False, default=0)
+    total_volume = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class PredictedSymbol(db.Model):
+    """Symbols users ran /predict for; the prewarm scheduler keeps recent ones fresh"""
+    symbol = db.Column(db.String(16), primary_key=True)
+    prediction_count = db.Column(db.Integer, nullable=False, default=0)
+    last_predicted_at = db.Column(db.DateTime, index=True)
 
 
 def generate_csrf_token():
@@ -128,7 +245,8 @@ def generate_csrf_token():
 
 def verify_csrf():
     token = session.get('csrf_token')
-    form_token = request.form.get('csrf_token')
+    # JSON endpoints send the token in a header instead of a form field
+    form_token = request.form.get('csrf_token') or request.headers.get('X-CSRF-Token')
     if not token or not form_token or token != form_token:
         abort(400)
 
@@ -151,6 +269,54 @@ def login_required(role=None):
     return decorator
 
 
+# Attempts for a write that keeps losing races with concurrent requests
+TRANSACTION_RETRIES = 5
+
+
+def _is_write_conflict(error):
+    from sqlalchemy.exc import IntegrityError, OperationalError
+    from sqlalchemy.orm.exc import StaleDataError
+    if isinstance(error, (StaleDataError, IntegrityError)):
+        return True
+    message = str(error).lower()
+    return isinstance(error, OperationalError) and any(
+        marker in message for marker in ('locked', 'deadlock', 'could not serialize', 'lock wait timeout'))
+
+
+def run_in_transaction(operation, retries=TRANSACTION_RETRIES):
+    """
+    Run operation() and commit, retrying on a concurrent-write conflict: a
+    stale version column, a lock timeout or deadlock, or a duplicate insert.
+    Each attempt starts from a rolled-back session, so operation must read
+    (with lock_row) everything it checks. Returns operation()'s result.
+    """
+    for attempt in range(retries):
+        try:
+            result = operation()
+            db.session.commit()
+            return result
+        except Exception as e:
+            db.session.rollback()
+            if attempt == retries - 1 or not _is_write_conflict(e):
+                raise
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+
+
+def lock_row(model, **filters):
+    """
+    Load a row for update, re-read from the database. Uses SELECT ... FOR
+    UPDATE where supported. SQLite has no row locks, so a no-op UPDATE takes
+    its database write lock first: concurrent writers then wait out the busy
+    timeout instead of failing the version check at commit. Lock User
+    before PortfolioItem everywhere so row locks are taken in one order.
+    """
+    query = model.query.filter_by(**filters)
+    if db.engine.dialect.name == 'sqlite':
+        pk = model.__mapper__.primary_key[0]
+        query.update({pk: pk}, synchronize_session=False)
+    return query.populate_existing().with_for_update().first()
+
+
 def get_current_user():
     user_id = session.get('user_id')
     if not user_id:
@@ -158,38 +324,677 @@ def get_current_user():
     return User.query.get(user_id)
 
 
+def finviz_finvader_sentiment(*args, **kwargs):
+    from news_sentiment import finviz_finvader_sentiment as _finviz_finvader_sentiment
+    return _finviz_finvader_sentiment(*args, **kwargs)
+
+
+def get_source_health():
+    from news_sentiment import get_source_health as _get_source_health
+    return _get_source_health()
+
+
+# Stored price history ({SYMBOL}.csv) kept in memory and re-read only when the
+# file changes. The gunicorn profile preloads it in the master (wsgi.preload)
+# so workers share the frames copy-on-write.
+_price_history_cache = {}
+
+
+def load_price_history(quote):
+    """Stored price history for quote as a private DataFrame copy"""
+    path = os.path.abspath(f'{quote}.csv')
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _price_history_cache.get(path)
+    if cached is None or cached[0] != version:
+        cached = (version, pd.read_csv(path))
+        _price_history_cache[path] = cached
+    return cached[1].copy()
+
+
+def preload_price_history(directory='.'):
+    """Load every stored price history CSV in directory; returns the symbols loaded"""
+    loaded = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.csv'):
+            continue
+        path = os.path.abspath(os.path.join(directory, name))
+        try:
+            stat = os.stat(path)
+            df = pd.read_csv(path)
+        except Exception:
+            continue
+        if {'Date', 'Close'}.issubset(df.columns):
+            _price_history_cache[path] = ((stat.st_mtime_ns, stat.st_size), df)
+            loaded.append(name[:-4])
+    return loaded
+
+
 def get_latest_close_price(symbol):
-    end = datetime.now()
-    start = end - dt.timedelta(days=10)
-    data = yf.download(symbol, start=start, end=end)
-    if data.empty:
-        return None
-    if isinstance(data.columns, pd.MultiIndex):
-        data.columns = data.columns.get_level_values(0)
-    
-    if len(data) >= 2:
-        return float(data['Close'].iloc[-1]), float(data['Close'].iloc[-2])
+    """(latest, previous) close for symbol from the market-data provider, or None"""
+    return market_data.latest_closes([symbol]).get(symbol)
+
+
+def get_latest_close_prices(symbols):
+    """
+    Latest and previous close for several symbols in one provider call
+    (one yf.download by default). Returns {symbol: (latest, previous)};
+    symbols without data are left out.
+    """
+    return market_data.latest_closes(symbols)
+
+
+def listing_exchange(symbol):
+    """Exchange of symbol in the ticker index (symbol_index), or None"""
+    listing = symbol_index.get_index().resolve(symbol)
+    return listing.exchange if listing else None
+
+
+# One download per symbol at a time (see get_historical)
+_history_refresh_locks = {}
+_history_refresh_guard = threading.Lock()
+
+
+def get_historical(quote):
+    """
+    Make sure {QUOTE}.csv holds price history up to the latest completed
+    session of the symbol's exchange, downloading it if not. A /predict
+    arriving while the prewarm scheduler fetches the same symbol waits for
+    that download and reuses it.
+    """
+    quote = quote.upper()
+    filename = f'{quote}.csv'
+    with _history_refresh_guard:
+        lock = _history_refresh_locks.setdefault(quote, threading.Lock())
+    with lock:
+        # 1. Reuse local data if it covers the latest close (see price_scheduler.is_fresh) or is being replayed
+        if os.path.exists(filename):
+            try:
+                df_temp = load_price_history(quote)
+                if not df_temp.empty and 'Date' in df_temp.columns:
+                    last_date = pd.to_datetime(df_temp['Date'].iloc[-1]).date()
+                    exchange = (db.session.query(Company.exchange).filter_by(symbol=quote).scalar()
+                                or listing_exchange(quote))
+                    calendar = price_scheduler.calendar_for(quote, exchange)
+                    if (market_data.providers()[0].local
+                            or price_scheduler.is_fresh(last_date, price_scheduler.recorded_fetch(filename),
+                                                        calendar)):
+                        print(f"DEBUG: Reusing local up-to-date data for {quote}")
+                        return
+                    # If file exists but is old, we'll proceed to update it
+                    print(f"DEBUG: Local data for {quote} is outdated (Last date: {last_date}). Updating...")
+            except Exception as e:
+                print(f"DEBUG: Local file check failed, downloading fresh: {e}")
+
+        end = datetime.now()
+        start = datetime(end.year-2, end.month, end.day)
+
+        # 2. Hedged fetch: yfinance, then Alpha Vantage by default (MARKET_DATA_PROVIDER,
+        # see market_data), with retries and a total deadline; raises if none has the symbol
+        # Stamp the file with the request time: providers answer with what they had then
+        fetched_at = time.time()
+        try:
+            df, report = market_data.history(quote, start, end)
+        except market_data.MarketDataError as e:
+            print(f"DEBUG: {e.report.summary()}")
+            raise
+        print(f"DEBUG: {report.summary()}")
+        # Write then rename, so a concurrent /predict never reads a half-written file
+        partial = f'{filename}.{os.getpid()}.{threading.get_ident()}.tmp'
+        df.to_csv(partial, index=False)
+        os.replace(partial, filename)
+        price_scheduler.record_fetch(filename, fetched_at)
+
+
+def record_prediction(symbol):
+    """Count a /predict for symbol and stamp it as recently predicted"""
+    symbol = symbol.upper()
+    _increment_stats(PredictedSymbol, {'symbol': symbol}, {'prediction_count': 1})
+    db.session.execute(db.update(PredictedSymbol).where(PredictedSymbol.symbol == symbol)
+                       .values(last_predicted_at=datetime.utcnow()))
+    db.session.commit()
+
+
+def prewarm_symbols():
+    """(symbol, exchange) of active companies and of symbols predicted in the last PREWARM_RECENT_DAYS"""
+    with app.app_context():
+        since = datetime.utcnow() - dt.timedelta(days=price_scheduler.PREWARM_RECENT_DAYS)
+        companies = db.session.query(Company.symbol, Company.exchange).filter(
+            db.or_(Company.is_active.is_(True), Company.is_active.is_(None))
+        ).all()
+        predicted = (
+            db.session.query(PredictedSymbol.symbol, Company.exchange)
+            .outerjoin(Company, Company.symbol == PredictedSymbol.symbol)
+            .filter(PredictedSymbol.last_predicted_at >= since)
+            .all()
+        )
+        return [(symbol, exchange or listing_exchange(symbol)) for symbol, exchange in companies + predicted]
+
+
+def prewarm_refresh(symbol):
+    with app.app_context():
+        get_historical(symbol)
+
+
+# Started per gunicorn worker by gunicorn.conf.post_fork; one worker runs it
+price_prewarmer = price_scheduler.PrewarmScheduler(prewarm_symbols, prewarm_refresh)
+
+
+@app.cli.command('prewarm-prices')
+@click.option('--calendar', 'calendars', multiple=True, type=click.Choice(sorted(price_scheduler.CALENDARS)),
+              help='Only symbols on this trading calendar (repeatable; default: all)')
+def prewarm_prices_command(calendars):
+    """Refresh stored price history for companies and recently predicted symbols"""
+    print(f"Prewarmed price history: {price_prewarmer.run_once(calendars or None)}")
+
+
+def _increment_stats(model, key, deltas):
+    """
+    Add deltas to the aggregate row identified by key, creating it on first
+    use. Increments are done by the database (col = col + delta), so
+    concurrent trades never overwrite each other's totals.
+    """
+    dialect = db.engine.dialect.name
+    table = model.__table__
+    if dialect in ('sqlite', 'postgresql', 'mysql'):
+        if dialect == 'mysql':
+            from sqlalchemy.dialects.mysql import insert
+            stmt = insert(table).values(**key, **deltas)
+            stmt = stmt.on_duplicate_key_update({c: table.c[c] + stmt.inserted[c] for c in deltas})
+        else:
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(table).values(**key, **deltas)
+            stmt = stmt.on_conflict_do_update(index_elements=list(key),
+                                              set_={c: table.c[c] + stmt.excluded[c] for c in deltas})
+        db.session.execute(stmt)
+        return
+    where = [table.c[k] == v for k, v in key.items()]
+    result = db.session.execute(db.update(table).where(*where).values({c: table.c[c] + v for c, v in deltas.items()}))
+    if result.rowcount == 0:
+        db.session.execute(db.insert(table).values(**key, **deltas))
+
+
+def record_transaction_stats(txn):
+    """Fold a new transaction into the admin analytics tables; call before commit"""
+    amount = Decimal(str(txn.total_amount or 0))
+    commission = Decimal(str(txn.commission_amount or 0))
+    quantity = int(txn.quantity or 0)
+    _increment_stats(TransactionTypeStats, {'txn_type': txn.txn_type}, {
+        'txn_count': 1, 'quantity': quantity, 'total_amount': amount, 'commission_amount': commission,
+    })
+    _increment_stats(SymbolStats, {'company_id': txn.company_id}, {'quantity': quantity, 'total_value': amount})
+    _increment_stats(AnalyticsTotals, {'id': 1}, {
+        'transaction_count': 1,
+        'total_commission': commission,
+        'total_volume': quantity if txn.txn_type in ('BUY', 'SELL') else 0,
+    })
+
+
+def rebuild_analytics():
+    """Recompute the admin analytics tables from the full Transaction history"""
+    TransactionTypeStats.query.delete()
+    SymbolStats.query.delete()
+    AnalyticsTotals.query.delete()
+    by_type = db.session.query(
+        Transaction.txn_type,
+        db.func.count(Transaction.id),
+        db.func.sum(Transaction.quantity),
+        db.func.sum(Transaction.total_amount),
+        db.func.sum(Transaction.commission_amount),
+    ).group_by(Transaction.txn_type).all()
+    by_symbol = db.session.query(
+        Transaction.company_id,
+        db.func.sum(Transaction.quantity),
+        db.func.sum(Transaction.total_amount),
+    ).group_by(Transaction.company_id).all()
+
+    totals = AnalyticsTotals(id=1, transaction_count=0, total_commission=Decimal('0'), total_volume=0)
+    for txn_type, count, quantity, amount, commission in by_type:
+        db.session.add(TransactionTypeStats(txn_type=txn_type, txn_count=count, quantity=quantity or 0,
+                                            total_amount=amount or 0, commission_amount=commission or 0))
+        totals.transaction_count += count
+        totals.total_commission += Decimal(str(commission or 0))
+        if txn_type in ('BUY', 'SELL'):
+            totals.total_volume += quantity or 0
+    for company_id, quantity, amount in by_symbol:
+        db.session.add(SymbolStats(company_id=company_id, quantity=quantity or 0, total_value=amount or 0))
+    if by_type:
+        db.session.add(totals)
+    db.session.commit()
+    return {'transaction_types': len(by_type), 'symbols': len(by_symbol),
+            'transactions': totals.transaction_count}
+
+
+@app.cli.command('rebuild-analytics')
+def rebuild_analytics_command():
+    """Recompute admin analytics from the transaction history"""
+    print(f"Rebuilt analytics: {rebuild_analytics()}")
+
+
+LEDGER_FIELDS = ('quantity', 'cost_basis', 'realized_pnl', 'dividends', 'commissions')
+
+
+def replay_position(transactions):
+    """Ledger values for one position from its transactions, oldest first"""
+    state = {'quantity': 0, 'cost_basis': Decimal('0'), 'realized_pnl': Decimal('0'),
+             'dividends': Decimal('0'), 'commissions': Decimal('0')}
+    for t in transactions:
+        amount = Decimal(str(t.total_amount or 0))
+        quantity = int(t.quantity or 0)
+        state['commissions'] += Decimal(str(t.commission_amount or 0))
+        if t.txn_type == 'BUY':
+            state['quantity'] += quantity
+            state['cost_basis'] += amount
+        elif t.txn_type == 'SELL':
+            sold_cost = state['cost_basis'] * quantity / state['quantity'] if state['quantity'] > 0 else Decimal('0')
+            state['realized_pnl'] += amount - sold_cost
+            state['cost_basis'] -= sold_cost
+            state['quantity'] -= quantity
+        elif t.txn_type == 'DIVIDEND':
+            state['dividends'] += amount
+    return state
+
+
+def _replayed_positions(user_id=None, company_id=None):
+    """Yield ((user_id, company_id), state) for every position in the history"""
+    query = Transaction.query
+    if user_id is not None:
+        query = query.filter(Transaction.user_id == user_id)
+    if company_id is not None:
+        query = query.filter(Transaction.company_id == company_id)
+    rows = query.order_by(Transaction.user_id, Transaction.company_id,
+                          Transaction.created_at, Transaction.id).yield_per(1000)
+    for key, group in groupby(rows, key=lambda t: (t.user_id, t.company_id)):
+        yield key, replay_position(group)
+
+
+def rebuild_position_ledger(user_id=None, company_id=None):
+    """Recompute ledger rows from Transaction history; all positions by default"""
+    query = PositionLedger.query
+    if user_id is not None:
+        query = query.filter(PositionLedger.user_id == user_id)
+    if company_id is not None:
+        query = query.filter(PositionLedger.company_id == company_id)
+    query.delete(synchronize_session=False)
+    states = list(_replayed_positions(user_id, company_id))
+    for (uid, cid), state in states:
+        db.session.add(PositionLedger(user_id=uid, company_id=cid, **state))
+    db.session.flush()
+    return len(states)
+
+
+def record_position_ledger(txn):
+    """
+    Apply a new transaction to its position's ledger row; call before
+    commit. Every change is one UPDATE computed by the database from the
+    row's current values, so it stays atomic with the trade. A position
+    without a row (new, or older than the ledger) is rebuilt from its
+    history, which already includes txn.
+    """
+    amount = Decimal(str(txn.total_amount or 0))
+    commission = Decimal(str(txn.commission_amount or 0))
+    quantity = int(txn.quantity or 0)
+    table = PositionLedger.__table__
+    if txn.txn_type == 'BUY':
+        values = [
+            (table.c.quantity, table.c.quantity + quantity),
+            (table.c.cost_basis, table.c.cost_basis + amount),
+            (table.c.commissions, table.c.commissions + commission),
+        ]
+    elif txn.txn_type == 'DIVIDEND':
+        values = [
+            (table.c.dividends, table.c.dividends + amount),
+            (table.c.commissions, table.c.commissions + commission),
+        ]
     else:
-        return float(data['Close'].iloc[-1]), float(data['Close'].iloc[-1])
+        sold_cost = db.case((table.c.quantity > 0, table.c.cost_basis * quantity / table.c.quantity), else_=0)
+        # Ordered so MySQL, which applies SET clauses left to right, reads the old values too
+        values = [
+            (table.c.realized_pnl, table.c.realized_pnl + amount - sold_cost),
+            (table.c.cost_basis, table.c.cost_basis - sold_cost),
+            (table.c.quantity, table.c.quantity - quantity),
+            (table.c.commissions, table.c.commissions + commission),
+        ]
+    result = db.session.execute(
+        db.update(table)
+        .where(table.c.user_id == txn.user_id, table.c.company_id == txn.company_id)
+        .ordered_values(*values)
+    )
+    if result.rowcount == 0:
+        db.session.flush()
+        rebuild_position_ledger(txn.user_id, txn.company_id)
+
+
+def get_ledger_totals(user_id):
+    """Sum the user's ledger rows; one row per position, independent of history length"""
+    row = db.session.query(
+        db.func.sum(PositionLedger.cost_basis),
+        db.func.sum(PositionLedger.realized_pnl),
+        db.func.sum(PositionLedger.dividends),
+        db.func.sum(PositionLedger.commissions),
+    ).filter(PositionLedger.user_id == user_id).one()
+    return {name: Decimal(str(value or 0)) for name, value in
+            zip(('cost_basis', 'realized_pnl', 'dividends', 'commissions'), row)}
+
+
+def check_position_ledger(tolerance=Decimal('0.01')):
+    """
+    Replay Transaction history and compare it with PositionLedger.
+    Returns a list of mismatches, empty when the ledger is consistent.
+    """
+    ledger = {(row.user_id, row.company_id): row for row in PositionLedger.query.yield_per(1000)}
+    mismatches = []
+    for key, expected in _replayed_positions():
+        row = ledger.pop(key, None)
+        actual = {name: getattr(row, name) for name in LEDGER_FIELDS} if row else None
+        if actual is None or any(abs(Decimal(str(actual[name])) - Decimal(str(expected[name]))) > tolerance
+                                 for name in LEDGER_FIELDS):
+            mismatches.append({'user_id': key[0], 'company_id': key[1], 'expected': expected, 'ledger': actual})
+    for (uid, cid), row in ledger.items():
+        # Ledger rows without any history behind them
+        mismatches.append({'user_id': uid, 'company_id': cid, 'expected': None,
+                           'ledger': {name: getattr(row, name) for name in LEDGER_FIELDS}})
+    return mismatches
+
+
+@app.cli.command('check-ledger')
+@click.option('--repair', is_flag=True, help='Rebuild the ledger from history if it is inconsistent')
+def check_ledger_command(repair):
+    """Verify the position ledger against the transaction history"""
+    mismatches = check_position_ledger()
+    for mismatch in mismatches[:20]:
+        print(f"Mismatch: {mismatch}")
+    print(f"{len(mismatches)} inconsistent position(s)")
+    if mismatches and repair:
+        print(f"Rebuilt {rebuild_position_ledger()} position(s)")
+        db.session.commit()
+    elif mismatches:
+        raise SystemExit(1)
+
+
+COMMISSION_BASES = ('notional', 'quantity')
+
+
+class CommissionSchedule:
+    """
+    A broker's rates as a lookup table: sorted tier thresholds and the
+    matching rates already divided by 100, so pricing an order is one
+    bisect over a handful of thresholds and one Decimal multiply.
+    """
+    __slots__ = ('basis', 'thresholds', 'rates')
+
+    def __init__(self, base_rate, tiers=(), basis='notional'):
+        tiers = sorted((Decimal(str(t.min_amount)), Decimal(str(t.commission_rate))) for t in tiers)
+        self.basis = basis
+        self.thresholds = [threshold for threshold, _ in tiers]
+        self.rates = [Decimal(str(base_rate or 0)) / 100] + [rate / 100 for _, rate in tiers]
+
+    @classmethod
+    def for_broker(cls, broker):
+        tiers = list(broker.commission_tiers)
+        return cls(broker.commission_rate, tiers, tiers[0].basis if tiers else 'notional')
+
+    def rate_for(self, total_amount, quantity=None):
+        measure = total_amount if self.basis == 'notional' else Decimal(quantity or 0)
+        return self.rates[bisect_right(self.thresholds, measure)]
+
+
+# Detached copy of the active broker; safe to share across requests and threads
+ActiveBroker = namedtuple('ActiveBroker', 'id name commission_rate is_active schedule')
+
+# One dashboard row: a position valued at its latest close
+Holding = namedtuple('Holding', 'company quantity average_buy_price current_price diff percent_change change_direction')
+
+# Seconds a cached broker is trusted; bounds staleness in workers that did
+# not handle the admin write (each gunicorn worker has its own cache)
+BROKER_CACHE_TTL = float(os.environ.get('BROKER_CACHE_TTL', '60'))
+_broker_cache = {'broker': None, 'loaded_at': None}
+_broker_cache_lock = threading.Lock()
+
+
+def invalidate_broker_cache():
+    _broker_cache['loaded_at'] = None
 
 
 def get_active_broker():
-    return Broker.query.filter_by(is_active=True).order_by(Broker.commission_rate.asc()).first()
+    """Cheapest active broker, from the in-process cache when it is fresh"""
+    loaded_at = _broker_cache['loaded_at']
+    if loaded_at is not None and time.monotonic() - loaded_at < BROKER_CACHE_TTL:
+        return _broker_cache['broker']
+    with _broker_cache_lock:
+        broker = Broker.query.filter_by(is_active=True).order_by(Broker.commission_rate.asc()).first()
+        snapshot = None
+        if broker:
+            snapshot = ActiveBroker(broker.id, broker.name, broker.commission_rate, broker.is_active,
+                                    CommissionSchedule.for_broker(broker))
+        _broker_cache.update(broker=snapshot, loaded_at=time.monotonic())
+        return snapshot
 
 
-def calculate_commission(total_amount, broker):
+@db.event.listens_for(db.session, 'after_flush')
+def _note_broker_changes(session, flush_context):
+    changed = list(session.new) + list(session.dirty) + list(session.deleted)
+    if any(isinstance(obj, (Broker, CommissionTier)) for obj in changed):
+        session.info['brokers_changed'] = True
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def _invalidate_brokers_on_commit(session):
+    if session.info.pop('brokers_changed', False):
+        invalidate_broker_cache()
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def _forget_broker_changes(session):
+    session.info.pop('brokers_changed', None)
+
+
+def commission_rate_for(total_amount, broker, quantity=None):
+    """Fraction of an order charged as commission, tiers applied; broker is an ActiveBroker or a Broker row"""
     if not broker:
         return Decimal('0')
     try:
-        rate = Decimal(broker.commission_rate) / Decimal('100')
+        schedule = getattr(broker, 'schedule', None) or CommissionSchedule.for_broker(broker)
+        return schedule.rate_for(total_amount, quantity)
     except Exception:
         return Decimal('0')
-    commission = total_amount * rate
+
+
+def calculate_commission(total_amount, broker, quantity=None):
+    """Commission for an order; broker is an ActiveBroker or a Broker row"""
+    commission = total_amount * commission_rate_for(total_amount, broker, quantity)
     return commission.quantize(Decimal('0.01'))
 
 
+def commission_description(side, broker, rate):
+    """Transaction description naming the broker and the rate that priced the commission"""
+    return f'Simulated {side} order via {broker.name} ({rate * 100:.2f}% commission)'
+
+
+class OrderRejected(Exception):
+    """A trade that cannot be booked; the transaction is rolled back"""
+
+    def __init__(self, message, category='danger'):
+        super().__init__(message)
+        self.category = category
+
+
+def book_buy(user, symbol, quantity, price, broker):
+    """
+    Book a buy for a user row locked with lock_row: debit the wallet, update
+    the position, ledger and analytics and add the Transaction. Raises
+    OrderRejected if the wallet cannot cover it. The caller commits.
+    """
+    total = Decimal(str(price)) * Decimal(quantity)
+    rate = commission_rate_for(total, broker, quantity)
+    commission = calculate_commission(total, broker, quantity)
+    if user.wallet_balance < total + commission:
+        raise OrderRejected('Insufficient wallet balance to complete this purchase.', 'balance_error')
+    company = Company.query.filter_by(symbol=symbol).first()
+    if not company:
+        company = Company(symbol=symbol, name=symbol)
+        db.session.add(company)
+        db.session.flush()
+    item = lock_row(PortfolioItem, user_id=user.id, company_id=company.id)
+    if item:
+        current_total = Decimal(item.average_buy_price) * Decimal(item.quantity)
+        new_total = current_total + total
+        new_quantity = item.quantity + quantity
+        item.average_buy_price = new_total / Decimal(new_quantity)
+        item.quantity = new_quantity
+    else:
+        item = PortfolioItem(user_id=user.id, company_id=company.id, quantity=quantity,
+                             average_buy_price=total / Decimal(quantity))
+        db.session.add(item)
+    user.wallet_balance = user.wallet_balance - (total + commission)
+    if broker and commission > 0:
+        description = commission_description('buy', broker, rate)
+    else:
+        description = 'Simulated buy order'
+    txn = Transaction(user_id=user.id, company_id=company.id, txn_type='BUY', quantity=quantity,
+                      price=Decimal(str(price)), total_amount=total,
+                      commission_amount=commission, broker_id=broker.id if broker else None,
+                      description=description)
+    db.session.add(txn)
+    record_transaction_stats(txn)
+    record_position_ledger(txn)
+    return txn
+
+
+def book_sell(user, symbol, quantity, price, broker):
+    """
+    Book a sale for a user row locked with lock_row. Raises OrderRejected if
+    the position is smaller than quantity. The caller commits.
+    """
+    company = Company.query.filter_by(symbol=symbol).first()
+    item = lock_row(PortfolioItem, user_id=user.id, company_id=company.id) if company else None
+    if not item or item.quantity < quantity:
+        raise OrderRejected('Not enough shares to sell.')
+    total = Decimal(str(price)) * Decimal(quantity)
+    rate = commission_rate_for(total, broker, quantity)
+    commission = calculate_commission(total, broker, quantity)
+    item.quantity = item.quantity - quantity
+    # Do not delete the item even if quantity is 0, to preserve dividend history
+    user.wallet_balance = user.wallet_balance + (total - commission)
+    if broker and commission > 0:
+        description = commission_description('sell', broker, rate)
+    else:
+        description = 'Simulated sell order'
+    txn = Transaction(user_id=user.id, company_id=company.id, txn_type='SELL', quantity=quantity,
+                      price=Decimal(str(price)), total_amount=total,
+                      commission_amount=commission, broker_id=broker.id if broker else None,
+                      description=description)
+    db.session.add(txn)
+    record_transaction_stats(txn)
+    record_position_ledger(txn)
+    return txn
+
+
+def pay_company_dividend(company_id, amount_per_share, payable_date=None):
+    """
+    Credit a dividend to every holder of a company in a fixed number of
+    set-based statements, whatever the number of holders: Dividend rows
+    are bulk-inserted, Transaction rows and the ledger are filled from
+    them with INSERT ... SELECT and UPDATE, and all wallets are credited by
+    one UPDATE. Raises OrderRejected if nobody holds the company. The
+    caller commits; returns the DividendPayout.
+    """
+    now = datetime.utcnow()
+    payout = DividendPayout(company_id=company_id, amount_per_share=amount_per_share,
+                            payable_date=payable_date, created_at=now)
+    db.session.add(payout)
+    # On SQLite this insert takes the database write lock, so the holders
+    # read below cannot change before commit
+    db.session.flush()
+    holders = db.session.query(PortfolioItem.id, PortfolioItem.quantity).filter(
+        PortfolioItem.company_id == company_id, PortfolioItem.quantity > 0)
+    if db.engine.dialect.name != 'sqlite':
+        # Same lock order as the trade routes: users, then their positions
+        db.session.query(User.id).filter(
+            User.id.in_(holders.with_entities(PortfolioItem.user_id))
+        ).order_by(User.id).with_for_update().all()
+        holders = holders.with_for_update()
+    rows = holders.order_by(PortfolioItem.id).all()
+    if not rows:
+        raise OrderRejected('No holders of this symbol.')
+
+    dividends = [{'portfolio_item_id': item_id, 'amount_per_share': amount_per_share,
+                  'total_amount': (amount_per_share * quantity).quantize(Decimal('0.01')),
+                  'payable_date': payable_date, 'created_at': now, 'payout_id': payout.id}
+                 for item_id, quantity in rows]
+    db.session.execute(db.insert(Dividend), dividends)
+    payout.holder_count = len(dividends)
+    payout.total_amount = sum(d['total_amount'] for d in dividends)
+
+    # This payout's Dividend rows joined to their positions, which are locked
+    paid = (db.select(PortfolioItem.user_id, PortfolioItem.company_id, PortfolioItem.quantity,
+                      Dividend.total_amount)
+            .join(Dividend, Dividend.portfolio_item_id == PortfolioItem.id)
+            .where(Dividend.payout_id == payout.id))
+    db.session.execute(db.insert(Transaction).from_select(
+        ['user_id', 'company_id', 'txn_type', 'quantity', 'price', 'total_amount',
+         'commission_amount', 'created_at', 'description'],
+        paid.with_only_columns(
+            PortfolioItem.user_id, PortfolioItem.company_id, db.literal('DIVIDEND'), PortfolioItem.quantity,
+            db.literal(amount_per_share, Transaction.price.type), Dividend.total_amount,
+            db.literal(0, Transaction.commission_amount.type), db.literal(now, Transaction.created_at.type),
+            db.literal('Dividend payout recorded'),
+        )))
+
+    def credited_to(user_id_column):
+        # Correlated subquery: what this payout credits to the outer row's
+        # user, found through that user's position rather than the payout
+        return db.func.coalesce(
+            paid.with_only_columns(Dividend.total_amount)
+            .where(PortfolioItem.user_id == user_id_column, PortfolioItem.company_id == company_id)
+            .scalar_subquery(), 0)
+
+    paid_users = paid.with_only_columns(PortfolioItem.user_id)
+    users = User.__table__
+    db.session.execute(
+        db.update(users).where(users.c.id.in_(paid_users))
+        .values(wallet_balance=users.c.wallet_balance + credited_to(users.c.id), version=users.c.version + 1)
+    )
+
+    ledger = PositionLedger.__table__
+    has_ledger = db.select(ledger.c.user_id).where(
+        ledger.c.user_id == PortfolioItem.user_id, ledger.c.company_id == company_id).exists()
+    db.session.execute(db.insert(ledger).from_select(
+        ['user_id', 'company_id', 'quantity', 'cost_basis', 'realized_pnl', 'dividends', 'commissions'],
+        paid.with_only_columns(PortfolioItem.user_id, PortfolioItem.company_id,
+                               *(db.literal(0) for _ in range(5))).where(~has_ledger)))
+    db.session.execute(
+        db.update(ledger).where(ledger.c.company_id == company_id, ledger.c.user_id.in_(paid_users))
+        .values(dividends=ledger.c.dividends + credited_to(ledger.c.user_id))
+    )
+
+    quantity = sum(quantity for _, quantity in rows)
+    _increment_stats(TransactionTypeStats, {'txn_type': 'DIVIDEND'}, {
+        'txn_count': len(rows), 'quantity': quantity, 'total_amount': payout.total_amount,
+        'commission_amount': Decimal('0'),
+    })
+    _increment_stats(SymbolStats, {'company_id': company_id},
+                     {'quantity': quantity, 'total_value': payout.total_amount})
+    _increment_stats(AnalyticsTotals, {'id': 1}, {
+        'transaction_count': len(rows), 'total_commission': Decimal('0'), 'total_volume': 0,
+    })
+    return payout
+
+
 with app.app_context():
     db.create_all()
+    # create_all never alters existing tables; bring older databases up to date
+    from migrations import upgrade_schema
+    upgrade_schema(db)
+    # Databases that predate the analytics tables get them filled once
+    if db.session.get(AnalyticsTotals, 1) is None and db.session.query(Transaction.id).first() is not None:
+        rebuild_analytics()
+    if db.session.query(PositionLedger.user_id).first() is None and db.session.query(Transaction.id).first() is not None:
+        rebuild_position_ledger()
+        db.session.commit()
 
 #To control caching so as to save and retrieve plot figs on client side
 @app.after_request
@@ -240,8 +1045,11 @@ def login():
         session.clear()
         session['user_id'] = user.id
         session['user_role'] = user.role
-        user.last_login_at = datetime.utcnow()
-        db.session.commit()
+        user_id = user.id
+
+        def record_login():
+            lock_row(User, id=user_id).last_login_at = datetime.utcnow()
+        run_in_transaction(record_login)
         return redirect(url_for('dashboard'))
     return render_template('login.html')
 
@@ -256,75 +1064,62 @@ def logout():
 @login_required()
 def dashboard():
     user = get_current_user()
-    # Only show items with quantity > 0
-    items = PortfolioItem.query.filter_by(user_id=user.id).filter(PortfolioItem.quantity > 0).all()
-    transactions = Transaction.query.filter_by(user_id=user.id).order_by(Transaction.created_at.desc()).limit(20).all()
+    # Quantity and cost basis come from the position ledger; positions that
+    # predate it (no ledger row) fall back to their PortfolioItem values
+    holdings = (db.session.query(PortfolioItem, PositionLedger.quantity, PositionLedger.cost_basis)
+                .options(db.joinedload(PortfolioItem.company))
+                .outerjoin(PositionLedger, db.and_(PositionLedger.user_id == PortfolioItem.user_id,
+                                                   PositionLedger.company_id == PortfolioItem.company_id))
+                .filter(PortfolioItem.user_id == user.id)
+                .filter(db.func.coalesce(PositionLedger.quantity, PortfolioItem.quantity) > 0)
+                .order_by(PortfolioItem.id).all())
+    transactions = (Transaction.query.options(db.joinedload(Transaction.company))
+                    .filter_by(user_id=user.id).order_by(Transaction.created_at.desc()).limit(20).all())
+    
+    # Every holding is priced by one batched quote call
+    quotes = get_latest_close_prices(sorted({item.company.symbol for item, _, _ in holdings}))
     
-    # Calculate Current Portfolio Value & Cost of Held
+    # Calculate Current Portfolio Value
     current_portfolio_value = Decimal('0')
-    cost_of_held = Decimal('0')
+    items = []
     
-    for item in items:
-        # Fetch live price
-        price_data = get_latest_close_price(item.company.symbol)
+    for item, ledger_quantity, cost_basis in holdings:
+        if ledger_quantity is None:
+            quantity = item.quantity
+            average_buy_price = Decimal(str(item.average_buy_price))
+        else:
+            quantity = ledger_quantity
+            average_buy_price = Decimal(str(cost_basis)) / quantity
         
-        item.diff = Decimal('0')
-        item.percent_change = Decimal('0')
-        item.change_direction = None
+        diff = Decimal('0')
+        percent_change = Decimal('0')
+        change_direction = None
+        price_data = quotes.get(item.company.symbol)
         
         if price_data:
-            live_price = price_data[0]
-            current_price = Decimal(str(live_price))
+            current_price = Decimal(str(price_data[0]))
             
             # Calculate difference vs Average Buy Price
-            diff = current_price - item.average_buy_price
-            item.diff = diff
+            diff = current_price - average_buy_price
             
-            if item.average_buy_price > 0:
-                item.percent_change = (diff / item.average_buy_price) * 100
+            if average_buy_price > 0:
+                percent_change = (diff / average_buy_price) * 100
             
             if diff > 0:
-                item.change_direction = 'up'
+                change_direction = 'up'
             elif diff < 0:
-                item.change_direction = 'down'
+                change_direction = 'down'
         else:
-            current_price = item.average_buy_price
+            current_price = average_buy_price
         
-        # Attach current price to the item for the template
-        item.current_price = current_price
-        
-        item_qty = Decimal(item.quantity)
-        current_portfolio_value += current_price * item_qty
-        cost_of_held += item.average_buy_price * item_qty
+        items.append(Holding(item.company, quantity, average_buy_price, current_price, diff,
+                             percent_change, change_direction))
+        current_portfolio_value += current_price * Decimal(quantity)
 
-    # Calculate Realized Profit
-    # Formula: (Total Sells + Total Dividends - Commissions) - (Total Buys - Cost of Held)
-    
-    # Get aggregates from DB for efficiency, or loop if volume is low. 
-    # Since we need precise sums for the user, a query is better but we can iterate if we want to be safe with types.
-    # Given the likely small scale, a query is cleaner.
-    
-    all_txns = Transaction.query.filter_by(user_id=user.id).all()
-    total_buys = Decimal('0')
-    total_sells = Decimal('0')
-    total_dividends = Decimal('0')
-    total_commissions = Decimal('0')
-    
-    for t in all_txns:
-        amt = t.total_amount if t.total_amount is not None else Decimal('0')
-        comm = t.commission_amount if t.commission_amount is not None else Decimal('0')
-        
-        total_commissions += comm
-        
-        if t.txn_type == 'BUY':
-            total_buys += amt
-        elif t.txn_type == 'SELL':
-            total_sells += amt
-        elif t.txn_type == 'DIVIDEND':
-            total_dividends += amt
-            
-    cost_of_sold = total_buys - cost_of_held
-    realized_profit = (total_sells + total_dividends) - cost_of_sold - total_commissions
+    # Calculate Realized Profit from the position ledger
+    # Formula: Realized P&L on sales + Dividends - Commissions
+    ledger = get_ledger_totals(user.id)
+    realized_profit = ledger['realized_pnl'] + ledger['dividends'] - ledger['commissions']
 
     return render_template('dashboard.html', user=user, items=items, transactions=transactions,
                            current_portfolio_value=current_portfolio_value,
@@ -354,39 +1149,18 @@ def trade_buy():
         flash('Unable to fetch latest price for symbol.', 'danger')
         return redirect(url_for('dashboard'))
     price = price_data[0]
-    total = Decimal(str(price)) * Decimal(quantity)
     broker = get_active_broker()
-    commission = calculate_commission(total, broker)
-    if user.wallet_balance < total + commission:
-        flash('Insufficient wallet balance to complete this purchase.', 'balance_error')
+    user_id = user.id
+
+    def execute():
+        # Balance and position are re-read under lock on every attempt
+        book_buy(lock_row(User, id=user_id), symbol, quantity, price, broker)
+
+    try:
+        run_in_transaction(execute)
+    except OrderRejected as e:
+        flash(str(e), e.category)
         return redirect(url_for('dashboard'))
-    company = Company.query.filter_by(symbol=symbol).first()
-    if not company:
-        company = Company(symbol=symbol, name=symbol)
-        db.session.add(company)
-        db.session.flush()
-    item = PortfolioItem.query.filter_by(user_id=user.id, company_id=company.id).first()
-    if item:
-        current_total = Decimal(item.average_buy_price) * Decimal(item.quantity)
-        new_total = current_total + total
-        new_quantity = item.quantity + quantity
-        item.average_buy_price = new_total / Decimal(new_quantity)
-        item.quantity = new_quantity
-    else:
-        item = PortfolioItem(user_id=user.id, company_id=company.id, quantity=quantity,
-                             average_buy_price=total / Decimal(quantity))
-        db.session.add(item)
-    user.wallet_balance = user.wallet_balance - (total + commission)
-    if broker and commission > 0:
-        description = f'Simulated buy order via {broker.name} ({broker.commission_rate}% commission)'
-    else:
-        description = 'Simulated buy order'
-    txn = Transaction(user_id=user.id, company_id=company.id, txn_type='BUY', quantity=quantity,
-                      price=Decimal(str(price)), total_amount=total,
-                      commission_amount=commission, broker_id=broker.id if broker else None,
-                      description=description)
-    db.session.add(txn)
-    db.session.commit()
     flash('Buy order executed in simulated portfolio.', 'success')
     return redirect(url_for('dashboard'))
 
@@ -422,26 +1196,111 @@ def trade_sell():
         flash('Unable to fetch latest price for symbol.', 'danger')
         return redirect(url_for('dashboard'))
     price = price_data[0]
-    total = Decimal(str(price)) * Decimal(quantity)
     broker = get_active_broker()
-    commission = calculate_commission(total, broker)
-    item.quantity = item.quantity - quantity
-    # Do not delete the item even if quantity is 0, to preserve dividend history
-    user.wallet_balance = user.wallet_balance + (total - commission)
-    if broker and commission > 0:
-        description = f'Simulated sell order via {broker.name} ({broker.commission_rate}% commission)'
-    else:
-        description = 'Simulated sell order'
-    txn = Transaction(user_id=user.id, company_id=company.id, txn_type='SELL', quantity=quantity,
-                      price=Decimal(str(price)), total_amount=total,
-                      commission_amount=commission, broker_id=broker.id if broker else None,
-                      description=description)
-    db.session.add(txn)
-    db.session.commit()
+    user_id = user.id
+
+    def execute():
+        # The check above ran without a lock; a concurrent sale may have won
+        book_sell(lock_row(User, id=user_id), symbol, quantity, price, broker)
+
+    try:
+        run_in_transaction(execute)
+    except OrderRejected as e:
+        flash(str(e), e.category)
+        return redirect(url_for('dashboard'))
     flash('Sell order executed in simulated portfolio.', 'success')
     return redirect(url_for('dashboard'))
 
 
+# Largest basket accepted by /trade/bulk
+BULK_ORDER_MAX_LEGS = 100
+
+
+def parse_bulk_orders(orders):
+    """Validate a basket of {symbol, side, quantity}; returns (legs, errors)"""
+    if not isinstance(orders, list) or not orders:
+        return [], [{'leg': None, 'error': 'orders must be a non-empty list.'}]
+    if len(orders) > BULK_ORDER_MAX_LEGS:
+        return [], [{'leg': None, 'error': f'At most {BULK_ORDER_MAX_LEGS} orders per basket.'}]
+    legs, errors = [], []
+    for index, order in enumerate(orders):
+        if not isinstance(order, dict):
+            errors.append({'leg': index, 'error': 'Order must be an object.'})
+            continue
+        symbol = str(order.get('symbol', '')).strip().upper()
+        side = str(order.get('side', '')).strip().lower()
+        try:
+            quantity = int(order.get('quantity'))
+        except (TypeError, ValueError):
+            quantity = 0
+        if not symbol:
+            errors.append({'leg': index, 'error': 'Symbol is required.'})
+        elif side not in ('buy', 'sell'):
+            errors.append({'leg': index, 'error': "Side must be 'buy' or 'sell'."})
+        elif quantity <= 0:
+            errors.append({'leg': index, 'error': 'Quantity must be a positive integer.'})
+        else:
+            legs.append({'leg': index, 'symbol': symbol, 'side': side, 'quantity': quantity})
+    return legs, errors
+
+
+@app.route('/trade/bulk', methods=['POST'])
+@login_required()
+def trade_bulk():
+    """
+    Execute a basket of orders atomically.
+
+        POST /trade/bulk  (X-CSRF-Token header)
+        {"orders": [{"symbol": "AAPL", "side": "sell", "quantity": 5},
+                    {"symbol": "MSFT", "side": "buy", "quantity": 2}]}
+
+    All legs are priced with one quote download and one broker lookup, and
+    booked in one database transaction: sells first, so their proceeds can
+    fund the buys. If any leg is rejected nothing is booked.
+    """
+    verify_csrf()
+    user = get_current_user()
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'status': 'rejected',
+                        'errors': [{'leg': None, 'error': 'Body must be a JSON object with an orders list.'}]}), 400
+    legs, errors = parse_bulk_orders(payload.get('orders'))
+    if errors:
+        return jsonify({'status': 'rejected', 'errors': errors}), 400
+
+    quotes = get_latest_close_prices(leg['symbol'] for leg in legs)
+    unpriced = [{'leg': leg['leg'], 'error': f"Unable to fetch latest price for {leg['symbol']}."}
+                for leg in legs if leg['symbol'] not in quotes]
+    if unpriced:
+        return jsonify({'status': 'rejected', 'errors': unpriced}), 422
+    broker = get_active_broker()
+    user_id = user.id
+    ordered = sorted(legs, key=lambda leg: leg['side'] != 'sell')
+
+    def execute():
+        user = lock_row(User, id=user_id)
+        report = []
+        for leg in ordered:
+            book = book_sell if leg['side'] == 'sell' else book_buy
+            try:
+                txn = book(user, leg['symbol'], leg['quantity'], quotes[leg['symbol']][0], broker)
+            except OrderRejected as e:
+                e.leg = leg['leg']
+                raise
+            report.append({
+                'leg': leg['leg'], 'symbol': leg['symbol'], 'side': leg['side'], 'quantity': leg['quantity'],
+                'price': float(txn.price), 'total': float(txn.total_amount),
+                'commission': float(txn.commission_amount), 'status': 'filled',
+            })
+        return sorted(report, key=lambda row: row['leg']), float(user.wallet_balance)
+
+    try:
+        report, wallet_balance = run_in_transaction(execute)
+    except OrderRejected as e:
+        return jsonify({'status': 'rejected', 'errors': [{'leg': e.leg, 'error': str(e)}]}), 409
+    return jsonify({'status': 'filled', 'legs': report, 'wallet_balance': wallet_balance})
+
+
 @app.route('/funds/topup', methods=['POST'])
 @login_required()
 def funds_topup():
@@ -456,8 +1315,12 @@ def funds_topup():
     if amount <= 0:
         flash('Amount must be greater than zero.', 'danger')
         return redirect(url_for('dashboard'))
-    user.wallet_balance = user.wallet_balance + amount
-    db.session.commit()
+    user_id = user.id
+
+    def execute():
+        user = lock_row(User, id=user_id)
+        user.wallet_balance = user.wallet_balance + amount
+    run_in_transaction(execute)
     flash('Wallet balance updated for simulation.', 'success')
     return redirect(url_for('dashboard'))
 
@@ -481,60 +1344,352 @@ def record_dividend():
     if not company:
         flash('No holdings for this symbol.', 'danger')
         return redirect(url_for('dashboard'))
-    item = PortfolioItem.query.filter_by(user_id=user.id, company_id=company.id).first()
-    if not item or item.quantity <= 0:
-        flash('No holdings for this symbol.', 'danger')
+    user_id, company_id = user.id, company.id
+
+    def execute():
+        # Paid on the quantity held when the payout is booked
+        user = lock_row(User, id=user_id)
+        item = lock_row(PortfolioItem, user_id=user_id, company_id=company_id)
+        if not item or item.quantity <= 0:
+            raise OrderRejected('No holdings for this symbol.')
+        total_amount = amount_per_share * Decimal(item.quantity)
+        dividend = Dividend(portfolio_item_id=item.id, amount_per_share=amount_per_share,
+                            total_amount=total_amount)
+        user.wallet_balance = user.wallet_balance + total_amount
+        txn = Transaction(user_id=user_id, company_id=company_id, txn_type='DIVIDEND', quantity=item.quantity,
+                          price=amount_per_share, total_amount=total_amount,
+                          commission_amount=Decimal('0'), broker_id=None,
+                          description='Dividend payout recorded')
+        db.session.add(dividend)
+        db.session.add(txn)
+        record_transaction_stats(txn)
+        record_position_ledger(txn)
+
+    try:
+        run_in_transaction(execute)
+    except OrderRejected as e:
+        flash(str(e), e.category)
         return redirect(url_for('dashboard'))
-    total_amount = amount_per_share * Decimal(item.quantity)
-    dividend = Dividend(portfolio_item_id=item.id, amount_per_share=amount_per_share,
-                        total_amount=total_amount)
-    user.wallet_balance = user.wallet_balance + total_amount
-    txn = Transaction(user_id=user.id, company_id=company.id, txn_type='DIVIDEND', quantity=item.quantity,
-                      price=amount_per_share, total_amount=total_amount,
-                      commission_amount=Decimal('0'), broker_id=None,
-                      description='Dividend payout recorded')
-    db.session.add(dividend)
-    db.session.add(txn)
-    db.session.commit()
     flash('Dividend recorded and wallet credited.', 'success')
     return redirect(url_for('dashboard'))
 
 
+# Rows per page of the transaction history API, and per batch of its CSV
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 500
+HISTORY_CSV_BATCH = 1000
+TRANSACTION_TYPES = ('BUY', 'SELL', 'DIVIDEND')
+# Selected as plain columns so pages never fill the session's identity map
+HISTORY_COLUMNS = (
+    ('id', Transaction.id), ('created_at', Transaction.created_at), ('type', Transaction.txn_type),
+    ('symbol', Company.symbol), ('quantity', Transaction.quantity), ('price', Transaction.price),
+    ('total_amount', Transaction.total_amount), ('commission_amount', Transaction.commission_amount),
+    ('description', Transaction.description),
+)
+
+
+def encode_history_cursor(row):
+    """Opaque cursor for the page after row: its (created_at, id)"""
+    raw = f"{row.created_at.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_history_cursor(token):
+    """(created_at, id) from encode_history_cursor; ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        created_at, txn_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(txn_id)
+    except Exception:
+        raise ValueError('Invalid cursor.') from None
+
+
+def parse_history_filters(args):
+    """Validate symbol, type, start and end (inclusive dates) query parameters; returns (filters, errors)"""
+    filters, errors = {}, []
+    symbol = args.get('symbol', '').strip().upper()
+    if symbol:
+        filters['symbol'] = symbol
+    txn_type = args.get('type', '').strip().upper()
+    if txn_type in TRANSACTION_TYPES:
+        filters['txn_type'] = txn_type
+    elif txn_type:
+        errors.append(f"type must be one of {', '.join(TRANSACTION_TYPES)}.")
+    for name in ('start', 'end'):
+        value = args.get(name, '').strip()
+        if not value:
+            continue
+        try:
+            filters[name] = datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            errors.append(f'{name} must be a date (YYYY-MM-DD).')
+    if 'start' in filters and 'end' in filters and filters['start'] > filters['end']:
+        errors.append('start must not be after end.')
+    return filters, errors
+
+
+def transaction_history_query(filters, user_id=None, after=None):
+    """
+    Transactions newest first, ordered by (created_at, id) so a page ends
+    at a unique key. after=(created_at, id) starts below that key: a
+    keyset page reads only its own rows from ix_transaction_user_created
+    (or ix_transaction_created_at for all users), however deep it is.
+    """
+    query = (db.session.query(*(column.label(name) for name, column in HISTORY_COLUMNS))
+             .join(Company, Company.id == Transaction.company_id))
+    if user_id is not None:
+        query = query.filter(Transaction.user_id == user_id)
+    if 'symbol' in filters:
+        # Resolved to company_id first so ix_transaction_user_company_created applies
+        company_id = db.select(Company.id).where(Company.symbol == filters['symbol']).scalar_subquery()
+        query = query.filter(Transaction.company_id == company_id)
+    if 'txn_type' in filters:
+        query = query.filter(Transaction.txn_type == filters['txn_type'])
+    if 'start' in filters:
+        query = query.filter(Transaction.created_at >= filters['start'])
+    if 'end' in filters:
+        query = query.filter(Transaction.created_at < filters['end'] + dt.timedelta(days=1))
+    if after is not None:
+        # A row-value comparison is one index range; the equivalent
+        # created_at < ? OR (created_at = ? AND id < ?) is not on SQLite
+        query = query.filter(db.tuple_(Transaction.created_at, Transaction.id) < tuple(after))
+    return query.order_by(Transaction.created_at.desc(), Transaction.id.desc())
+
+
+def csv_chunks(header, batches):
+    """Yield CSV text: the header, then one chunk per batch of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def history_batches(filters, user_id=None, batch_size=None):
+    """The filtered history in keyset batches, each one short query"""
+    batch_size = batch_size or HISTORY_CSV_BATCH
+    after = None
+    while True:
+        rows = transaction_history_query(filters, user_id, after).limit(batch_size).all()
+        yield rows
+        if len(rows) < batch_size:
+            return
+        after = (rows[-1].created_at, rows[-1].id)
+
+
+def stream_history_csv(filters, user_id=None):
+    """Yield the filtered history as CSV, one keyset batch at a time"""
+    return csv_chunks([name for name, _ in HISTORY_COLUMNS], history_batches(filters, user_id))
+
+
+def history_response(user_id):
+    """JSON page or streamed CSV of the history, depending on the route"""
+    filters, errors = parse_history_filters(request.args)
+    if errors:
+        return jsonify({'errors': errors}), 400
+    if request.path.endswith('.csv'):
+        return Response(stream_with_context(stream_history_csv(filters, user_id)), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=transactions.csv'})
+    try:
+        limit = min(max(int(request.args.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+        after = decode_history_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({'errors': [str(e)]}), 400
+    rows = transaction_history_query(filters, user_id, after).limit(limit + 1).all()
+    page = rows[:limit]
+    transactions = []
+    for row in page:
+        item = dict(row._mapping)
+        item['created_at'] = row.created_at.isoformat()
+        for name in ('price', 'total_amount', 'commission_amount'):
+            item[name] = float(item[name])
+        transactions.append(item)
+    return jsonify({'transactions': transactions,
+                    'next_cursor': encode_history_cursor(page[-1]) if len(rows) > limit else None})
+
+
+@app.route('/transactions/history')
+@app.route('/transactions/history.csv', endpoint='transaction_history_csv')
+@login_required()
+def transaction_history():
+    """
+    The user's transactions, newest first.
+
+        GET /transactions/history?symbol=AAPL&type=BUY&start=2024-01-01&end=2024-12-31&limit=50
+        -> {"transactions": [...], "next_cursor": "..."}
+
+    Pass next_cursor back as ?cursor= for the following page; it is null on
+    the last one. /transactions/history.csv streams every matching row.
+    """
+    return history_response(session['user_id'])
+
+
+@app.route('/admin/transactions')
+@app.route('/admin/transactions.csv', endpoint='admin_transaction_history_csv')
+@login_required(role='admin')
+def admin_transaction_history():
+    # Same API across all users, or one with ?user_id=
+    user_id = request.args.get('user_id', type=int)
+    return history_response(user_id)
+
+
+# Rows per fetch of an export's server-side cursor, and per Parquet row group
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_FORMATS = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+
+def export_statement(dataset, user_id):
+    """SELECT behind /export/<dataset> for a user, or None for an unknown dataset"""
+    if dataset == 'transactions':
+        return (db.select(*(column.label(name) for name, column in HISTORY_COLUMNS))
+                .join_from(Transaction, Company, Company.id == Transaction.company_id)
+                .where(Transaction.user_id == user_id)
+                .order_by(Transaction.created_at, Transaction.id))
+    if dataset == 'portfolio':
+        # Positions with their ledger totals; positions without a ledger row export nulls
+        return (db.select(Company.symbol, PortfolioItem.quantity, PortfolioItem.average_buy_price,
+                          PortfolioItem.created_at.label('opened_at'), PositionLedger.cost_basis,
+                          PositionLedger.realized_pnl, PositionLedger.dividends, PositionLedger.commissions)
+                .join_from(PortfolioItem, Company, Company.id == PortfolioItem.company_id)
+                .outerjoin(PositionLedger, db.and_(PositionLedger.user_id == PortfolioItem.user_id,
+                                                   PositionLedger.company_id == PortfolioItem.company_id))
+                .where(PortfolioItem.user_id == user_id)
+                .order_by(Company.symbol))
+    if dataset == 'dividends':
+        return (db.select(Dividend.id, Dividend.created_at, Dividend.payable_date, Company.symbol,
+                          Dividend.amount_per_share, Dividend.total_amount, Dividend.payout_id)
+                .join_from(Dividend, PortfolioItem, PortfolioItem.id == Dividend.portfolio_item_id)
+                .join(Company, Company.id == PortfolioItem.company_id)
+                .where(PortfolioItem.user_id == user_id)
+                .order_by(Dividend.id))
+    return None
+
+
+def arrow_schema(stmt):
+    """Parquet schema for a select's columns, keeping decimals exact"""
+    import pyarrow as pa
+    fields = []
+    for column in stmt.selected_columns:
+        column_type = column.type
+        if isinstance(column_type, db.Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column_type, db.Numeric):
+            arrow_type = pa.decimal128(column_type.precision or 38, column_type.scale or 0)
+        elif isinstance(column_type, db.DateTime):
+            arrow_type = pa.timestamp('us')
+        elif isinstance(column_type, db.Date):
+            arrow_type = pa.date32()
+        elif isinstance(column_type, db.Boolean):
+            arrow_type = pa.bool_()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file for ParquetWriter whose bytes are drained into the response"""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def parquet_chunks(schema, batches):
+    """Yield a Parquet file with one row group per batch of rows"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream_export(stmt, fmt):
+    """
+    Run stmt on a server-side cursor (a named cursor on PostgreSQL; SQLite
+    steps through results natively) and encode it EXPORT_CHUNK_ROWS rows at
+    a time, so memory stays flat however long the history is.
+    """
+    result = db.session.execute(stmt, execution_options={'yield_per': EXPORT_CHUNK_ROWS})
+    if fmt == 'csv':
+        yield from csv_chunks(list(result.keys()), result.partitions())
+    else:
+        yield from parquet_chunks(arrow_schema(stmt), result.partitions())
+
+
+@app.route('/export/<dataset>.<fmt>')
+@login_required()
+def export_data(dataset, fmt):
+    """
+    Download the user's data, streamed as it is read.
+
+        GET /export/transactions.csv    /export/portfolio.parquet    /export/dividends.csv
+
+    Datasets: transactions, portfolio (positions with ledger totals) and
+    dividends; formats: csv and parquet.
+    """
+    stmt = export_statement(dataset, session['user_id'])
+    if stmt is None or fmt not in EXPORT_FORMATS:
+        abort(404)
+    return Response(stream_with_context(stream_export(stmt, fmt)), mimetype=EXPORT_FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={dataset}.{fmt}'})
+
+
 @app.route('/admin')
 @login_required(role='admin')
 def admin_dashboard():
     user_count = User.query.count()
     broker_count = Broker.query.count()
-    transaction_count = Transaction.query.count()
+    totals = db.session.get(AnalyticsTotals, 1)
+    transaction_count = totals.transaction_count if totals else 0
     company_count = Company.query.count()
-    recent_transactions = Transaction.query.order_by(Transaction.created_at.desc()).limit(25).all()
-    brokers = Broker.query.order_by(Broker.name.asc()).all()
+    recent_transactions = (Transaction.query
+                           .options(db.joinedload(Transaction.user), db.joinedload(Transaction.company))
+                           .order_by(Transaction.created_at.desc()).limit(25).all())
+    brokers = (Broker.query.options(db.selectinload(Broker.commission_tiers))
+               .order_by(Broker.name.asc()).all())
     companies = Company.query.order_by(Company.symbol.asc()).all()
 
-    all_transactions = Transaction.query.all()
-    total_commission = Decimal('0')
-    total_volume = 0
-    txn_type_counts = {}
-    symbol_totals = {}
-    for t in all_transactions:
-        if t.commission_amount is not None:
-            total_commission += Decimal(t.commission_amount)
-        if t.txn_type in ('BUY', 'SELL'):
-            total_volume += t.quantity
-        txn_type_counts[t.txn_type] = txn_type_counts.get(t.txn_type, 0) + 1
-        symbol = t.company.symbol if t.company else None
-        if symbol:
-            data = symbol_totals.setdefault(symbol, {'quantity': 0, 'value': Decimal('0')})
-            data['quantity'] += t.quantity
-            if t.total_amount is not None:
-                data['value'] += Decimal(t.total_amount)
-
-    txn_type_labels = list(txn_type_counts.keys())
-    txn_type_values = list(txn_type_counts.values())
-
-    top_symbols_sorted = sorted(symbol_totals.items(), key=lambda kv: kv[1]['value'], reverse=True)[:5]
-    top_symbol_labels = [s for s, _ in top_symbols_sorted]
-    top_symbol_values = [float(stats['value']) for _, stats in top_symbols_sorted]
+    # Aggregates are maintained per trade, so none of this scans Transaction
+    total_commission = totals.total_commission if totals else Decimal('0')
+    total_volume = totals.total_volume if totals else 0
+    type_stats = (TransactionTypeStats.query.filter(TransactionTypeStats.txn_count > 0)
+                  .order_by(TransactionTypeStats.txn_type).all())
+    txn_type_labels = [s.txn_type for s in type_stats]
+    txn_type_values = [s.txn_count for s in type_stats]
+
+    top_symbols = (db.session.query(Company.symbol, SymbolStats.total_value)
+                   .join(Company, Company.id == SymbolStats.company_id)
+                   .order_by(SymbolStats.total_value.desc()).limit(5).all())
+    top_symbol_labels = [symbol for symbol, _ in top_symbols]
+    top_symbol_values = [float(value) for _, value in top_symbols]
 
     return render_template(
         'admin_dashboard.html',
@@ -579,91 +1734,124 @@ def admin_add_broker():
     return redirect(url_for('admin_dashboard'))
 
 
+@app.route('/admin/brokers/<int:broker_id>/tiers', methods=['POST'])
+@login_required(role='admin')
+def admin_add_commission_tier(broker_id):
+    verify_csrf()
+    broker = db.session.get(Broker, broker_id)
+    if not broker:
+        abort(404)
+    basis = request.form.get('basis', 'notional').strip().lower()
+    try:
+        min_amount = Decimal(request.form.get('min_amount', '').strip())
+        commission = Decimal(request.form.get('commission_rate', '').strip())
+    except Exception:
+        flash('Invalid tier threshold or commission rate.', 'danger')
+        return redirect(url_for('admin_dashboard'))
+    if basis not in COMMISSION_BASES:
+        flash('Tier basis must be notional or quantity.', 'danger')
+        return redirect(url_for('admin_dashboard'))
+    if min_amount < 0 or commission < 0:
+        flash('Tier threshold and commission rate cannot be negative.', 'danger')
+        return redirect(url_for('admin_dashboard'))
+    if any(tier.basis != basis for tier in broker.commission_tiers):
+        flash('All tiers of a broker must use the same basis.', 'danger')
+        return redirect(url_for('admin_dashboard'))
+    db.session.add(CommissionTier(broker_id=broker.id, basis=basis, min_amount=min_amount,
+                                  commission_rate=commission))
+    db.session.commit()
+    flash('Commission tier added.', 'success')
+    return redirect(url_for('admin_dashboard'))
+
+
+@app.route('/admin/companies/<int:company_id>/dividend', methods=['POST'])
+@login_required(role='admin')
+def admin_pay_dividend(company_id):
+    verify_csrf()
+    company = db.session.get(Company, company_id)
+    if not company:
+        abort(404)
+    try:
+        amount_per_share = Decimal(request.form.get('amount_per_share', '').strip())
+        payable_raw = request.form.get('payable_date', '').strip()
+        payable_date = datetime.strptime(payable_raw, '%Y-%m-%d').date() if payable_raw else None
+    except Exception:
+        flash('Invalid dividend amount or payable date.', 'danger')
+        return redirect(url_for('admin_dashboard'))
+    if amount_per_share <= 0:
+        flash('Dividend amount must be greater than zero.', 'danger')
+        return redirect(url_for('admin_dashboard'))
+    try:
+        payout = run_in_transaction(lambda: pay_company_dividend(company.id, amount_per_share, payable_date))
+    except OrderRejected as e:
+        flash(str(e), e.category)
+        return redirect(url_for('admin_dashboard'))
+    flash(f'Dividend of {payout.total_amount} paid to {payout.holder_count} holder(s) of {company.symbol}.', 'success')
+    return redirect(url_for('admin_dashboard'))
+
+
+@app.route('/admin/sentiment-health')
+@login_required(role='admin')
+def admin_sentiment_health():
+    # Circuit breaker state and latency histograms of the news providers
+    return jsonify(get_source_health())
+
+
+@app.route('/admin/rate-limits')
+@login_required(role='admin')
+def admin_rate_limits():
+    # Per-host token buckets and queue waits by priority class
+    return jsonify(rate_limiter.metrics())
+
+
+@app.route('/admin/market-data')
+@login_required(role='admin')
+def admin_market_data():
+    # Attempts and timings per provider, the latest history fetches and the prewarm runs
+    return jsonify(dict(market_data.metrics(), prewarm=price_prewarmer.status()))
+
+
 
 
 @app.route('/')
 def index():
    return render_template('index.html')
 
+
+# Suggestions returned by /symbols/search at most
+SYMBOL_SEARCH_MAX = 25
+
+
+@app.route('/symbols/search')
+def symbol_search():
+    """Autocomplete for the prediction form: listed companies, then the ticker index"""
+    prefix = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 10, type=int), 1), SYMBOL_SEARCH_MAX)
+    if not prefix:
+        return jsonify([])
+    # Range scan on the unique symbol index, so the LIKE prefix never reads the whole table
+    upper = prefix.upper()
+    companies = db.session.query(Company.symbol, Company.name, Company.exchange).filter(
+        Company.symbol >= upper, Company.symbol < upper + '\uffff'
+    ).order_by(Company.symbol).limit(limit).all()
+    results = {}
+    for symbol, name, exchange in companies:
+        results[symbol] = {'symbol': symbol, 'name': name or '', 'exchange': exchange or ''}
+    for listing in symbol_index.get_index().search(prefix, limit):
+        if len(results) >= limit:
+            break
+        results.setdefault(listing.symbol, {'symbol': listing.symbol, 'name': listing.name,
+                                            'exchange': listing.exchange})
+    return jsonify(list(results.values())[:limit])
+
 @app.route('/predict',methods = ['POST'])
 def predict():
     nm = request.form['nm']
 
-    #**************** FUNCTIONS TO FETCH DATA ***************************
-    def get_historical(quote):
-        import time, os
-        quote = quote.upper()
-        filename = f'{quote}.csv'
-        
-        # 1. Reuse local data if it's up-to-date (updated today)
-        if os.path.exists(filename):
-            try:
-                df_temp = pd.read_csv(filename)
-                if not df_temp.empty and 'Date' in df_temp.columns:
-                    last_date = pd.to_datetime(df_temp['Date'].iloc[-1]).date()
-                    if last_date >= datetime.now().date():
-                        print(f"DEBUG: Reusing local up-to-date data for {quote}")
-                        return
-                    # If file exists but is old, we'll proceed to update it
-                    print(f"DEBUG: Local data for {quote} is outdated (Last date: {last_date}). Updating...")
-            except Exception as e:
-                print(f"DEBUG: Local file check failed, downloading fresh: {e}")
-
-        end = datetime.now()
-        start = datetime(end.year-2, end.month, end.day)
-        
-        # 2. Try yfinance with multiple attempts
-        data = pd.DataFrame()
-        for attempt in range(3):
-            try:
-                # Removed custom session as it caused issues with curl_cffi in this environment
-                data = yf.download(quote, start=start, end=end, progress=False)
-                if not data.empty:
-                    break
-                time.sleep(1)
-            except Exception as e:
-                print(f"yfinance attempt {attempt+1} failed for {quote}: {e}")
-                time.sleep(1)
-
-        # 3. Process and Save yfinance data
-        if not data.empty:
-            if isinstance(data.columns, pd.MultiIndex):
-                data.columns = data.columns.get_level_values(0)
-            data = data.reset_index()
-            df = pd.DataFrame(data=data)
-            df.to_csv(filename, index=False)
-            return
-
-        # 4. Fallback to Alpha Vantage (Global symbols)
-        print(f"yfinance failed for {quote}, falling back to Alpha Vantage...")
-        try:
-            ts = TimeSeries(key='N6A6QT6IBFJOPJ70', output_format='pandas')
-            # Use get_daily instead of get_daily_adjusted as the latter is often premium
-            try:
-                data, meta_data = ts.get_daily(symbol=quote, outputsize='full')
-            except Exception as e:
-                print(f"Direct Alpha Vantage lookup failed: {e}. Trying NSE fallback...")
-                data, meta_data = ts.get_daily(symbol='NSE:'+quote, outputsize='full')
-            
-            data = data.head(503).iloc[::-1]
-            data = data.reset_index()
-            df = pd.DataFrame()
-            df['Date'] = data['date']
-            df['Open'] = data['1. open']
-            df['High'] = data['2. high']
-            df['Low'] = data['3. low']
-            df['Close'] = data['4. close']
-            # Map Close to Adj Close for consistency since non-adjusted doesn't have it
-            df['Adj Close'] = data['4. close']
-            df['Volume'] = data['5. volume']
-            df.to_csv(filename, index=False)
-        except Exception as e:
-            print(f"Global lookup failed for {quote}: {e}")
-            raise Exception(f"Could not fetch data for {quote} from any source.")
-        return
-
     #******************** ARIMA SECTION ********************
     def ARIMA_ALGO(df):
+        from statsmodels.tsa.arima.model import ARIMA
+        from sklearn.metrics import mean_squared_error
         uniqueVals = df["Code"].unique()  
         len(uniqueVals)
         df=df.set_index("Code")
@@ -740,6 +1928,7 @@ def predict():
 
         #Feature Scaling
         from sklearn.preprocessing import MinMaxScaler
+        from sklearn.metrics import mean_squared_error
         sc=MinMaxScaler(feature_range=(0,1))#Scaled values btween 0,1
         training_set_scaled=sc.fit_transform(training_set)
         #In scaling, fit_transform for training, transform for test
@@ -884,6 +2073,8 @@ def predict():
         
         # Feature Scaling===Normalization
         from sklearn.preprocessing import StandardScaler
+        from sklearn.linear_model import LinearRegression
+        from sklearn.metrics import mean_squared_error
         sc = StandardScaler()
         X_train = sc.fit_transform(X_train)
         X_test = sc.transform(X_test)
@@ -969,9 +2160,15 @@ def predict():
         traceback.print_exc()
         return render_template('index.html',not_found=True)
     else:
+        # Keeps the symbol on the prewarm list; never worth failing a prediction over
+        try:
+            record_prediction(quote)
+        except Exception as e:
+            db.session.rollback()
+            print(f"DEBUG: Could not record prediction of {quote}: {e}")
     
         #************** PREPROCESSUNG ***********************
-        df = pd.read_csv(''+quote+'.csv')
+        df = load_price_history(quote)
         print("##############################################################################")
         print("Today's",quote,"Stock Data: ")
         today_stock=df.iloc[-1:]
@@ -0,0 +1,519 @@
+# -*- coding: utf-8 -*-
+"""
+Pluggable market-data providers for price history and latest quotes.
+
+MARKET_DATA_PROVIDER lists the providers to use, in order of preference:
+
+    yfinance      Yahoo Finance through yfinance
+    alphavantage  Alpha Vantage daily series, trying the NSE:/BSE: form of
+                  Indian listings (symbol_index) and the NSE: prefix;
+                  needs ALPHA_VANTAGE_API_KEY and is skipped without it
+    replay        the stored {SYMBOL}.csv files in MARKET_DATA_REPLAY_DIR,
+                  answered after MARKET_DATA_REPLAY_LATENCY_MS, so prediction
+                  and dashboard throughput can be measured offline and
+                  deterministically
+
+The default, "yfinance,alphavantage", is the behaviour before providers.
+Latest closes come from the first provider only: Alpha Vantage's five
+calls a minute cannot keep up with a dashboard.
+
+History requests are hedged: the first provider starts at once and the next
+one joins after MARKET_DATA_HEDGE_AFTER seconds, or as soon as the running
+ones have failed. The first non-empty answer wins. Within a provider,
+attempts follow the shared RetryPolicy (exponential backoff with full
+jitter), and everything stops at the MARKET_DATA_DEADLINE. Each request's
+FetchReport records which provider served it and how long every attempt
+took; metrics() aggregates them per provider.
+"""
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+import rate_limiter
+import symbol_index
+
+DEFAULT_PROVIDERS = 'yfinance,alphavantage'
+# Hard limit on one history request, queueing and retries included
+HISTORY_DEADLINE = float(os.environ.get('MARKET_DATA_DEADLINE', '20'))
+# Start the next provider when the running ones have not answered by then
+HEDGE_AFTER = float(os.environ.get('MARKET_DATA_HEDGE_AFTER', '4'))
+RETRY_ATTEMPTS = int(os.environ.get('MARKET_DATA_RETRY_ATTEMPTS', '3'))
+RETRY_BASE_DELAY = float(os.environ.get('MARKET_DATA_RETRY_BASE_DELAY', '0.5'))
+RETRY_MAX_DELAY = float(os.environ.get('MARKET_DATA_RETRY_MAX_DELAY', '4'))
+# Threads running provider calls; a provider still running after the
+# deadline keeps its thread until its download returns
+FETCH_WORKERS = int(os.environ.get('MARKET_DATA_WORKERS', '8'))
+# Reports kept for the admin metrics
+RECENT_REPORTS = 20
+# Column layout of every history frame, oldest row first
+OHLCV_COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+# Window downloaded for latest closes; covers weekends and holidays
+LATEST_CLOSE_DAYS = 10
+# Longest a quote waits for a rate-limit slot: quotes are asked for inside
+# dashboard and trade requests, which should fail fast rather than hang
+QUOTE_ACQUIRE_TIMEOUT = float(os.environ.get('MARKET_DATA_QUOTE_TIMEOUT', '5'))
+
+
+class MarketDataError(Exception):
+    """Raised when no provider could serve a request; report holds the attempts made"""
+
+    def __init__(self, message: str, report: 'FetchReport' = None):
+        super().__init__(message)
+        self.report = report
+
+
+class DeadlineExceeded(MarketDataError):
+    """Raised when a request runs out of its total time budget"""
+
+
+Attempt = namedtuple('Attempt', 'provider label number seconds outcome')
+
+
+class FetchReport:
+    """Deadline and attempt log of one history request, shared by the providers serving it"""
+
+    def __init__(self, symbol: str, deadline: float):
+        self.symbol = symbol
+        self.started = time.monotonic()
+        self.deadline = self.started + deadline
+        self.attempts = []
+        self.provider = None
+        self.seconds = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.seconds is not None
+
+    def remaining(self) -> float:
+        """Seconds left; zero once the request is answered, so losing providers stop retrying"""
+        if self.finished:
+            return 0.0
+        return max(0.0, self.deadline - time.monotonic())
+
+    def record(self, provider: str, label: str, number: int, seconds: float, outcome: str):
+        with self._lock:
+            self.attempts.append(Attempt(provider, label, number, seconds, outcome))
+
+    def finish(self, provider: Optional[str]):
+        with self._lock:
+            if not self.finished:
+                self.provider = provider
+                self.seconds = time.monotonic() - self.started
+
+    def summary(self) -> str:
+        """One line for the logs, e.g. 'AAPL from yfinance in 0.62s: yfinance AAPL #1 0.61s ok'"""
+        with self._lock:
+            attempts = '; '.join(f"{a.provider} {a.label} #{a.number} {a.seconds:.2f}s {a.outcome}"
+                                 for a in self.attempts)
+        source = f"from {self.provider}" if self.provider else "from no provider"
+        return f"{self.symbol} {source} in {self.seconds or 0:.2f}s: {attempts or 'no attempts'}"
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'symbol': self.symbol,
+                'provider': self.provider,
+                'seconds': round(self.seconds or 0, 3),
+                'attempts': [dict(a._asdict(), seconds=round(a.seconds, 3)) for a in self.attempts],
+            }
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: before retry n the caller sleeps a
+    random time up to min(max_delay, base_delay * 2**(n-1)). Retries stop at
+    the report's deadline and on errors retryable() rejects.
+    """
+
+    def __init__(self, attempts: int = RETRY_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY, rng: random.Random = None):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng or random.Random()
+
+    def delay(self, retry: int) -> float:
+        """Pause before the given retry (1 for the second attempt)"""
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+    def retryable(self, error: Exception) -> bool:
+        # A full rate-limit queue or a throttled host will not clear within a retry
+        return not isinstance(error, rate_limiter.RateLimitTimeout) and 'RateLimit' not in type(error).__name__
+
+    def call(self, fn: Callable[[float], pd.DataFrame], report: FetchReport, provider: str, label: str):
+        """
+        fn(timeout) until it returns a non-empty frame; an empty frame counts
+        as a failed attempt. Returns the last frame, or re-raises the last error
+        once the attempts or the deadline run out.
+        """
+        frame = pd.DataFrame(columns=OHLCV_COLUMNS)
+        for number in range(1, self.attempts + 1):
+            remaining = report.remaining()
+            if remaining <= 0:
+                break
+            started = time.monotonic()
+            try:
+                frame = fn(remaining)
+            except Exception as e:
+                report.record(provider, label, number, time.monotonic() - started, f"error: {e}")
+                if number == self.attempts or not self.retryable(e):
+                    raise
+            else:
+                outcome = 'empty' if frame.empty else 'ok'
+                report.record(provider, label, number, time.monotonic() - started, outcome)
+                if not frame.empty:
+                    return frame
+            if number < self.attempts:
+                pause = self.delay(number)
+                if pause >= report.remaining():
+                    break
+                time.sleep(pause)
+        return frame
+
+
+def ohlcv(frame: pd.DataFrame) -> pd.DataFrame:
+    """frame reduced to OHLCV_COLUMNS with a datetime Date column, oldest first"""
+    if isinstance(frame.columns, pd.MultiIndex):
+        frame = frame.copy()
+        frame.columns = frame.columns.get_level_values(0)
+    if 'Date' not in frame.columns:
+        frame = frame.rename_axis('Date').reset_index()
+    frame = frame.copy()
+    frame['Date'] = pd.to_datetime(frame['Date'])
+    if 'Adj Close' not in frame.columns:
+        frame['Adj Close'] = frame['Close']
+    return frame[OHLCV_COLUMNS].sort_values('Date').reset_index(drop=True)
+
+
+def last_two_closes(closes: pd.Series) -> Optional[Tuple[float, float]]:
+    """(latest, previous) close; previous repeats latest for a single row"""
+    closes = closes.dropna()
+    if closes.empty:
+        return None
+    previous = closes.iloc[-2] if len(closes) >= 2 else closes.iloc[-1]
+    return float(closes.iloc[-1]), float(previous)
+
+
+class MarketDataProvider:
+    """Interface every provider implements"""
+
+    name = ''
+    # History is already stored locally, so there is nothing to refresh
+    local = False
+
+    def history(self, symbol: str, start: datetime, end: datetime,
+                report: FetchReport = None) -> pd.DataFrame:
+        """
+        Daily OHLCV for symbol between start and end (see ohlcv); empty if
+        unavailable. Attempts are timed into report and bounded by its deadline.
+        """
+        raise NotImplementedError
+
+    def latest_closes(self, symbols: Iterable[str]) -> Dict[str, Tuple[float, float]]:
+        """{symbol: (latest, previous)} close; symbols without data are left out"""
+        end = datetime.now()
+        start = end - timedelta(days=LATEST_CLOSE_DAYS)
+        prices = {}
+        for symbol in sorted(set(symbols)):
+            frame = self.history(symbol, start, end)
+            closes = last_two_closes(frame['Close']) if not frame.empty else None
+            if closes:
+                prices[symbol] = closes
+        return prices
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Yahoo Finance, paced by the shared finance.yahoo.com bucket"""
+
+    name = 'yfinance'
+    host = 'finance.yahoo.com'
+
+    def __init__(self, retry: RetryPolicy = None):
+        self.retry = retry or RetryPolicy()
+
+    def history(self, symbol, start, end, report=None):
+        import yfinance as yf
+        report = report or FetchReport(symbol, HISTORY_DEADLINE)
+
+        def download(timeout):
+            rate_limiter.acquire(self.host, timeout=min(timeout, rate_limiter.DEFAULT_ACQUIRE_TIMEOUT))
+            try:
+                return yf.download(symbol, start=start, end=end, progress=False)
+            except Exception as e:
+                if 'RateLimit' in type(e).__name__:
+                    # Yahoo is throttling us: pause the host and let the next provider answer
+                    rate_limiter.limiter.penalize(self.host, rate_limiter.DEFAULT_THROTTLE_PAUSE)
+                raise
+
+        data = self.retry.call(download, report, self.name, symbol)
+        return ohlcv(data) if not data.empty else pd.DataFrame(columns=OHLCV_COLUMNS)
+
+    def latest_closes(self, symbols):
+        # One multi-ticker download instead of one request per symbol
+        symbols = sorted(set(symbols))
+        if not symbols:
+            return {}
+        import yfinance as yf
+        end = datetime.now()
+        start = end - timedelta(days=LATEST_CLOSE_DAYS)
+        try:
+            rate_limiter.acquire(self.host, timeout=QUOTE_ACQUIRE_TIMEOUT)
+        except rate_limiter.RateLimitTimeout:
+            print(f"No rate-limit slot for quotes of {', '.join(symbols)} within {QUOTE_ACQUIRE_TIMEOUT:g}s")
+            return {}
+        data = yf.download(symbols, start=start, end=end)
+        if data.empty:
+            return {}
+        close = data['Close']
+        if isinstance(close, pd.Series):
+            close = close.to_frame(symbols[0])
+        prices = {}
+        for symbol in symbols:
+            if symbol in close.columns:
+                closes = last_two_closes(close[symbol])
+                if closes:
+                    prices[symbol] = closes
+        return prices
+
+
+class AlphaVantageProvider(MarketDataProvider):
+    """Alpha Vantage daily series (free tier: five calls a minute)"""
+
+    name = 'alphavantage'
+    host = 'alphavantage.co'
+
+    def __init__(self, api_key: str, retry: RetryPolicy = None):
+        self.api_key = api_key
+        # One call per symbol form: the free tier's quota is better spent on NSE:
+        self.retry = retry or RetryPolicy(attempts=1)
+
+    def history(self, symbol, start, end, report=None):
+        from alpha_vantage.timeseries import TimeSeries
+        ts = TimeSeries(key=self.api_key, output_format='pandas')
+        report = report or FetchReport(symbol, HISTORY_DEADLINE)
+
+        def daily(av_symbol):
+            def call(timeout):
+                rate_limiter.acquire(self.host, timeout=min(timeout, rate_limiter.DEFAULT_ACQUIRE_TIMEOUT))
+                # get_daily rather than get_daily_adjusted, which is often premium
+                return ts.get_daily(symbol=av_symbol, outputsize='full')[0]
+            return self.retry.call(call, report, self.name, av_symbol)
+
+        # The NSE:/BSE: form first when the index knows the listing, then plain, then NSE:
+        forms = symbol_index.get_index().alpha_vantage_symbols(symbol)
+        data = pd.DataFrame()
+        for position, av_symbol in enumerate(forms):
+            try:
+                data = daily(av_symbol)
+            except rate_limiter.RateLimitTimeout:
+                raise
+            except Exception as e:
+                if position == len(forms) - 1:
+                    raise
+                print(f"Alpha Vantage lookup of {av_symbol} failed: {e}. Trying {forms[position + 1]}...")
+                continue
+            if not data.empty:
+                break
+        if data.empty:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+
+        data = data.rename(columns={'1. open': 'Open', '2. high': 'High', '3. low': 'Low',
+                                    '4. close': 'Close', '5. volume': 'Volume'})
+        frame = ohlcv(data.rename_axis('Date').reset_index())
+        return frame[(frame['Date'] >= pd.Timestamp(start).normalize()) & (frame['Date'] <= pd.Timestamp(end))]
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Serves the stored {SYMBOL}.csv files (any case) from directory after a
+    fixed latency. History is the whole stored series whatever the requested
+    range, and the latest closes are its last two rows, so results do not
+    change with the calendar.
+    """
+
+    name = 'replay'
+    local = True
+
+    def __init__(self, directory: str = '.', latency: float = 0.0):
+        self.directory = os.path.abspath(directory)
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._paths = {}
+        self._frames = {}
+
+    def _path(self, symbol: str) -> Optional[str]:
+        key = symbol.upper()
+        with self._lock:
+            if key not in self._paths:
+                self._paths = {name[:-4].upper(): os.path.join(self.directory, name)
+                               for name in sorted(os.listdir(self.directory)) if name.endswith('.csv')}
+            return self._paths.get(key)
+
+    def _frame(self, symbol: str) -> pd.DataFrame:
+        if self.latency:
+            time.sleep(self.latency)
+        path = self._path(symbol)
+        if path is None:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = self._frames.get(path)
+        if cached is None or cached[0] != version:
+            cached = (version, ohlcv(pd.read_csv(path)))
+            self._frames[path] = cached
+        return cached[1]
+
+    def history(self, symbol, start, end, report=None):
+        started = time.monotonic()
+        frame = self._frame(symbol).copy()
+        if report is not None:
+            report.record(self.name, symbol, 1, time.monotonic() - started, 'empty' if frame.empty else 'ok')
+        return frame
+
+    def latest_closes(self, symbols):
+        prices = {}
+        for symbol in sorted(set(symbols)):
+            frame = self._frame(symbol)
+            closes = last_two_closes(frame['Close']) if not frame.empty else None
+            if closes:
+                prices[symbol] = closes
+        return prices
+
+
+def build_providers(names: str = None) -> List[MarketDataProvider]:
+    """Providers named in names (default: MARKET_DATA_PROVIDER); ValueError if unknown"""
+    names = names or os.environ.get('MARKET_DATA_PROVIDER', DEFAULT_PROVIDERS)
+    providers = []
+    for name in (part.strip().lower() for part in names.split(',')):
+        if name == 'yfinance':
+            providers.append(YFinanceProvider())
+        elif name == 'alphavantage':
+            api_key = os.environ.get('ALPHA_VANTAGE_API_KEY')
+            if api_key:
+                providers.append(AlphaVantageProvider(api_key))
+        elif name == 'replay':
+            providers.append(ReplayProvider(
+                os.environ.get('MARKET_DATA_REPLAY_DIR', '.'),
+                float(os.environ.get('MARKET_DATA_REPLAY_LATENCY_MS', '0')) / 1000,
+            ))
+        elif name:
+            raise ValueError(f"Unknown market-data provider {name!r}; use yfinance, alphavantage or replay")
+    if not providers:
+        raise ValueError(f"MARKET_DATA_PROVIDER {names!r} leaves no usable provider")
+    return providers
+
+
+_providers = None
+_providers_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='market-data')
+_metrics_lock = threading.Lock()
+_provider_stats = {}
+_recent_reports = deque(maxlen=RECENT_REPORTS)
+
+
+def providers() -> List[MarketDataProvider]:
+    """The configured providers, built from the environment on first use"""
+    global _providers
+    with _providers_lock:
+        if _providers is None:
+            _providers = build_providers()
+        return _providers
+
+
+def configure(names_or_providers) -> List[MarketDataProvider]:
+    """Replace the configured providers, e.g. configure('replay') in a benchmark"""
+    global _providers
+    if isinstance(names_or_providers, str):
+        names_or_providers = build_providers(names_or_providers)
+    with _providers_lock:
+        _providers = list(names_or_providers)
+        return _providers
+
+
+def _stats(provider: str) -> Dict:
+    return _provider_stats.setdefault(provider, {
+        'served': 0, 'attempts': 0, 'failed_attempts': 0, 'seconds_sum': 0.0, 'seconds_max': 0.0})
+
+
+def _record(report: FetchReport):
+    with _metrics_lock:
+        _recent_reports.append(report.as_dict())
+        for attempt in report.attempts:
+            stats = _stats(attempt.provider)
+            stats['attempts'] += 1
+            stats['failed_attempts'] += attempt.outcome != 'ok'
+            stats['seconds_sum'] += attempt.seconds
+            stats['seconds_max'] = max(stats['seconds_max'], attempt.seconds)
+        if report.provider:
+            _stats(report.provider)['served'] += 1
+
+
+def history(symbol: str, start: datetime, end: datetime, deadline: float = None,
+            hedge_after: float = None) -> Tuple[pd.DataFrame, FetchReport]:
+    """
+    (frame, report) from the first provider to answer with data, hedging as
+    described above. Raises MarketDataError (DeadlineExceeded when time ran
+    out) with the report attached if no provider had the symbol.
+    """
+    report = FetchReport(symbol, HISTORY_DEADLINE if deadline is None else deadline)
+    hedge_after = HEDGE_AFTER if hedge_after is None else hedge_after
+    waiting = list(providers())
+    running = {}
+    next_start = report.started
+    try:
+        while True:
+            now = time.monotonic()
+            if waiting and (not running or now >= next_start):
+                provider = waiting.pop(0)
+                # Copy the context so the call keeps the caller's rate-limit priority
+                context = contextvars.copy_context()
+                running[_executor.submit(context.run, provider.history, symbol, start, end, report)] = provider
+                next_start = now + hedge_after
+                continue
+            remaining = report.remaining()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"Could not fetch data for {symbol} within {report.deadline - report.started:g}s.",
+                                       report)
+            timeout = min(remaining, max(0.0, next_start - now)) if waiting else remaining
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = running.pop(future)
+                try:
+                    frame = future.result()
+                except Exception as e:
+                    print(f"{provider.name} history failed for {symbol}: {e}")
+                    continue
+                if not frame.empty:
+                    report.finish(provider.name)
+                    return frame, report
+                print(f"{provider.name} returned no history for {symbol}")
+            if not running and not waiting:
+                raise MarketDataError(f"Could not fetch data for {symbol} from any source.", report)
+    finally:
+        report.finish(None)
+        _record(report)
+
+
+def metrics() -> Dict:
+    """Per-provider attempt counts and timings, and the most recent history requests"""
+    with _metrics_lock:
+        return {
+            'providers': {name: dict(stats, seconds_sum=round(stats['seconds_sum'], 3),
+                                     seconds_max=round(stats['seconds_max'], 3))
+                          for name, stats in _provider_stats.items()},
+            'recent': list(_recent_reports),
+        }
+
+
+def latest_closes(symbols: Iterable[str]) -> Dict[str, Tuple[float, float]]:
+    """{symbol: (latest, previous)} from the first configured provider"""
+    return providers()[0].latest_closes(symbols)
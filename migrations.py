@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+In-place schema upgrades for existing databases.
+
+db.create_all() only creates missing tables, so databases created before an
+index or constraint was added to a model never receive it. upgrade_schema()
+runs after create_all() on every start and is idempotent:
+
+1. adds columns declared on the models that existing tables lack (they
+   need a server default or must be nullable);
+2. merges duplicate portfolio positions (same user and company) so the
+   unique (user_id, company_id) index can be built;
+3. creates every index declared on the models that the database lacks.
+
+Run it by hand against DATABASE_URL with:
+
+    python migrations.py
+"""
+from decimal import Decimal
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
+
+def merge_duplicate_portfolio_items(connection) -> int:
+    """
+    Collapse duplicate (user_id, company_id) positions into the oldest row,
+    keeping total quantity and the quantity-weighted average buy price, and
+    move their dividends to it. Returns the number of rows removed.
+    """
+    groups = connection.execute(text(
+        "SELECT user_id, company_id FROM portfolio_item "
+        "GROUP BY user_id, company_id HAVING COUNT(*) > 1"
+    )).fetchall()
+    removed = 0
+    for user_id, company_id in groups:
+        rows = connection.execute(text(
+            "SELECT id, quantity, average_buy_price FROM portfolio_item "
+            "WHERE user_id = :user_id AND company_id = :company_id ORDER BY id"
+        ), {'user_id': user_id, 'company_id': company_id}).fetchall()
+        keep_id = rows[0][0]
+        quantity = sum(int(r[1] or 0) for r in rows)
+        cost = sum(Decimal(str(r[2] or 0)) * int(r[1] or 0) for r in rows)
+        average = (cost / quantity).quantize(Decimal('0.01')) if quantity > 0 else Decimal(str(rows[0][2] or 0))
+        connection.execute(text(
+            "UPDATE portfolio_item SET quantity = :quantity, average_buy_price = :average WHERE id = :id"
+        ), {'quantity': quantity, 'average': str(average), 'id': keep_id})
+        for duplicate_id, _, _ in rows[1:]:
+            connection.execute(text(
+                "UPDATE dividend SET portfolio_item_id = :keep_id WHERE portfolio_item_id = :id"
+            ), {'keep_id': keep_id, 'id': duplicate_id})
+            connection.execute(text("DELETE FROM portfolio_item WHERE id = :id"), {'id': duplicate_id})
+            removed += 1
+    return removed
+
+
+def add_missing_columns(connection, metadata, inspector) -> list:
+    """ALTER TABLE ... ADD COLUMN for every model column the table lacks"""
+    added = []
+    preparer = connection.dialect.identifier_preparer
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            definition = CreateColumn(column).compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {definition}"))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def upgrade_schema(db) -> dict:
+    """Bring the bound database up to the models' schema; returns what changed"""
+    report = {'added_columns': [], 'merged_portfolio_items': 0, 'created_indexes': []}
+    engine = db.engine
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        report['added_columns'] = add_missing_columns(connection, db.metadata, inspector)
+        tables = set(inspector.get_table_names())
+        existing = {
+            table: {index['name'] for index in inspector.get_indexes(table)}
+            for table in tables
+        }
+        missing = [
+            index
+            for table in db.metadata.sorted_tables if table.name in tables
+            for index in table.indexes if index.name not in existing[table.name]
+        ]
+        if any(index.name == 'uq_portfolio_item_user_company' for index in missing):
+            report['merged_portfolio_items'] = merge_duplicate_portfolio_items(connection)
+        for index in missing:
+            index.create(bind=connection)
+            report['created_indexes'].append(index.name)
+    if report['added_columns'] or report['merged_portfolio_items'] or report['created_indexes']:
+        print(f"Schema upgraded: {report}")
+    return report
+
+
+if __name__ == '__main__':
+    # Importing main upgrades its database (see the create_all block there)
+    from main import app, db
+    with app.app_context():
+        upgrade_schema(db)
+        print(f"Schema up to date: {db.engine.url}")
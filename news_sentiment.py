@@ -29,7 +29,14 @@ import asyncio
 import aiohttp
 from enum import Enum
 import hashlib
-from typing import List, Dict, Optional, Union
+import copy
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import contextvars
 import logging
 import os
 
@@ -50,11 +57,8 @@ REDIS_AVAILABLE = False
 
 # FinVADER disabled (buggy library)
 FINVADER_AVAILABLE = False
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+# Selenium / webdriver_manager live in the optional investing_scraper plugin,
+# loaded on first use of InvestingComScraper (see __getattr__ below)
 
 # Add htmldate import for publish date extraction
 try:
@@ -66,21 +70,18 @@ except ImportError:
 
 # Import for data persistence
 import pickle
+import atexit
 
-# Download required NLTK data
-required_nltk_data = {
-    'vader_lexicon': 'sentiment/vader_lexicon.zip',
-    'punkt': 'tokenizers/punkt',
-    'stopwords': 'corpora/stopwords',
-    'wordnet': 'corpora/wordnet'
-}
+# Every outbound call shares the per-host token buckets
+import rate_limiter
+from rate_limiter import limited_get
 
-for dataset, path in required_nltk_data.items():
-    try:
-        nltk.data.find(path)
-    except LookupError:
-        print(f"Downloading NLTK dataset: {dataset}...")
-        nltk.download(dataset)
+# NLTK data is provisioned offline (python nltk_resources.py); never download here
+from nltk_resources import NLTKResourceError, use_local_data
+use_local_data()
+
+# Company names for news queries, from the shared ticker index
+import symbol_index
 
 # Define sentiment source options
 class SentimentSource(Enum):
@@ -101,219 +102,517 @@ class UseCase(Enum):
     ACADEMIC_RESEARCH = "academic"
     FINTECH_STARTUPS = "fintech"
 
-class InvestingComScraper:
+# Per-source latency budgets (seconds) for the get_sentiment fallback chain
+DEFAULT_SOURCE_DEADLINES = {
+    SentimentSource.FINVIZ_FINVADER: 12.0,
+    SentimentSource.EODHD_API: 8.0,
+    SentimentSource.ALPHA_VANTAGE: 8.0,
+    SentimentSource.TRADESTIE_REDDIT: 6.0,
+    SentimentSource.FINNHUB_SOCIAL: 6.0,
+    SentimentSource.GOOGLE_NEWS: 10.0,
+}
+# Total time get_sentiment may spend waiting on providers
+DEFAULT_SENTIMENT_BUDGET = 20.0
+
+# Batch fetchers, in the order their articles are merged
+BATCH_FETCHERS = {
+    SentimentSource.FINVIZ_FINVADER: 'get_finviz_news',
+    SentimentSource.EODHD_API: 'get_eodhd_sentiment',
+    SentimentSource.ALPHA_VANTAGE: 'get_alpha_vantage_news',
+    SentimentSource.TRADESTIE_REDDIT: 'get_tradestie_reddit',
+    SentimentSource.FINNHUB_SOCIAL: 'get_finnhub_social_sentiment',
+    SentimentSource.GOOGLE_NEWS: 'get_google_news',
+}
+# Sources whose APIs take a date range; the others only serve their current feed
+WINDOWED_SOURCES = (SentimentSource.EODHD_API, SentimentSource.ALPHA_VANTAGE, SentimentSource.FINNHUB_SOCIAL)
+LIVE_FEED_SOURCES = tuple(source for source in BATCH_FETCHERS if source not in WINDOWED_SOURCES)
+# Longest date range a backfill asks a windowed source for at once
+BACKFILL_WINDOW_DAYS = 30
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram with fixed bucket bounds (seconds)"""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += seconds
+
+    def snapshot(self) -> Dict:
+        cumulative = 0
+        buckets = {}
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            buckets['+Inf' if bound == float('inf') else str(bound)] = cumulative
+        return {'buckets': buckets, 'count': self.count, 'sum': round(self.total, 4)}
+
+
+class CircuitBreaker:
     """
-    Implements the exact scraping logic from the Stock-Prediction repo
-    Uses Selenium to scroll and scrape Investing.com
-    Kept for backward compatibility but not used in optimized flow
+    Skips a provider after repeated failures.
+    closed -> open after failure_threshold consecutive failures; after
+    cooldown seconds one trial call is let through (half_open), which
+    closes the breaker on success or reopens it on failure.
     """
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.last_error = None
+
+    def allow(self) -> bool:
+        if self.state == 'open':
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.state = 'half_open'
+            return True
+        # Only one trial call while half-open
+        return self.state == 'closed'
+
+    def record_success(self):
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.last_error = None
+
+    def record_failure(self, error=None):
+        self.consecutive_failures += 1
+        self.last_error = str(error) if error else None
+        if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+
+
+class SourceHealth:
+    """Breaker plus latency histogram for one SentimentSource"""
     def __init__(self):
-        self.options = Options()
-        self.options.add_argument('--headless')
-        self.options.add_argument('--no-sandbox')
-        self.options.add_argument('--disable-dev-shm-usage')
-        self.options.add_argument('--disable-gpu')
-        # Add user agent to avoid detection
-        self.options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
-        # Add options to prevent Google API registration errors
-        self.options.add_argument('--disable-background-networking')
-        self.options.add_argument('--disable-background-timer-throttling')
-        self.options.add_argument('--disable-backgrounding-occluded-windows')
-        self.options.add_argument('--disable-breakpad')
-        self.options.add_argument('--disable-client-side-phishing-detection')
-        self.options.add_argument('--disable-component-update')
-        self.options.add_argument('--disable-default-apps')
-        self.options.add_argument('--disable-domain-reliability')
-        self.options.add_argument('--disable-extensions')
-        self.options.add_argument('--disable-features=AudioServiceOutOfProcess')
-        self.options.add_argument('--disable-hang-monitor')
-        self.options.add_argument('--disable-ipc-flooding-protection')
-        self.options.add_argument('--disable-notifications')
-        self.options.add_argument('--disable-offer-store-unmasked-wallet-cards')
-        self.options.add_argument('--disable-popup-blocking')
-        self.options.add_argument('--disable-print-preview')
-        self.options.add_argument('--disable-prompt-on-repost')
-        self.options.add_argument('--disable-renderer-backgrounding')
-        self.options.add_argument('--disable-setuid-sandbox')
-        self.options.add_argument('--disable-site-isolation-trials')
-        self.options.add_argument('--disable-sync')
-        self.options.add_argument('--ignore-certificate-errors')
-        self.options.add_argument('--ignore-ssl-errors')
-        self.options.add_argument('--metrics-recording-only')
-        self.options.add_argument('--mute-audio')
-        self.options.add_argument('--no-default-browser-check')
-        self.options.add_argument('--no-first-run')
-        self.options.add_argument('--no-ping')
-        self.options.add_argument('--password-store=basic')
-        self.options.add_argument('--use-mock-keychain')
-        
-    def get_news_links(self, ticker, num_articles=10, company_name=None):
+        self.lock = threading.Lock()
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyHistogram()
+        self.timeouts = 0
+        self.skipped = 0
+
+
+_source_health = {source: SourceHealth() for source in SentimentSource if source != SentimentSource.ALL_SOURCES}
+# Provider calls run here so a hung provider can be abandoned at its deadline
+_source_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='sentiment-source')
+_source_call_state = threading.local()
+
+
+def _note_source_error(error):
+    """Let the circuit breaker see errors that fetchers swallow to keep returning []"""
+    _source_call_state.error = error
+
+
+class SourcesUnavailableError(Exception):
+    """Raised when every selected source failed, timed out or was skipped for a batch fetch"""
+
+
+def get_source_health() -> Dict:
+    """Breaker state and latency histogram per sentiment source, for monitoring"""
+    report = {}
+    for source, health in _source_health.items():
+        with health.lock:
+            breaker = health.breaker
+            report[source.value] = {
+                'state': breaker.state,
+                'consecutive_failures': breaker.consecutive_failures,
+                'cooldown_remaining': (
+                    round(max(0.0, breaker.cooldown - (time.monotonic() - breaker.opened_at)), 1)
+                    if breaker.opened_at is not None else 0.0),
+                'last_error': breaker.last_error,
+                'timeouts': health.timeouts,
+                'skipped': health.skipped,
+                'latency_seconds': health.latency.snapshot(),
+            }
+    return report
+
+
+def reset_source_health():
+    """Close every breaker and clear the histograms"""
+    for source in list(_source_health):
+        _source_health[source] = SourceHealth()
+
+# Compiled custom-lexicon overlays, keyed by (base analyzer id, lexicon hash)
+LEXICON_OVERLAY_CACHE_SIZE = 64
+_lexicon_overlay_cache = OrderedDict()
+_lexicon_overlay_lock = threading.Lock()
+
+
+class LexiconOverlay:
+    """
+    VADER analyzer with ticker-specific terms compiled into its lexicon.
+    Built once per distinct custom lexicon, so scoring costs the same as
+    the base analyzer (multi-word phrases add one precompiled regex pass)
+    """
+    def __init__(self, base_analyzer, custom_lexicon: Dict[str, float]):
+        # Holding the base keeps its id, part of the cache key, from being reused while cached
+        self.base = base_analyzer
+        self.analyzer = copy.copy(base_analyzer)
+        lexicon = dict(base_analyzer.lexicon)
+        phrases = []
+        for term, score in custom_lexicon.items():
+            words = term.lower().split()
+            if not words:
+                continue
+            # VADER tokenizes on whitespace, so phrases are scored as one joined token
+            lexicon['_'.join(words)] = float(score)
+            if len(words) > 1:
+                phrases.append(words)
+        self.analyzer.lexicon = lexicon
+        self.phrase_pattern = None
+        if phrases:
+            # Longest phrases first so overlapping terms prefer the most specific match
+            phrases.sort(key=len, reverse=True)
+            alternatives = [r'\s+'.join(re.escape(w) for w in words) for words in phrases]
+            self.phrase_pattern = re.compile(r'(?<!\w)(?:' + '|'.join(alternatives) + r')(?!\w)',
+                                             re.IGNORECASE)
+
+    def polarity_scores(self, text: str) -> Dict:
+        if self.phrase_pattern is not None:
+            text = self.phrase_pattern.sub(lambda m: '_'.join(m.group(0).lower().split()), text)
+        return self.analyzer.polarity_scores(text)
+
+
+def _lexicon_hash(custom_lexicon: Dict[str, float]) -> str:
+    """Stable hash of a custom lexicon, independent of key order and case"""
+    items = sorted((' '.join(term.lower().split()), float(score)) for term, score in custom_lexicon.items())
+    return hashlib.sha1(json.dumps(items).encode()).hexdigest()
+
+
+def get_lexicon_overlay(base_analyzer, custom_lexicon: Dict[str, float]) -> LexiconOverlay:
+    """Return the cached overlay of this lexicon on base_analyzer, compiling it on first use"""
+    key = (id(base_analyzer), _lexicon_hash(custom_lexicon))
+    with _lexicon_overlay_lock:
+        overlay = _lexicon_overlay_cache.get(key)
+        if overlay is not None:
+            _lexicon_overlay_cache.move_to_end(key)
+            return overlay
+    overlay = LexiconOverlay(base_analyzer, custom_lexicon)
+    with _lexicon_overlay_lock:
+        _lexicon_overlay_cache[key] = overlay
+        while len(_lexicon_overlay_cache) > LEXICON_OVERLAY_CACHE_SIZE:
+            _lexicon_overlay_cache.popitem(last=False)
+    return overlay
+
+
+# Query parameters that only track the click and never change the story
+TRACKING_PARAMS = {'fbclid', 'gclid', 'guccounter', 'guce_referrer', 'guce_referrer_sig',
+                   'ncid', 'mod', 'ref', 'cmpid', 'src', '.tsrc', 'yptr'}
+
+
+# Sources whose 'url' is a shared placeholder rather than a per-story link
+SHARED_URL_SOURCES = {'Tradestie Reddit'}
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of an article URL for exact-duplicate detection"""
+    if not url:
+        return ''
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not k.lower().startswith('utm_') and k.lower() not in TRACKING_PARAMS]
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit(('https', host, path, urlencode(sorted(query)), ''))
+
+
+def simhash(text: str, bits: int = 64) -> int:
+    """64-bit SimHash over word unigrams and bigrams; similar texts differ in few bits"""
+    tokens = re.findall(r'\w+', (text or '').lower())
+    features = tokens + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]
+    if not features:
+        return 0
+    weights = [0] * bits
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big')
+        for i in range(bits):
+            weights[i] += 1 if (h >> i) & 1 else -1
+    return sum(1 << i for i, w in enumerate(weights) if w > 0)
+
+
+class ArticleIndex:
+    """
+    Cross-source deduplication index for news stories.
+
+    Stories are keyed by normalised URL and by SimHash fingerprints of the
+    headline and of the body. Near-duplicates (Hamming
+    distance <= max_distance) are found through banded lookup tables, so
+    each check is a handful of dict lookups. The index stores the text and
+    score of every story, which lets a story seen by an earlier request skip
+    both the download and the scoring. It lives for the whole process and
+    is optionally pickled to disk between runs: requests call maybe_save(),
+    which writes in a background thread at most once every save_interval
+    seconds, and the process-wide index is saved again at exit.
+    """
+    BANDS = 4
+    # Shorter headlines are too generic for fuzzy matching on their own
+    MIN_TITLE_TOKENS = 5
+
+    def __init__(self, max_distance: int = 3, max_entries: int = 50000,
+                 ttl: float = 7 * 24 * 3600, path: str = None,
+                 save_interval: float = 300.0):
+        # With 4 bands of 16 bits, any pair within 3 bits shares at least one band
+        self.max_distance = min(max_distance, self.BANDS - 1)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.RLock()
+        # Serialises writers so a background save and the exit save never interleave
+        self._save_lock = threading.Lock()
+        self._changes = 0
+        self._last_save = time.monotonic()
+        self._stories = OrderedDict()
+        self._by_url = {}
+        self._bands = {'title': {}, 'content': {}}
+        self._next_id = 0
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self._stories)
+
+    @staticmethod
+    def _band_keys(fingerprint: int):
+        return [(i, (fingerprint >> (16 * i)) & 0xFFFF) for i in range(ArticleIndex.BANDS)]
+
+    def _near(self, kind: str, fingerprint: int) -> Optional[Dict]:
+        if not fingerprint:
+            return None
+        table = self._bands[kind]
+        for key in self._band_keys(fingerprint):
+            for story_id in table.get(key, ()):
+                story = self._stories.get(story_id)
+                if story and bin(story[kind + '_hash'] ^ fingerprint).count('1') <= self.max_distance:
+                    return story
+        return None
+
+    @classmethod
+    def _title_hash(cls, title: str) -> int:
+        # Aggregators append the publisher ("... - Reuters"), which is not part of the story
+        title = re.sub(r'\s+[-|\u2013]\s+[^-|\u2013]{1,40}$', '', title or '')
+        if len(re.findall(r'\w+', title)) < cls.MIN_TITLE_TOKENS:
+            return 0
+        return simhash(title)
+
+    @staticmethod
+    def _content_hash(title: str, text: str) -> int:
+        # Syndicated copies keep the body but often rewrite the headline
+        if not text or text == title:
+            return 0
+        return simhash(text)
+
+    def _expired(self, story: Dict) -> bool:
+        return time.time() - story['seen_at'] > self.ttl
+
+    def lookup(self, url: str, title: str = None, text: str = None) -> Optional[Dict]:
+        """Known story matching the URL, the headline or (when given) the body"""
+        with self._lock:
+            story = self._stories.get(self._by_url.get(normalize_url(url)))
+            if story is None and title:
+                story = self._near('title', self._title_hash(title))
+            if story is None:
+                story = self._near('content', self._content_hash(title, text))
+            if story is not None and self._expired(story):
+                self._remove(story['id'])
+                return None
+            return story
+
+    def add(self, url: str, title: str, text: str, compound: float = None) -> Dict:
+        """Register a story (or attach a new URL to the existing one) and return it"""
+        with self._lock:
+            story = self.lookup(url, title, text)
+            if story is None:
+                story = {
+                    'id': self._next_id,
+                    'url': normalize_url(url),
+                    'title': title,
+                    'text': text,
+                    'compound': compound,
+                    'title_hash': self._title_hash(title),
+                    'content_hash': self._content_hash(title, text),
+                    'seen_at': time.time(),
+                    'urls': set(),
+                }
+                self._next_id += 1
+                self._stories[story['id']] = story
+                for kind in ('title', 'content'):
+                    if story[kind + '_hash']:
+                        for key in self._band_keys(story[kind + '_hash']):
+                            self._bands[kind].setdefault(key, set()).add(story['id'])
+                while len(self._stories) > self.max_entries:
+                    self._remove(next(iter(self._stories)))
+            elif compound is not None and story['compound'] is None:
+                story['compound'] = compound
+            if url:
+                key = normalize_url(url)
+                self._by_url[key] = story['id']
+                story['urls'].add(key)
+            self._changes += 1
+            return story
+
+    def get(self, story_id: int) -> Optional[Dict]:
+        with self._lock:
+            return self._stories.get(story_id)
+
+    def record_score(self, story_id: int, compound: float):
+        """Remember the score of an indexed story so it is never scored twice"""
+        with self._lock:
+            story = self._stories.get(story_id)
+            if story is not None:
+                story['compound'] = compound
+                self._changes += 1
+
+    def _remove(self, story_id: int):
+        story = self._stories.pop(story_id, None)
+        if story is None:
+            return
+        for kind in ('title', 'content'):
+            for key in self._band_keys(story[kind + '_hash']):
+                ids = self._bands[kind].get(key)
+                if ids:
+                    ids.discard(story_id)
+                    if not ids:
+                        del self._bands[kind][key]
+        for url in story['urls']:
+            if self._by_url.get(url) == story_id:
+                del self._by_url[url]
+
+    def save(self):
+        """Persist the index so it survives process restarts"""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                # Copy under the lock and pickle outside it, so lookups never wait on disk I/O
+                stories = OrderedDict(
+                    (story_id, dict(story, urls=set(story['urls'])))
+                    for story_id, story in self._stories.items()
+                )
+                state = (stories, dict(self._by_url), self._next_id)
+                changes = self._changes
+                self._last_save = time.monotonic()
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f)
+            os.replace(tmp_path, self.path)
+            with self._lock:
+                self._changes -= changes
+
+    def maybe_save(self) -> Optional[threading.Thread]:
         """
-        Enhanced version with improvements from Stock-Prediction repo analysis:
-        - Direct URL pattern (no search step)
-        - Position-checking scroll loop
-        - Multiple XPath strategies for article extraction
-        - Publish date extraction
-        - Pagination support
-        - UK domain option
+        Start a background save if there are unsaved changes and save_interval
+        seconds have passed since the last one. Never blocks the caller.
+
+        Returns:
+            The saving thread, or None when no save was due
         """
-        links = []
-        driver = None
+        if not self.path:
+            return None
+        with self._lock:
+            if not self._changes or time.monotonic() - self._last_save < self.save_interval:
+                return None
+            # Claim the slot so concurrent requests do not start a second writer
+            self._last_save = time.monotonic()
+        thread = threading.Thread(target=self._save_quietly, name='article-index-save', daemon=True)
+        thread.start()
+        return thread
+
+    def _save_quietly(self):
         try:
-            print(f"Initializing Selenium for Investing.com scraping ({ticker})...")
-            
-            # Try using Selenium 4.x built-in manager first (simplest)
-            try:
-                driver = webdriver.Chrome(options=self.options)
-                # Set implicit wait
-                driver.implicitly_wait(10)
-            except Exception as e:
-                print(f"Built-in Selenium Manager failed, trying webdriver_manager: {e}")
-                # Fallback to webdriver_manager
-                try:
-                    from webdriver_manager.chrome import ChromeDriverManager
-                    from selenium.webdriver.chrome.service import Service
-                    
-                    driver_path = ChromeDriverManager().install()
-                    # Ensure we point to the executable
-                    if "chromedriver.exe" not in driver_path:
-                        import os
-                        driver_path = os.path.join(os.path.dirname(driver_path), "chromedriver.exe")
-                        
-                    service = Service(driver_path)
-                    driver = webdriver.Chrome(service=service, options=self.options)
-                    # Set implicit wait
-                    driver.implicitly_wait(10)
-                except Exception as e2:
-                    print(f"webdriver_manager also failed: {e2}")
-                    raise e
-            
-            # Use direct URL pattern when company name is known (improvement #1)
-            if company_name:
-                # Try UK domain for better results (improvement #6)
-                # Handle different naming conventions
-                clean_name = company_name.lower().replace(' ', '-').replace('.', '').replace(',', '')
-                news_url = f"https://uk.investing.com/equities/{clean_name}-news"
-            else:
-                # Fallback to original approach
-                news_url = f"https://www.investing.com/equities/{ticker.lower()}-news"
-            
-            print(f"Scraping news from: {news_url}")
-            
-            # Support pagination (improvement #5)
-            max_pages = 3  # Limit to avoid excessive scraping
-            for page in range(1, max_pages + 1):
-                page_url = f"{news_url}/{page}" if page > 1 else news_url
-                try:
-                    driver.get(page_url)
-                    time.sleep(2)  # Wait for page to load
-                except Exception as e:
-                    print(f"Failed to load page {page_url}: {e}")
-                    continue
-                
-                # Improved scrolling mechanism (improvement #2)
-                old_position = 0
-                new_position = None
-                scroll_attempts = 0
-                max_scroll_attempts = 5
-                
-                while scroll_attempts < max_scroll_attempts and (new_position != old_position):
-                    old_position = driver.execute_script(
-                        ("return (window.pageYOffset !== undefined) ?"
-                         " window.pageYOffset : (document.documentElement ||"
-                         " document.body.parentNode || document.body);"))
-                    time.sleep(1)
-                    driver.execute_script((
-                        "var scrollingElement = (document.scrollingElement ||"
-                        " document.body);scrollingElement.scrollTop ="
-                        " scrollingElement.scrollHeight;"))
-                    new_position = driver.execute_script(
-                        ("return (window.pageYOffset !== undefined) ?"
-                         " window.pageYOffset : (document.documentElement ||"
-                         " document.body.parentNode || document.body);"))
-                    scroll_attempts += 1
-                
-                # Use range(1,11) for 10 articles per page (repo approach)
-                cleaned_links = []  # Initialize cleaned_links
-                
-                for article_number in range(1, 11):
-                    if len(links) >= num_articles:
-                        break
-                    
-                    try:
-                        # Use XPath for article extraction (more reliable) (repo approach)
-                        article = driver.find_element(By.XPATH, 
-                            f'/html/body/div[5]/section/div[8]/article[{article_number}]')
-                        
-                        # Extract innerHTML and parse with BeautifulSoup (repo approach)
-                        article_html = article.get_attribute('innerHTML')
-                        if article_html:
-                            # Use "lxml" parser (repo approach)
-                            soup = BeautifulSoup(article_html, "lxml")
-                            
-                            # Find all links in the article (repo approach)
-                            for link_elem in soup.find_all('a'):
-                                partial_link = link_elem.get('href')
-                                if not partial_link:
-                                    continue
-                                
-                                # Link validation: Check for 'https' first, then handle relative paths (repo approach)
-                                if 'https' in partial_link:
-                                    cleaned_links.append(partial_link)
-                                elif partial_link[0] == '/':
-                                    cleaned_links.append('https://uk.investing.com/' + partial_link)
-                    except:
-                        # More specific error message (repo approach)
-                        print("I didn't get this")
-                        continue
-                
-                # Process all collected links
-                found_links = set()  # To avoid duplicates
-                for link in cleaned_links:
-                    # Skip if not a news link or already processed
-                    if 'news' not in link.lower() or link in found_links:
-                        continue
-                        
-                    found_links.add(link)
-                    
-                    # Store link with metadata
-                    links.append({
-                        'url': link,
-                        'source': 'Investing.com'
-                    })
-                
-                # Break if we have enough articles
-                if len(links) >= num_articles:
-                    break
-                    
-                # Small delay between pages
-                time.sleep(1)
-            
-            # Use np.unique() for deduplication (repo approach)
-            if links:
-                urls = [link['url'] for link in links]
-                unique_urls = np.unique(urls)
-                # Filter links to keep only unique ones
-                unique_links = []
-                seen_urls = set()
-                for link in links:
-                    if link['url'] not in seen_urls:
-                        unique_links.append(link)
-                        seen_urls.add(link['url'])
-                links = unique_links
-            
-            print(f"Found {len(links)} articles on Investing.com")
-            
+            self.save()
         except Exception as e:
-            print(f"Selenium scraping error: {e}")
-        finally:
-            if driver:
-                try:
-                    driver.quit()
-                except:
-                    pass  # Ignore errors when closing driver
-                
-        return links[:num_articles]
+            logger.warning(f"Article index save failed: {e}")
+
+    def load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                stories, by_url, next_id = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Could not load article index {self.path}: {e}")
+            return
+        with self._lock:
+            self._stories, self._by_url, self._next_id = stories, by_url, next_id
+            self._bands = {'title': {}, 'content': {}}
+            for story in stories.values():
+                for kind in ('title', 'content'):
+                    if story[kind + '_hash']:
+                        for key in self._band_keys(story[kind + '_hash']):
+                            self._bands[kind].setdefault(key, set()).add(story['id'])
+
+
+_article_index = None
+_article_index_lock = threading.Lock()
+
+
+def get_article_index() -> ArticleIndex:
+    """Process-wide article index shared by every analyzer (and so every request)"""
+    global _article_index
+    with _article_index_lock:
+        if _article_index is None:
+            _article_index = ArticleIndex(
+                path=os.environ.get('NEWS_DEDUP_INDEX_PATH'),
+                save_interval=float(os.environ.get('NEWS_DEDUP_SAVE_SECONDS', '300')),
+            )
+            if _article_index.path:
+                atexit.register(_article_index._save_quietly)
+        return _article_index
+
+
+def _load_backfill_checkpoint(path: str) -> set:
+    """Read completed (symbol, date) units from a backfill checkpoint file"""
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path) as f:
+        for line in f:
+            try:
+                unit = json.loads(line)
+                completed.add((unit['symbol'], unit['date']))
+            except (ValueError, KeyError):
+                # A run killed mid-write leaves a partial last line
+                continue
+    return completed
+
+
+def _date_windows(days: List[str], size: int) -> List[List[str]]:
+    """Split sorted YYYY-MM-DD days into runs of consecutive days, at most size days each"""
+    windows = []
+    for day in days:
+        if (windows and len(windows[-1]) < size
+                and pd.Timestamp(day) - pd.Timestamp(windows[-1][-1]) == pd.Timedelta(days=1)):
+            windows[-1].append(day)
+        else:
+            windows.append([day])
+    return windows
+
+
+def _unavailable(symbol: str, failures: Dict) -> SourcesUnavailableError:
+    reasons = '; '.join(f"{source.value}: {reason}" for source, reason in failures.items())
+    return SourcesUnavailableError(f"No sentiment source answered for {symbol} ({reasons})")
+
+
+def __getattr__(name):
+    # Optional Investing.com plugin: importing news_sentiment never loads selenium
+    if name in ('InvestingComScraper', 'DriverPool', 'get_driver_pool'):
+        import investing_scraper
+        return getattr(investing_scraper, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class ComprehensiveSentimentAnalyzer:
@@ -325,10 +624,15 @@ class ComprehensiveSentimentAnalyzer:
                  selected_sources=None,
                  use_case=None,
                  redis_host='localhost',
-                 redis_port=6379):
+                 redis_port=6379,
+                 source_deadlines=None,
+                 sentiment_budget=None):
         self.num_articles = num_articles
         # Keep standard VADER as fallback
-        self.sid = SentimentIntensityAnalyzer()
+        try:
+            self.sid = SentimentIntensityAnalyzer()
+        except LookupError as e:
+            raise NLTKResourceError(['vader_lexicon']) from e
         self.eodhd_api_key = eodhd_api_key
         self.alpha_vantage_api_key = alpha_vantage_api_key
         self.finnhub_api_key = finnhub_api_key
@@ -340,6 +644,15 @@ class ComprehensiveSentimentAnalyzer:
         self.selected_sources = selected_sources if selected_sources is not None else [SentimentSource.ALL_SOURCES]
         # Use case configuration
         self.use_case = use_case
+        # Latency budgets for the provider fallback chain
+        self.source_deadlines = dict(DEFAULT_SOURCE_DEADLINES)
+        if source_deadlines:
+            self.source_deadlines.update(source_deadlines)
+        self.sentiment_budget = sentiment_budget if sentiment_budget is not None else DEFAULT_SENTIMENT_BUDGET
+        # Cross-source dedup index, shared by all analyzers in this process
+        self.article_index = get_article_index()
+        # Investing.com Selenium plugin, created on first use of selenium_scraper
+        self._selenium_scraper = None
         # Redis caching
         self.redis_client = None
         if REDIS_AVAILABLE:
@@ -385,12 +698,21 @@ class ComprehensiveSentimentAnalyzer:
             self.num_articles = 15
             self.selected_sources = [SentimentSource.STOCKGEIST, SentimentSource.FINVIZ_FINVADER]
     
+    @property
+    def selenium_scraper(self):
+        """Optional Investing.com scraper; selenium loads only when it launches a browser"""
+        if self._selenium_scraper is None:
+            from investing_scraper import InvestingComScraper
+            self._selenium_scraper = InvestingComScraper()
+        return self._selenium_scraper
+
     def analyze_full_article(self, url):
         """
         Uses newspaper3k to download and parse full article text
         """
         try:
             article = Article(url)
+            rate_limiter.acquire(url)
             article.download()
             article.parse()
             return article.title, article.text
@@ -404,7 +726,8 @@ class ComprehensiveSentimentAnalyzer:
         news_items = []
         try:
             url = f"https://news.google.com/rss/search?q={query}+stock&hl=en-US&gl=US&ceid=US:en"
-            response = requests.get(url, headers=self.headers, timeout=5)
+            response = limited_get(url, headers=self.headers, timeout=5)
+            response.raise_for_status()
             soup = BeautifulSoup(response.content, 'xml')
             items = soup.find_all('item')[:self.num_articles]
             for item in items:
@@ -412,6 +735,7 @@ class ComprehensiveSentimentAnalyzer:
                 publish_date = None
                 if HTMLDATE_AVAILABLE:
                     try:
+                        rate_limiter.acquire(item.link.text)
                         publish_date = find_date(item.link.text)
                     except:
                         pass
@@ -423,6 +747,7 @@ class ComprehensiveSentimentAnalyzer:
                     'date': publish_date
                 })
         except Exception as e:
+            _note_source_error(e)
             print(f"Google News error: {e}")
         return news_items
 
@@ -435,7 +760,8 @@ class ComprehensiveSentimentAnalyzer:
         try:
             url = f"https://finviz.com/quote.ashx?t={ticker}"
             # Finviz requires a proper User-Agent to avoid 403 Forbidden
-            req = requests.get(url, headers=self.headers, timeout=5)
+            req = limited_get(url, headers=self.headers, timeout=5)
+            req.raise_for_status()
             soup = BeautifulSoup(req.content, 'html.parser')
             
             # Finviz news table usually has id 'news-table'
@@ -457,20 +783,25 @@ class ComprehensiveSentimentAnalyzer:
                                 except:
                                     pass
                                     
-                            # Fetch full article text
-                            full_text = self.fetch_article_text(link)
+                            # Fetch full article text unless the story is already indexed
+                            known = self.article_index.lookup(link, title)
+                            full_text = known['text'] if known else self.fetch_article_text(link)
 
-                            news_items.append({
+                            item = {
                                 'title': title,
                                 'url': link,
                                 'text': full_text if full_text else title,  # Use full text or fallback to title
                                 'source': 'Finviz',
                                 'date': publish_date
-                            })
+                            }
+                            if known:
+                                item['story_id'] = known['id']
+                            news_items.append(item)
                     except:
                         continue
             print(f"Found {len(news_items)} articles on Finviz")
         except Exception as e:
+            _note_source_error(e)
             print(f"Finviz scraping error: {e}")
         return news_items
 
@@ -479,16 +810,18 @@ class ComprehensiveSentimentAnalyzer:
         try:
             from newspaper import Article
             article = Article(url)
+            rate_limiter.acquire(url)
             article.download()
             article.parse()
             return article.text if article.text else ""
         except:
             return ""
 
-    def get_eodhd_sentiment(self, ticker):
+    def get_eodhd_sentiment(self, ticker, start=None, end=None):
         """
         API Fallback: Get pre-calculated sentiment from EODHD API
         Much faster than scraping and local analysis
+        start/end (YYYY-MM-DD) restrict the news to that window, for backfills
         """
         if not self.eodhd_api_key:
             print("EODHD API key not provided, skipping API fallback")
@@ -497,15 +830,17 @@ class ComprehensiveSentimentAnalyzer:
         news_items = []
         try:
             # Try to get sentiment data directly
-            url = f"https://eodhd.com/api/sentiments?s={ticker}&api_token={self.eodhd_api_key}&fmt=json"
-            response = requests.get(url, headers=self.headers, timeout=10)
+            window = f"&from={start}&to={end}" if start else ""
+            url = f"https://eodhd.com/api/sentiments?s={ticker}{window}&api_token={self.eodhd_api_key}&fmt=json"
+            response = limited_get(url, headers=self.headers, timeout=10)
             data = response.json()
             
             if 'sentiments' in data:
                 for sentiment_data in data['sentiments']:
                     # Get detailed news data
-                    news_url = f"https://eodhd.com/api/news?s={ticker}&limit=5&api_token={self.eodhd_api_key}&fmt=json"
-                    news_response = requests.get(news_url, headers=self.headers, timeout=10)
+                    limit = self.num_articles if start else 5
+                    news_url = f"https://eodhd.com/api/news?s={ticker}&limit={limit}{window}&api_token={self.eodhd_api_key}&fmt=json"
+                    news_response = limited_get(news_url, headers=self.headers, timeout=10)
                     news_data = news_response.json()
                     
                     if 'news' in news_data:
@@ -520,13 +855,15 @@ class ComprehensiveSentimentAnalyzer:
                             })
             print(f"Found {len(news_items)} articles from EODHD API")
         except Exception as e:
+            _note_source_error(e)
             print(f"EODHD API error: {e}")
         return news_items
 
-    def get_alpha_vantage_news(self, query):
+    def get_alpha_vantage_news(self, query, start=None, end=None):
         """
         Enhanced API Source: Alpha Vantage News & Sentiments API
         Real-time ingestion with full article text
+        start/end (YYYY-MM-DD) restrict the news to that window, newest first, for backfills
         """
         if not self.alpha_vantage_api_key:
             print("Alpha Vantage API key not provided, skipping")
@@ -538,7 +875,12 @@ class ComprehensiveSentimentAnalyzer:
             try:
                 from newsapi import NewsApiClient
                 newsapi = NewsApiClient(api_key=self.alpha_vantage_api_key)
-                articles = newsapi.get_everything(q=query, language='en', sort_by='relevancy')
+                rate_limiter.acquire('newsapi.org')
+                if start:
+                    articles = newsapi.get_everything(q=query, language='en', sort_by='publishedAt',
+                                                      from_param=start, to=end)
+                else:
+                    articles = newsapi.get_everything(q=query, language='en', sort_by='relevancy')
                 
                 for article in articles['articles'][:self.num_articles]:
                     # Run FinVADER on both headline and content
@@ -564,7 +906,9 @@ class ComprehensiveSentimentAnalyzer:
                 # Fallback to direct requests if newsapi not available
                 print("NewsAPI client not available, using direct requests")
                 url = f"https://www.alphavantage.co/query?function=NEWS_SENTIMENT&tickers={query}&apikey={self.alpha_vantage_api_key}"
-                response = requests.get(url, headers=self.headers, timeout=10)
+                if start:
+                    url += f"&time_from={start.replace('-', '')}T0000&time_to={end.replace('-', '')}T2359"
+                response = limited_get(url, headers=self.headers, timeout=10)
                 data = response.json()
                 
                 if 'feed' in data:
@@ -585,6 +929,7 @@ class ComprehensiveSentimentAnalyzer:
                         })
                 print(f"Found {len(news_items)} articles from Alpha Vantage (direct)")
         except Exception as e:
+            _note_source_error(e)
             print(f"Alpha Vantage API error: {e}")
         return news_items
 
@@ -596,7 +941,7 @@ class ComprehensiveSentimentAnalyzer:
         news_items = []
         try:
             # Get WBS sentiment data
-            response = requests.get("https://tradestie.com/api/v1/apps/reddit", timeout=10)
+            response = limited_get("https://tradestie.com/api/v1/apps/reddit", timeout=10)
             data = response.json()
             
             # Process individual comments with FinVADER for nuance
@@ -624,13 +969,15 @@ class ComprehensiveSentimentAnalyzer:
                     count += 1
             print(f"Found {len(news_items)} Reddit posts from Tradestie")
         except Exception as e:
+            _note_source_error(e)
             print(f"Tradestie Reddit API error: {e}")
         return news_items
 
-    def get_finnhub_social_sentiment(self, symbol):
+    def get_finnhub_social_sentiment(self, symbol, start=None, end=None):
         """
         Multi-Source Social Sentiment: Finnhub Social Sentiment API
         Hourly updates from Reddit, Twitter, Yahoo Finance, StockTwits
+        start/end (YYYY-MM-DD) restrict the mentions to that window, for backfills
         """
         if not self.finnhub_api_key:
             print("Finnhub API key not provided, skipping")
@@ -640,7 +987,9 @@ class ComprehensiveSentimentAnalyzer:
         try:
             # Fetch social media mentions
             url = f"https://finnhub.io/api/v1/stock/social-sentiment?symbol={symbol}&token={self.finnhub_api_key}"
-            response = requests.get(url, headers=self.headers, timeout=10)
+            if start:
+                url += f"&from={start}&to={end}"
+            response = limited_get(url, headers=self.headers, timeout=10)
             social_data = response.json()
             
             # Apply FinVADER to raw mention text
@@ -669,6 +1018,7 @@ class ComprehensiveSentimentAnalyzer:
                         count += 1
             print(f"Found {len(news_items)} social mentions from Finnhub")
         except Exception as e:
+            _note_source_error(e)
             print(f"Finnhub Social Sentiment API error: {e}")
         return news_items
 
@@ -687,6 +1037,7 @@ class ComprehensiveSentimentAnalyzer:
             url = f"https://api.stockgeist.ai/realtime/stream?symbols={','.join(symbols)}"
             headers = {"Authorization": f"Bearer {self.stockgeist_api_key}"}
             
+            await asyncio.get_running_loop().run_in_executor(None, rate_limiter.acquire, url)
             async with aiohttp.ClientSession() as session:
                 async with session.get(url, headers=headers) as response:
                     async for line in response.content:
@@ -713,6 +1064,98 @@ class ComprehensiveSentimentAnalyzer:
             print(f"StockGeist API error: {e}")
         return news_items
 
+    def _fetch_google_news_articles(self, query: str, limit: int, seen_stories: set) -> List[Dict]:
+        """Google News RSS items with full text, skipping the download for indexed stories"""
+        articles = []
+        for item in self.get_google_news(query):
+            if len(articles) >= limit:
+                break
+            
+            known = self.article_index.lookup(item['url'], item['title'])
+            if known:
+                if known['id'] in seen_stories:
+                    continue
+                title, text = known['title'], known['text']
+                item['story_id'] = known['id']
+            else:
+                # For RSS, we try to get full text, otherwise use title
+                title, text = self.analyze_full_article(item['url'])
+            if not text:
+                text = item['title']
+                title = item['title']
+            
+            item['title'] = title
+            item['text'] = text
+            item['publish_date'] = item.get('date', None)
+            articles.append(item)
+        return articles
+
+    def _call_source(self, source, fetch, *args, budget_deadline=None, failures: Dict = None) -> List[Dict]:
+        """
+        Run one provider under its circuit breaker and deadline.
+        Returns [] when the breaker is open, the budget is spent, the call
+        times out or fails; a timed-out call is abandoned, not cancelled.
+        The reason is stored in failures[source] when failures is given.
+        """
+        health = _source_health[source]
+        timeout = self.source_deadlines.get(source, DEFAULT_SENTIMENT_BUDGET)
+        if budget_deadline is not None:
+            timeout = min(timeout, budget_deadline - time.monotonic())
+        with health.lock:
+            allowed = timeout > 0 and health.breaker.allow()
+            if not allowed:
+                health.skipped += 1
+        if not allowed:
+            print(f"Skipping {source.value}: circuit {health.breaker.state} or sentiment budget spent")
+            if failures is not None:
+                failures[source] = f"circuit {health.breaker.state} or sentiment budget spent"
+            return []
+
+        def run():
+            _source_call_state.error = None
+            items = fetch(*args)
+            return items, _source_call_state.error
+
+        started = time.monotonic()
+        error = None
+        items = []
+        try:
+            # Copy the context so the caller's rate-limit priority reaches the worker
+            items, error = _source_executor.submit(contextvars.copy_context().run, run).result(timeout=timeout)
+        except FutureTimeoutError:
+            error = TimeoutError(f"{source.value} exceeded {timeout:.1f}s deadline")
+            with health.lock:
+                health.timeouts += 1
+        except Exception as e:
+            error = e
+        elapsed = time.monotonic() - started
+
+        with health.lock:
+            health.latency.observe(elapsed)
+            if error is None:
+                health.breaker.record_success()
+            else:
+                health.breaker.record_failure(error)
+        if error is not None:
+            logger.warning(f"{source.value} failed after {elapsed:.2f}s: {error}")
+            if failures is not None:
+                failures[source] = str(error)
+        return items or []
+
+    def _add_unique_articles(self, all_articles: List[Dict], items: List[Dict], seen_stories: set):
+        """Append items whose story is not already part of this request"""
+        for item in items:
+            url = None if item.get('source') in SHARED_URL_SOURCES else item.get('url')
+            story = self.article_index.lookup(url, item.get('title'), item.get('text'))
+            if story is None:
+                # Register unscored so later sources recognise syndicated copies
+                story = self.article_index.add(url, item.get('title'), item.get('text'))
+            if story['id'] in seen_stories:
+                continue
+            seen_stories.add(story['id'])
+            item['story_id'] = story['id']
+            all_articles.append(item)
+
     def _should_use_source(self, source):
         """Check if a specific source should be used based on selection"""
         return (SentimentSource.ALL_SOURCES in self.selected_sources or 
@@ -751,59 +1194,55 @@ class ComprehensiveSentimentAnalyzer:
             return tuple(cached_result)
         
         all_articles = []
+        # Story ids already included in this request (syndicated copies are dropped)
+        seen_stories = set()
+        # Providers share one wall-clock budget; each also has its own deadline
+        budget_deadline = time.monotonic() + self.sentiment_budget
+        query = company_name if company_name else ticker
         
         # 1. Fetch from Finviz FIRST (Fast & Reliable) - if selected
         if self._should_use_source(SentimentSource.FINVIZ_FINVADER):
             print("Fetching from Finviz...")
-            finviz_news = self.get_finviz_news(ticker)
-            all_articles.extend(finviz_news)
+            finviz_news = self._call_source(SentimentSource.FINVIZ_FINVADER, self.get_finviz_news, ticker,
+                                            budget_deadline=budget_deadline)
+            self._add_unique_articles(all_articles, finviz_news, seen_stories)
         
         # 2. Try EODHD API fallback - if selected
         if len(all_articles) < self.num_articles and self._should_use_source(SentimentSource.EODHD_API):
             print("Fetching sentiment data from EODHD API...")
-            api_news = self.get_eodhd_sentiment(ticker)
-            all_articles.extend(api_news)
+            api_news = self._call_source(SentimentSource.EODHD_API, self.get_eodhd_sentiment, ticker,
+                                         budget_deadline=budget_deadline)
+            self._add_unique_articles(all_articles, api_news, seen_stories)
         
         # 3. Try Alpha Vantage News API - if selected
         if len(all_articles) < self.num_articles and self._should_use_source(SentimentSource.ALPHA_VANTAGE):
             print("Fetching news from Alpha Vantage...")
-            query = company_name if company_name else ticker
-            alpha_news = self.get_alpha_vantage_news(query)
-            all_articles.extend(alpha_news)
+            alpha_news = self._call_source(SentimentSource.ALPHA_VANTAGE, self.get_alpha_vantage_news, query,
+                                           budget_deadline=budget_deadline)
+            self._add_unique_articles(all_articles, alpha_news, seen_stories)
         
         # 4. Try Tradestie Reddit API - if selected
         if len(all_articles) < self.num_articles and self._should_use_source(SentimentSource.TRADESTIE_REDDIT):
             print("Fetching Reddit sentiment from Tradestie...")
-            query = company_name if company_name else ticker
-            reddit_news = self.get_tradestie_reddit(query)
-            all_articles.extend(reddit_news)
+            reddit_news = self._call_source(SentimentSource.TRADESTIE_REDDIT, self.get_tradestie_reddit, query,
+                                            budget_deadline=budget_deadline)
+            self._add_unique_articles(all_articles, reddit_news, seen_stories)
         
         # 5. Try Finnhub Social Sentiment API - if selected
         if len(all_articles) < self.num_articles and self._should_use_source(SentimentSource.FINNHUB_SOCIAL):
             print("Fetching social sentiment from Finnhub...")
-            social_news = self.get_finnhub_social_sentiment(ticker)
-            all_articles.extend(social_news)
+            social_news = self._call_source(SentimentSource.FINNHUB_SOCIAL, self.get_finnhub_social_sentiment, ticker,
+                                            budget_deadline=budget_deadline)
+            self._add_unique_articles(all_articles, social_news, seen_stories)
         
         # 6. Last Resort: Fill up with Google News RSS if needed - if selected
         if len(all_articles) < self.num_articles and self._should_use_source(SentimentSource.GOOGLE_NEWS):
             print("Fetching additional news from Google News (last resort)...")
-            query = company_name if company_name else ticker
-            rss_items = self.get_google_news(query)
-            
-            for item in rss_items:
-                if len(all_articles) >= self.num_articles:
-                    break
-                
-                # For RSS, we try to get full text, otherwise use title
-                title, text = self.analyze_full_article(item['url'])
-                if not text:
-                    text = item['title']
-                    title = item['title']
-                
-                item['title'] = title
-                item['text'] = text
-                item['publish_date'] = item.get('date', None)
-                all_articles.append(item)
+            rss_items = self._call_source(SentimentSource.GOOGLE_NEWS, self._fetch_google_news_articles, query,
+                                          self.num_articles - len(all_articles), set(seen_stories),
+                                          budget_deadline=budget_deadline)
+            self._add_unique_articles(all_articles, rss_items, seen_stories)
+            del all_articles[self.num_articles:]
 
         # Analyze Sentiment with FinVADER if available, otherwise fallback to VADER
         sentiments = []
@@ -835,8 +1274,12 @@ class ComprehensiveSentimentAnalyzer:
         else:
             # Use FinVADER or standard VADER for sentiment analysis
             for article in all_articles:
+                story = self.article_index.get(article.get('story_id'))
+                if story is not None and story['compound'] is not None:
+                    # Scored by an earlier request or another source
+                    compound = story['compound']
                 # Use FinVADER if available, otherwise fallback to standard VADER
-                if FINVADER_AVAILABLE:
+                elif FINVADER_AVAILABLE:
                     try:
                         # FinVADER Analysis - use financial lexicons for better accuracy
                         compound = finvader(
@@ -853,6 +1296,7 @@ class ComprehensiveSentimentAnalyzer:
                     # Standard VADER Analysis
                     scores = self.sid.polarity_scores(article['text'])
                     compound = scores['compound']
+                self.article_index.record_score(article.get('story_id'), compound)
                 
                 total_compound += compound
                 news_titles.append(article['title'])
@@ -892,13 +1336,14 @@ class ComprehensiveSentimentAnalyzer:
         # Create Chart
         self.create_chart(pos_count, neg_count, neu_count)
         
-        # Log sentiment distribution for monitoring
-        self.log_sentiment_distribution(all_articles)
+        # Log sentiment distribution for monitoring (reuse the scores computed above)
+        self.log_sentiment_distribution([{'sentiment_score': s['compound']} for s in sentiments])
         
         result = (global_polarity, news_titles, label, pos_count, neg_count, neu_count)
         
         # Cache the result
         self._set_in_cache(cache_key, result)
+        self.article_index.maybe_save()
         
         return result
 
@@ -964,50 +1409,259 @@ class ComprehensiveSentimentAnalyzer:
 
     # Advanced Features Implementation
     
-    def batch_process_sentiments(self, symbols: List[str], start_date: str = None) -> pd.DataFrame:
+    def _fetch_source_batches(self, symbol: str, sources, start: str = None,
+                              end: str = None) -> Tuple[List[Tuple[SentimentSource, List[Dict]]], Dict]:
         """
-        Batch Processing with Queue for backtesting and historical analysis
-        Processes 10,000+ articles/hour on single core
+        ([(source, items)] for every selected source, {source: reason} for
+        those that failed); start/end pass a date window to the fetchers
         """
-        results = []
-        
-        for symbol in symbols:
+        batches = []
+        failures = {}
+        args = (symbol,) if start is None else (symbol, start, end)
+        for source in sources:
+            if not self._should_use_source(source):
+                continue
+            items = self._call_source(source, getattr(self, BATCH_FETCHERS[source]), *args, failures=failures)
+            for item in items:
+                item.setdefault('text', item.get('title', ''))
+            batches.append((source, items))
+        return batches, failures
+
+    def _merge_batches(self, batches) -> List[Dict]:
+        """Deduplicated articles of several source batches, in batch order"""
+        articles = []
+        seen_stories = set()
+        for _, items in batches:
+            self._add_unique_articles(articles, items, seen_stories)
+        return articles
+
+    def _fetch_batch_articles(self, symbol: str) -> List[Dict]:
+        """
+        Collect deduplicated articles for one symbol from every selected source (no early cut-off).
+        Raises SourcesUnavailableError when no source answered, so an empty
+        result always means the sources had nothing to report.
+        """
+        batches, failures = self._fetch_source_batches(symbol, BATCH_FETCHERS)
+        if batches and len(failures) == len(batches):
+            raise _unavailable(symbol, failures)
+        return self._merge_batches(batches)
+
+    def _covered_from(self, batches, failures: Dict, start: str) -> Optional[pd.Timestamp]:
+        """
+        First day from which the answering sources saw every article: a
+        windowed source that returned less than num_articles covered its whole
+        window from start; any other answer only reaches back to its oldest
+        article. None when nothing was covered.
+        """
+        processed = pd.Timestamp.now()
+        bounds = []
+        for source, items in batches:
+            if source in failures:
+                continue
+            if source in WINDOWED_SOURCES and len(items) < self.num_articles:
+                bounds.append(pd.Timestamp(start))
+            elif items:
+                bounds.append(self._article_days([item.get('date') for item in items], processed).min())
+        return min(bounds) if bounds else None
+
+    @staticmethod
+    def _article_days(values, processed: pd.Timestamp) -> pd.Series:
+        """
+        Normalise heterogeneous source dates to calendar days.
+        Finviz prints the date only on the first headline of each day
+        ("Jan-05-24 09:30AM", then "10:15AM"), so time-only rows inherit the
+        previous row's day; undated articles count towards the processing day
+        """
+        today = processed.normalize()
+        days = []
+        current = None
+        for value in values:
+            text = str(value).strip() if value is not None and not pd.isna(value) else ''
+            day = None
+            if text.lower().startswith('today'):
+                day = today
+            elif re.fullmatch(r'\d{1,2}:\d{2}\s*[AP]M', text, re.IGNORECASE):
+                day = current if current is not None else today
+            elif text:
+                for fmt in ('%b-%d-%y %I:%M%p', '%Y%m%dT%H%M%S', None):
+                    parsed = pd.to_datetime(text, format=fmt, errors='coerce', utc=True)
+                    if not pd.isna(parsed):
+                        day = parsed.tz_convert(None).normalize()
+                        break
+            if day is None:
+                day = today
+            else:
+                current = day
+            days.append(day)
+        return pd.Series(days, dtype='datetime64[ns]')
+
+    def _score_batch_articles(self, articles: List[Dict], symbol: str,
+                              start_date=None, end_date=None) -> pd.DataFrame:
+        """Vectorised scoring of one symbol's articles, restricted to [start_date, end_date]"""
+        processed = pd.Timestamp.now()
+        df = pd.DataFrame(articles)
+        if 'text' not in df.columns:
+            df['text'] = df['title'] if 'title' in df.columns else ''
+        df['text'] = df['text'].fillna('').astype(str)
+
+        # Keep scores the APIs already computed, score the rest locally
+        if 'sentiment_score' in df.columns:
+            df['sentiment'] = pd.to_numeric(df['sentiment_score'], errors='coerce')
+        else:
+            df['sentiment'] = np.nan
+        missing = df['sentiment'].isna()
+        df.loc[missing, 'sentiment'] = df.loc[missing, 'text'].apply(
+            lambda x: finvader(x)['compound'] if FINVADER_AVAILABLE else self.sid.polarity_scores(x)['compound']
+        )
+
+        raw_dates = df['date'] if 'date' in df.columns else [None] * len(df)
+        df['article_date'] = self._article_days(raw_dates, processed).values
+        if start_date is not None:
+            df = df[df['article_date'] >= pd.Timestamp(start_date).normalize()]
+        if end_date is not None:
+            df = df[df['article_date'] <= pd.Timestamp(end_date).normalize()]
+        df = df.sort_values('article_date', kind='stable').reset_index(drop=True)
+
+        # Calculate rolling sentiment average
+        df['sentiment_ma'] = df['sentiment'].rolling(5, min_periods=1).mean()
+        df['symbol'] = symbol
+        df['processed_date'] = processed
+        return df
+
+    def batch_process_sentiments(self, symbols: List[str], start_date: str = None,
+                                 end_date: str = None, output_dir: str = None,
+                                 max_workers: int = 4) -> pd.DataFrame:
+        """
+        Batch Processing with a worker pool for backtesting and historical analysis.
+        Articles older than start_date (or newer than end_date) are dropped.
+        When output_dir is given, runs as a resumable backfill that streams
+        results to partitioned Parquet (see backfill_sentiments).
+        """
+        if output_dir is not None:
+            return self.backfill_sentiments(symbols, start_date, end_date=end_date,
+                                            output_dir=output_dir, max_workers=max_workers)
+
+        @rate_limiter.priority(rate_limiter.BATCH)
+        def process(symbol):
             print(f"Processing sentiment for {symbol}...")
             try:
-                # Get articles from all enabled sources for this symbol
-                articles = []
-                
-                # Use Finviz as primary source for batch processing
-                if self._should_use_source(SentimentSource.FINVIZ_FINVADER):
-                    finviz_articles = self.get_finviz_news(symbol)
-                    articles.extend(finviz_articles)
-                
-                # Convert to DataFrame for vectorized processing
+                articles = self._fetch_batch_articles(symbol)
                 if articles:
-                    df = pd.DataFrame(articles)
-                    
-                    # Vectorized FinVADER application
-                    if 'text' in df.columns:
-                        df['sentiment'] = df['text'].apply(
-                            lambda x: finvader(x)['compound'] if FINVADER_AVAILABLE else self.sid.polarity_scores(x)['compound']
-                            # raw=True removed due to compatibility issues
-                        )
-                        
-                        # Calculate rolling sentiment average
-                        df['sentiment_ma'] = df['sentiment'].rolling(5, min_periods=1).mean()
-                        df['symbol'] = symbol
-                        df['processed_date'] = pd.Timestamp.now()
-                        
-                        results.append(df)
+                    return self._score_batch_articles(articles, symbol, start_date, end_date)
             except Exception as e:
                 print(f"Error processing {symbol}: {e}")
-                continue
-        
+            return None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = [df for df in pool.map(process, symbols) if df is not None and not df.empty]
+
         if results:
             return pd.concat(results, ignore_index=True)
         else:
             return pd.DataFrame()
 
+    def backfill_sentiments(self, symbols: List[str], start_date: str, end_date: str = None,
+                            output_dir: str = 'sentiment_backfill', max_workers: int = 4,
+                            checkpoint_path: str = None) -> pd.DataFrame:
+        """
+        Parallel, resumable historical backfill.
+
+        Work is split into (symbol, date) units for every day in
+        [start_date, end_date]. Each symbol's pending days are grouped into
+        windows of up to BACKFILL_WINDOW_DAYS consecutive days that run on a
+        thread pool: sources with a date-range API (WINDOWED_SOURCES) are
+        queried once per window, live feeds once per symbol and shared by its
+        windows. Scored rows are written to
+        output_dir/symbol=<SYMBOL>/article_date=<YYYY-MM-DD>/part-0.parquet and
+        each covered unit, including days without articles, is appended to a
+        JSON-lines checkpoint, so an interrupted run resumes with only the
+        missing units. Days older than anything the sources covered (see
+        _covered_from) are reported with covered=False and stay pending, as do
+        windows for which every source failed. Returns a per-unit summary,
+        never the articles.
+        """
+        if start_date is None:
+            raise ValueError("start_date is required for a backfill")
+        end_date = end_date or pd.Timestamp.now().strftime('%Y-%m-%d')
+        days = [d.strftime('%Y-%m-%d') for d in pd.date_range(start_date, end_date, freq='D')]
+
+        os.makedirs(output_dir, exist_ok=True)
+        checkpoint_path = checkpoint_path or os.path.join(output_dir, '_checkpoint.jsonl')
+        completed = _load_backfill_checkpoint(checkpoint_path)
+        pending = {}
+        for symbol in symbols:
+            todo = [day for day in days if (symbol, day) not in completed]
+            if todo:
+                pending[symbol] = todo
+        skipped = len(symbols) * len(days) - sum(len(todo) for todo in pending.values())
+        if skipped:
+            print(f"Resuming backfill: {skipped} units already checkpointed")
+
+        summary = []
+        lock = threading.Lock()
+        with open(checkpoint_path, 'a') as checkpoint:
+            def record(symbol, day, rows, path, covered=True):
+                with lock:
+                    if covered:
+                        checkpoint.write(json.dumps({'symbol': symbol, 'date': day, 'rows': rows}) + '\n')
+                        checkpoint.flush()
+                    summary.append({'symbol': symbol, 'date': day, 'rows': rows, 'path': path,
+                                    'covered': covered})
+
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                live = dict(zip(pending, pool.map(self._fetch_live_batches, pending)))
+                futures = {
+                    pool.submit(self._backfill_window, symbol, window, live[symbol], output_dir, record): symbol
+                    for symbol, todo in pending.items()
+                    for window in _date_windows(todo, BACKFILL_WINDOW_DAYS)
+                }
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"Error processing {futures[future]}: {e}")
+
+        return pd.DataFrame(summary, columns=['symbol', 'date', 'rows', 'path', 'covered'])
+
+    @rate_limiter.priority(rate_limiter.BATCH)
+    def _fetch_live_batches(self, symbol: str):
+        """One symbol's current feeds from the sources that cannot be asked for a date range"""
+        return self._fetch_source_batches(symbol, LIVE_FEED_SOURCES)
+
+    def _backfill_window(self, symbol: str, days: List[str], live, output_dir: str, record) -> None:
+        """Fetch one window of consecutive days, then write and checkpoint each covered day"""
+        print(f"Backfilling sentiment for {symbol} ({days[0]} to {days[-1]})...")
+        with rate_limiter.priority(rate_limiter.BATCH):
+            windowed, failures = self._fetch_source_batches(symbol, WINDOWED_SOURCES, days[0], days[-1])
+        batches = live[0] + windowed
+        failures = {**live[1], **failures}
+        if batches and len(failures) == len(batches):
+            raise _unavailable(symbol, failures)
+        covered_from = self._covered_from(batches, failures, days[0])
+        articles = self._merge_batches(batches)
+        by_day = {}
+        if articles:
+            df = self._score_batch_articles(articles, symbol, days[0], days[-1])
+            for day, part in df.groupby(df['article_date'].dt.strftime('%Y-%m-%d'), sort=False):
+                by_day[day] = part
+        for day in days:
+            if covered_from is None or pd.Timestamp(day) < covered_from:
+                record(symbol, day, 0, None, covered=False)
+                continue
+            part = by_day.get(day)
+            if part is None or part.empty:
+                record(symbol, day, 0, None)
+                continue
+            partition = os.path.join(output_dir, f'symbol={symbol}', f'article_date={day}')
+            os.makedirs(partition, exist_ok=True)
+            path = os.path.join(partition, 'part-0.parquet')
+            # Partition keys live in the directory names, not in the file
+            part = part.drop(columns=['symbol', 'article_date'])
+            tmp_path = path + '.tmp'
+            part.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+            record(symbol, day, len(part), path)
+
     def hybrid_sentiment(self, api_score: float, text: str, weight: float = 0.7) -> Dict:
         """
         Hybrid Scoring: FinVADER + API Signals for +15% accuracy improvement
@@ -1037,8 +1691,12 @@ class ComprehensiveSentimentAnalyzer:
     def analyze_with_custom_lexicon(self, text: str, custom_lexicon: Dict[str, float] = None) -> Dict:
         """
         Context-Aware Lexicon Extension
-        Dynamically add ticker-specific terms
+        Dynamically add ticker-specific terms (single words or phrases)
         """
+        if custom_lexicon:
+            # Overlay is compiled once per (base analyzer, lexicon hash) and reused across calls
+            return get_lexicon_overlay(self.sid, custom_lexicon).polarity_scores(text)
+
         # Process with FinVADER (note: custom lexicon merging would require extending FinVADER)
         if FINVADER_AVAILABLE:
             try:
@@ -1186,14 +1844,8 @@ def retrieving_news_polarity(symbol, num_articles=7,
         use_case
     )
     
-    # Get company name map
-    try:
-        df = pd.read_csv('Yahoo-Finance-Ticker-Symbols.csv')
-        row = df[df['Ticker'] == symbol]
-        company_name = row['Name'].values[0] if not row.empty else symbol
-    except:
-        company_name = symbol
-        
+    # Company name from the ticker index, read once per process
+    company_name = symbol_index.get_index().name_for(symbol)
     return analyzer.get_sentiment(symbol, company_name)
 
 # Convenience functions for specific source usage
@@ -1292,16 +1944,19 @@ def fintech_sentiment(symbol, num_articles=15):
 
 # Advanced feature functions
 def batch_sentiment_analysis(symbols: List[str], num_articles: int = 10, 
-                           start_date: str = None, selected_sources=None) -> pd.DataFrame:
+                           start_date: str = None, selected_sources=None,
+                           end_date: str = None, output_dir: str = None,
+                           max_workers: int = 4) -> pd.DataFrame:
     """
-    Batch process sentiment analysis for multiple symbols
-    Performance: Processes 10,000+ articles/hour on single core
+    Batch process sentiment analysis for multiple symbols in a worker pool.
+    Pass output_dir to run a resumable backfill into partitioned Parquet.
     """
     analyzer = ComprehensiveSentimentAnalyzer(
         num_articles=num_articles,
         selected_sources=selected_sources
     )
-    return analyzer.batch_process_sentiments(symbols, start_date)
+    return analyzer.batch_process_sentiments(symbols, start_date, end_date=end_date,
+                                             output_dir=output_dir, max_workers=max_workers)
 
 def hybrid_sentiment_analysis(api_score: float, text: str, weight: float = 0.7) -> Dict:
     """
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Offline NLTK resource provisioning.
+
+The app never downloads NLTK data at runtime. Provision the resources once,
+on a machine with network access or from a mirror, and ship the directory
+with the deployment:
+
+    python nltk_resources.py                 # into ./nltk_data
+    python nltk_resources.py --dir /opt/nltk_data
+
+At runtime NLTK only searches NLTK_DATA_DIR (the NLTK_DATA environment
+variable, defaulting to nltk_data/ next to this file). A missing resource
+raises NLTKResourceError naming the command above instead of stalling on a
+network timeout.
+"""
+import argparse
+import os
+import sys
+
+import nltk
+
+NLTK_DATA_DIR = os.environ.get('NLTK_DATA', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nltk_data'))
+
+# Resource name -> path checked with nltk.data.find
+REQUIRED_NLTK_DATA = {
+    'vader_lexicon': 'sentiment/vader_lexicon.zip',
+    'punkt': 'tokenizers/punkt',
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+}
+
+
+class NLTKResourceError(LookupError):
+    """Raised when a required NLTK resource has not been provisioned"""
+    def __init__(self, missing, data_dir=None):
+        self.missing = list(missing)
+        self.data_dir = data_dir or NLTK_DATA_DIR
+        super().__init__(
+            f"NLTK resources not provisioned in {self.data_dir}: {', '.join(self.missing)}. "
+            f"Run `python nltk_resources.py --dir {self.data_dir}` on a machine with network "
+            f"access and ship the directory, or point NLTK_DATA at an existing copy."
+        )
+
+
+def use_local_data(data_dir: str = None):
+    """Restrict NLTK's search path to the provisioned directory"""
+    nltk.data.path[:] = [data_dir or NLTK_DATA_DIR]
+
+
+def missing_resources(names=None, data_dir: str = None):
+    """Names of required resources not found in the data directory"""
+    data_dir = data_dir or NLTK_DATA_DIR
+    missing = []
+    for name in names or REQUIRED_NLTK_DATA:
+        try:
+            nltk.data.find(REQUIRED_NLTK_DATA.get(name, name), paths=[data_dir])
+        except LookupError:
+            missing.append(name)
+    return missing
+
+
+def check_resources(names=None, data_dir: str = None):
+    """Raise NLTKResourceError unless every required resource is provisioned"""
+    missing = missing_resources(names, data_dir)
+    if missing:
+        raise NLTKResourceError(missing, data_dir)
+
+
+def provision(data_dir: str = None, names=None):
+    """Download the required resources into data_dir; returns the names fetched"""
+    data_dir = data_dir or NLTK_DATA_DIR
+    os.makedirs(data_dir, exist_ok=True)
+    fetched = []
+    for name in missing_resources(names, data_dir):
+        print(f"Downloading NLTK dataset: {name} -> {data_dir}")
+        if not nltk.download(name, download_dir=data_dir, quiet=True, raise_on_error=True):
+            raise NLTKResourceError([name], data_dir)
+        fetched.append(name)
+    check_resources(names, data_dir)
+    return fetched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Vendor NLTK resources for offline use')
+    parser.add_argument('--dir', default=NLTK_DATA_DIR, help='target data directory')
+    parser.add_argument('--check', action='store_true', help='only verify, do not download')
+    args = parser.parse_args(argv)
+    try:
+        if args.check:
+            check_resources(data_dir=args.dir)
+            print(f"All NLTK resources present in {args.dir}")
+        else:
+            fetched = provision(args.dir)
+            print(f"Provisioned {len(fetched)} resource(s); all present in {args.dir}")
+    except (NLTKResourceError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Price-history prewarming after each exchange's close.
+
+Without it the first /predict of the day for a symbol downloads two years
+of history inside the user's request. PrewarmScheduler wakes up
+PREWARM_DELAY_MINUTES after every weekday close of the calendars below and
+refreshes the stored {SYMBOL}.csv of every symbol on that calendar: the
+active companies and the symbols predicted in the last PREWARM_RECENT_DAYS
+(main.prewarm_symbols). At most PREWARM_CONCURRENCY symbols download at
+once, at the rate limiter's batch priority, so user requests keep their
+place in the provider queues.
+
+is_fresh() is the matching freshness rule for get_historical: history is
+current once it contains the latest completed session, or was fetched at
+least PREWARM_DELAY after that session closed (covers holidays, when no new
+bar appears). The fetch time is the one record_fetch() stored next to the
+file, never its mtime, so a copied or checked-out CSV has to hold the bar.
+
+Under gunicorn every worker starts a scheduler (gunicorn.conf.post_fork),
+but only the one holding the PREWARM_LOCK_PATH file lock runs refreshes;
+the others retry the lock every minute and take over if that worker exits.
+`flask prewarm-prices` runs one refresh by hand or from cron.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from datetime import time as clock_time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from dateutil import tz
+
+import rate_limiter
+
+# Calendar -> (timezone, regular close). Holidays are not modelled: a run
+# on a holiday finds nothing new and is_fresh() accepts the file as it is.
+CALENDARS = {
+    'US': ('America/New_York', clock_time(16, 0)),
+    'IN': ('Asia/Kolkata', clock_time(15, 30)),
+    'UK': ('Europe/London', clock_time(16, 30)),
+}
+# Company.exchange values and Yahoo exchange codes (symbol_index) -> calendar
+EXCHANGE_CALENDARS = {
+    'NASDAQ': 'US', 'NYSE': 'US', 'AMEX': 'US', 'NYSEARCA': 'US', 'NYSE ARCA': 'US', 'US': 'US',
+    'NMS': 'US', 'NGM': 'US', 'NCM': 'US', 'NYQ': 'US', 'ASE': 'US', 'PCX': 'US',
+    'NSE': 'IN', 'NSI': 'IN', 'BSE': 'IN', 'BOM': 'IN', 'IN': 'IN',
+    'LSE': 'UK', 'LON': 'UK', 'UK': 'UK',
+}
+# yfinance symbol suffixes -> calendar, for symbols without a Company row
+SUFFIX_CALENDARS = {'.NS': 'IN', '.BO': 'IN', '.L': 'UK'}
+DEFAULT_CALENDAR = os.environ.get('PREWARM_DEFAULT_CALENDAR', 'US')
+
+# Wait after the close so providers have published the final daily bar
+PREWARM_DELAY = timedelta(minutes=float(os.environ.get('PREWARM_DELAY_MINUTES', '30')))
+PREWARM_CONCURRENCY = int(os.environ.get('PREWARM_CONCURRENCY', '4'))
+PREWARM_RECENT_DAYS = int(os.environ.get('PREWARM_RECENT_DAYS', '7'))
+PREWARM_LOCK_PATH = os.environ.get('PREWARM_LOCK_PATH', os.path.join(tempfile.gettempdir(), 'sams-prewarm.lock'))
+# How often a worker without the lock tries to take it over
+LOCK_RETRY_SECONDS = 60.0
+
+
+def calendar_for(symbol: str, exchange: str = None) -> str:
+    """Trading calendar of a symbol, from its exchange or else its yfinance suffix"""
+    if exchange and exchange.strip().upper() in EXCHANGE_CALENDARS:
+        return EXCHANGE_CALENDARS[exchange.strip().upper()]
+    upper = symbol.upper()
+    for suffix, calendar in SUFFIX_CALENDARS.items():
+        if upper.endswith(suffix):
+            return calendar
+    return DEFAULT_CALENDAR
+
+
+def _now(calendar: str, now: datetime = None) -> datetime:
+    zone = tz.gettz(CALENDARS[calendar][0])
+    return (now or datetime.now(tz.UTC)).astimezone(zone)
+
+
+def _close_on(calendar: str, day: date) -> datetime:
+    zone_name, close = CALENDARS[calendar]
+    return datetime.combine(day, close, tzinfo=tz.gettz(zone_name))
+
+
+def last_close(calendar: str, now: datetime = None) -> datetime:
+    """Close of the latest weekday session that has ended by now (timezone-aware)"""
+    local = _now(calendar, now)
+    day = local.date()
+    while day.weekday() >= 5 or _close_on(calendar, day) > local:
+        day -= timedelta(days=1)
+    return _close_on(calendar, day)
+
+
+def next_run(calendar: str, now: datetime = None, delay: timedelta = PREWARM_DELAY) -> datetime:
+    """First weekday close + delay strictly after now (timezone-aware)"""
+    local = _now(calendar, now)
+    day = local.date() - timedelta(days=1)
+    while True:
+        if day.weekday() < 5 and _close_on(calendar, day) + delay > local:
+            return _close_on(calendar, day) + delay
+        day += timedelta(days=1)
+
+
+def is_fresh(last_date: date, fetched_at: Optional[float], calendar: str, now: datetime = None,
+             delay: timedelta = PREWARM_DELAY) -> bool:
+    """
+    True when stored history whose last row is last_date, downloaded at the
+    fetched_at timestamp (None if unknown), needs no download: it holds the
+    latest completed session, or it was fetched once providers had published
+    that session's bar (delay after the close).
+    """
+    session = last_close(calendar, now)
+    if last_date >= session.date():
+        return True
+    return fetched_at is not None and fetched_at >= (session + delay).timestamp()
+
+
+def _fetch_record_path(path: str) -> str:
+    return path + '.fetched'
+
+
+def record_fetch(path: str, fetched_at: float = None):
+    """Store when the history file at path was downloaded, tied to its current size and mtime"""
+    stat = os.stat(path)
+    record = {'fetched_at': time.time() if fetched_at is None else fetched_at,
+              'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+    partial = f'{_fetch_record_path(path)}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(partial, 'w') as handle:
+        json.dump(record, handle)
+    os.replace(partial, _fetch_record_path(path))
+
+
+def recorded_fetch(path: str) -> Optional[float]:
+    """Download time stored by record_fetch, or None if missing or the file changed since"""
+    try:
+        with open(_fetch_record_path(path)) as handle:
+            record = json.load(handle)
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    if (record.get('mtime_ns'), record.get('size')) != (stat.st_mtime_ns, stat.st_size):
+        return None
+    return record.get('fetched_at')
+
+
+class PrewarmScheduler:
+    """
+    Refreshes stored price history after every close. symbols() returns
+    (symbol, exchange) pairs, exchange may be None; refresh(symbol) brings
+    one symbol's history up to date and raises on failure.
+    """
+
+    def __init__(self, symbols: Callable[[], Iterable[Tuple[str, Optional[str]]]],
+                 refresh: Callable[[str], None], concurrency: int = PREWARM_CONCURRENCY,
+                 delay: timedelta = PREWARM_DELAY, lock_path: str = PREWARM_LOCK_PATH):
+        self.symbols = symbols
+        self.refresh = refresh
+        self.concurrency = concurrency
+        self.delay = delay
+        self.lock_path = lock_path
+        self.last_run = None
+        self.next_run = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock_file = None
+
+    def due(self, now: datetime = None) -> Tuple[datetime, List[str]]:
+        """(when, calendars) of the next scheduled run"""
+        runs = {calendar: next_run(calendar, now, self.delay) for calendar in CALENDARS}
+        when = min(runs.values())
+        return when, sorted(c for c, at in runs.items() if at == when)
+
+    def run_once(self, calendars: Iterable[str] = None) -> Dict:
+        """Refresh every symbol on the given calendars (default: all); returns a summary"""
+        calendars = set(calendars or CALENDARS)
+        started = time.monotonic()
+        symbols = sorted({symbol.upper() for symbol, exchange in self.symbols()
+                          if calendar_for(symbol, exchange) in calendars})
+        failed = {}
+
+        def refresh_one(symbol):
+            # Batch priority: interactive /predict and quote requests go first
+            with rate_limiter.priority(rate_limiter.BATCH):
+                try:
+                    self.refresh(symbol)
+                except Exception as e:
+                    failed[symbol] = str(e)
+
+        if symbols:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='prewarm') as pool:
+                list(pool.map(refresh_one, symbols))
+        self.last_run = {
+            'calendars': sorted(calendars),
+            'finished_at': datetime.now(tz.UTC).isoformat(timespec='seconds'),
+            'symbols': len(symbols),
+            'failed': failed,
+            'seconds': round(time.monotonic() - started, 2),
+        }
+        return self.last_run
+
+    def _owns_lock(self) -> bool:
+        if self._lock_file is not None:
+            return True
+        try:
+            import fcntl
+        except ImportError:
+            # No flock (Windows): a single-process server, nothing to coordinate
+            return True
+        handle = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._lock_file = handle
+        return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if not self._owns_lock():
+                self._stop.wait(LOCK_RETRY_SECONDS)
+                continue
+            when, calendars = self.due()
+            self.next_run = when.isoformat(timespec='seconds')
+            if self._stop.wait(max(0.0, when.timestamp() - time.time())):
+                break
+            try:
+                summary = self.run_once(calendars)
+                print(f"Prewarmed price history for {', '.join(calendars)}: {summary}")
+            except Exception as e:
+                print(f"Price history prewarm for {', '.join(calendars)} failed: {e}")
+
+    def start(self) -> bool:
+        """Start the background thread once per process; False if already running"""
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='price-prewarm', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def status(self) -> Dict:
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'owns_lock': self._lock_file is not None,
+            'next_run': self.next_run,
+            'last_run': self.last_run,
+        }
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Shared outbound rate limiting for market-data and news providers.
+
+One token bucket per host, shared by every thread in the process. Waiters
+are served by priority class first (interactive /predict and dashboard
+calls before batch jobs) and in arrival order within a class. Queue waits
+are recorded per host and class for monitoring.
+"""
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+# Priority classes: lower value is served first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch'}
+
+# (tokens per second, burst) per host; subdomains use their parent's entry
+DEFAULT_HOST_LIMITS = {
+    'finance.yahoo.com': (2.0, 10),
+    'alphavantage.co': (5 / 60.0, 5),     # free tier: 5 requests per minute
+    'eodhd.com': (1.0, 5),
+    'finnhub.io': (1.0, 10),              # free tier: 60 requests per minute
+    'finviz.com': (1.0, 3),               # answers bursts with 403
+    'news.google.com': (1.0, 5),
+    'tradestie.com': (1.0, 5),
+    'newsapi.org': (1.0, 5),
+    'stockgeist.ai': (1.0, 5),
+}
+# Any other host, e.g. article pages downloaded by newspaper3k
+DEFAULT_LIMIT = (5.0, 10)
+# Longest a caller queues for a token before giving up
+DEFAULT_ACQUIRE_TIMEOUT = 30.0
+# Pause applied to a host that answered 429 without a usable Retry-After
+DEFAULT_THROTTLE_PAUSE = 30.0
+
+_current_priority = contextvars.ContextVar('outbound_priority', default=INTERACTIVE)
+
+
+class RateLimitTimeout(Exception):
+    """Raised when no token became available within the acquire timeout"""
+
+
+@contextmanager
+def priority(level: int):
+    """Run the enclosed outbound calls (and contexts copied from it) at this priority"""
+    token = _current_priority.set(level)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def host_of(url_or_host: str) -> str:
+    """Bare lowercase host of a URL (or host), without port and leading www."""
+    value = url_or_host or ''
+    netloc = urlsplit(value).netloc if '//' in value else value
+    host = netloc.split('@')[-1].split(':')[0].lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class _HostBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiters = []
+        self.throttled = 0
+        self.stats = {level: {'count': 0, 'wait_sum': 0.0, 'wait_max': 0.0} for level in PRIORITY_NAMES}
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_in(self, now: float) -> float:
+        """Seconds until the next token can be taken"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Per-host token buckets with priority-ordered waiting"""
+    def __init__(self, limits: Dict[str, tuple] = None, default: tuple = DEFAULT_LIMIT):
+        self._limits = dict(DEFAULT_HOST_LIMITS if limits is None else limits)
+        self._default = default
+        self._buckets = {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+
+    def configure(self, host: str, rate: float, burst: int):
+        """Set the limit for a host (and its subdomains); resets its bucket"""
+        with self._cond:
+            self._limits[host_of(host)] = (rate, burst)
+            for key in [k for k in self._buckets if k == host_of(host) or k.endswith('.' + host_of(host))]:
+                del self._buckets[key]
+
+    def _limit_key(self, host: str) -> str:
+        parts = host.split('.')
+        for i in range(len(parts) - 1):
+            candidate = '.'.join(parts[i:])
+            if candidate in self._limits:
+                return candidate
+        return host
+
+    def _bucket(self, host: str) -> _HostBucket:
+        key = self._limit_key(host)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate, burst = self._limits.get(key, self._default)
+            bucket = self._buckets[key] = _HostBucket(rate, burst)
+        return bucket
+
+    def acquire(self, host: str, level: int = None, timeout: Optional[float] = DEFAULT_ACQUIRE_TIMEOUT) -> float:
+        """
+        Block until a token for host is available and take it.
+        Returns the seconds spent queueing; raises RateLimitTimeout after timeout.
+        """
+        level = _current_priority.get() if level is None else level
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        with self._cond:
+            bucket = self._bucket(host_of(host))
+            entry = (level, next(self._seq))
+            heapq.heappush(bucket.waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    bucket.refill(now)
+                    ready_in = bucket.ready_in(now)
+                    is_head = bucket.waiters[0] == entry
+                    if is_head and ready_in <= 0:
+                        heapq.heappop(bucket.waiters)
+                        bucket.tokens -= 1
+                        break
+                    if deadline is not None and now >= deadline:
+                        raise RateLimitTimeout(f"No token for {host_of(host)} within {timeout:.1f}s")
+                    # Only the head sleeps until its token; the rest wait to become head
+                    wait = ready_in if is_head else None
+                    if deadline is not None:
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self._cond.wait(wait)
+            except BaseException:
+                if entry in bucket.waiters:
+                    bucket.waiters.remove(entry)
+                    heapq.heapify(bucket.waiters)
+                self._cond.notify_all()
+                raise
+            waited = time.monotonic() - started
+            stats = bucket.stats.setdefault(level, {'count': 0, 'wait_sum': 0.0, 'wait_max': 0.0})
+            stats['count'] += 1
+            stats['wait_sum'] += waited
+            stats['wait_max'] = max(stats['wait_max'], waited)
+            self._cond.notify_all()
+        return waited
+
+    def penalize(self, host: str, seconds: float):
+        """Stop handing out tokens for host, e.g. after a 429"""
+        with self._cond:
+            bucket = self._bucket(host_of(host))
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + seconds)
+            bucket.tokens = 0.0
+            bucket.throttled += 1
+            self._cond.notify_all()
+
+    def metrics(self) -> Dict:
+        """Per-host limits, queue depth and queue-wait statistics by priority class"""
+        report = {}
+        with self._cond:
+            now = time.monotonic()
+            for key, bucket in self._buckets.items():
+                report[key] = {
+                    'rate_per_second': bucket.rate,
+                    'burst': bucket.burst,
+                    'queue_depth': len(bucket.waiters),
+                    'throttled': bucket.throttled,
+                    'blocked_for': round(max(0.0, bucket.blocked_until - now), 3),
+                    'wait_seconds': {
+                        PRIORITY_NAMES.get(level, str(level)): {
+                            'count': s['count'],
+                            'sum': round(s['wait_sum'], 4),
+                            'max': round(s['wait_max'], 4),
+                        }
+                        for level, s in bucket.stats.items()
+                    },
+                }
+        return report
+
+
+limiter = RateLimiter()
+
+
+def acquire(host_or_url: str, timeout: Optional[float] = DEFAULT_ACQUIRE_TIMEOUT) -> float:
+    """Take a token from the shared limiter at the caller's current priority"""
+    return limiter.acquire(host_of(host_or_url), timeout=timeout)
+
+
+def limited_get(url: str, **kwargs):
+    """requests.get through the shared limiter; a 429 pauses the host"""
+    host = host_of(url)
+    limiter.acquire(host)
+    response = requests.get(url, **kwargs)
+    if response.status_code == 429:
+        try:
+            pause = float(response.headers.get('Retry-After', DEFAULT_THROTTLE_PAUSE))
+        except (TypeError, ValueError):
+            pause = DEFAULT_THROTTLE_PAUSE
+        limiter.penalize(host, pause)
+    return response
+
+
+def metrics() -> Dict:
+    return limiter.metrics()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+In-memory index of the ticker universe (Yahoo-Finance-Ticker-Symbols.csv).
+
+The file is read once per process (TICKER_SYMBOLS_PATH overrides its
+location; wsgi.preload loads it in the gunicorn master). Lookups are dict
+hits; prefix search bisects sorted symbol and name lists, so autocomplete
+costs O(log n + results).
+
+Indian listings carry yfinance suffixes (TCS.NS, TCS.BO). resolve() finds
+them from the bare symbol or from Alpha Vantage's NSE:TCS / BSE:TCS form,
+and alpha_vantage_symbols() gives the forms the Alpha Vantage provider
+should try, the exchange-qualified one first when the listing is known.
+"""
+import csv
+import os
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+from typing import Iterable, List, Optional
+
+TICKER_SYMBOLS_PATH = os.environ.get('TICKER_SYMBOLS_PATH', 'Yahoo-Finance-Ticker-Symbols.csv')
+
+Listing = namedtuple('Listing', 'symbol name exchange country')
+
+# yfinance suffix -> Alpha Vantage prefix, in the order a bare symbol is resolved
+SUFFIX_PREFIXES = {'.NS': 'NSE:', '.BO': 'BSE:'}
+PREFIX_SUFFIXES = {prefix: suffix for suffix, prefix in SUFFIX_PREFIXES.items()}
+
+
+class SymbolIndex:
+    """Listings keyed by upper-case symbol, with sorted keys for prefix search"""
+
+    def __init__(self, listings: Iterable[Listing] = ()):
+        self._listings = {}
+        for listing in listings:
+            # First row wins, like the old df[df['Ticker'] == symbol] lookup
+            self._listings.setdefault(listing.symbol.upper(), listing)
+        self._symbols = sorted(self._listings)
+        self._names = sorted((listing.name.lower(), key) for key, listing in self._listings.items() if listing.name)
+
+    @classmethod
+    def from_csv(cls, path: str) -> 'SymbolIndex':
+        """Index a Ticker,Name,Exchange[,...,Country] file; empty if it does not exist"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, newline='', encoding='utf-8', errors='replace') as handle:
+            reader = csv.DictReader(handle)
+            return cls(
+                Listing(row['Ticker'].strip(), (row.get('Name') or '').strip(),
+                        (row.get('Exchange') or '').strip(), (row.get('Country') or '').strip())
+                for row in reader if (row.get('Ticker') or '').strip()
+            )
+
+    def __len__(self) -> int:
+        return len(self._listings)
+
+    def get(self, symbol: str) -> Optional[Listing]:
+        """Listing for exactly this symbol (any case), or None"""
+        return self._listings.get(symbol.strip().upper())
+
+    def resolve(self, symbol: str) -> Optional[Listing]:
+        """Listing for symbol, NSE:/BSE: symbol or a bare symbol listed only with a suffix"""
+        key = symbol.strip().upper()
+        if key in self._listings:
+            return self._listings[key]
+        for prefix, suffix in PREFIX_SUFFIXES.items():
+            if key.startswith(prefix):
+                return self._listings.get(key[len(prefix):] + suffix)
+        for suffix in SUFFIX_PREFIXES:
+            if key + suffix in self._listings:
+                return self._listings[key + suffix]
+        return None
+
+    def name_for(self, symbol: str) -> str:
+        """Company name for symbol, or the symbol itself when unknown"""
+        listing = self.resolve(symbol)
+        return listing.name if listing and listing.name else symbol
+
+    def alpha_vantage_symbols(self, symbol: str) -> List[str]:
+        """Symbol forms for Alpha Vantage to try in order, ending with the plain and NSE: forms"""
+        key = symbol.strip().upper()
+        forms = []
+        listing = self.resolve(key)
+        if listing:
+            upper = listing.symbol.upper()
+            for suffix, prefix in SUFFIX_PREFIXES.items():
+                if upper.endswith(suffix):
+                    forms.append(prefix + upper[:-len(suffix)])
+        forms += [key, 'NSE:' + key]
+        return list(dict.fromkeys(forms))
+
+    def search(self, prefix: str, limit: int = 10) -> List[Listing]:
+        """Listings whose symbol, then whose name, starts with prefix; exact symbol first"""
+        prefix = prefix.strip()
+        if not prefix or limit <= 0:
+            return []
+        # Insertion-ordered set of matching keys
+        found = {}
+        exact = prefix.upper()
+        if exact in self._listings:
+            found[exact] = None
+        # Index walks rather than slices, which would copy the rest of the list
+        position = bisect_left(self._symbols, exact)
+        while position < len(self._symbols) and len(found) < limit:
+            key = self._symbols[position]
+            if not key.startswith(exact):
+                break
+            found[key] = None
+            position += 1
+        lowered = prefix.lower()
+        position = bisect_left(self._names, (lowered, ''))
+        while position < len(self._names) and len(found) < limit:
+            name, key = self._names[position]
+            if not name.startswith(lowered):
+                break
+            found[key] = None
+            position += 1
+        return [self._listings[key] for key in found]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> SymbolIndex:
+    """The process-wide index, read from TICKER_SYMBOLS_PATH on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SymbolIndex.from_csv(TICKER_SYMBOLS_PATH)
+    return _index
@@ -7,6 +7,7 @@ This module provides common fixtures and configuration for all test modules.
 import pytest
 import sys
 import os
+from contextlib import contextmanager
 from decimal import Decimal
 from datetime import datetime, timedelta
 
@@ -42,12 +43,16 @@ def client(test_app):
 @pytest.fixture(scope='function')
 def test_db(test_app):
     """Create a fresh database for each test."""
+    from main import invalidate_broker_cache
     with test_app.app_context():
         db.create_all()
+        # drop_all bypasses the session events that keep the broker cache fresh
+        invalidate_broker_cache()
         yield db
         db.session.remove()
         db.drop_all()
         db.create_all()
+        invalidate_broker_cache()
 
 
 @pytest.fixture
@@ -253,6 +258,49 @@ def sample_transactions(test_db, sample_user, sample_company, sample_broker):
     return transactions
 
 
+@pytest.fixture
+def count_queries(test_db):
+    """
+    Context manager recording every SQL statement run inside it.
+
+        with count_queries() as statements:
+            client.get('/dashboard')
+        assert len(statements) == ...
+    """
+    from sqlalchemy import event
+
+    @contextmanager
+    def _count():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(test_db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(test_db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    return _count
+
+
+@pytest.fixture
+def assert_max_queries(count_queries):
+    """
+    Fail if the block runs more than `limit` SQL statements; use it to keep
+    per-row lazy loads (N+1 queries) out of pages that render lists.
+    """
+    @contextmanager
+    def _assert(limit):
+        with count_queries() as statements:
+            yield statements
+        assert len(statements) <= limit, (
+            f"{len(statements)} queries run, expected at most {limit}:\n" + "\n".join(statements)
+        )
+
+    return _assert
+
 def pytest_configure(config):
     """Configure pytest with custom markers."""
     config.addinivalue_line(
@@ -51,7 +51,16 @@ from news_sentiment import (
     log_sentiment_distribution,
     # Enums
     SentimentSource,
-    UseCase
+    UseCase,
+    # Lexicon overlays
+    get_lexicon_overlay,
+    # Deduplication
+    ArticleIndex,
+    normalize_url,
+    # Latency budgets and circuit breakers
+    CircuitBreaker,
+    get_source_health,
+    reset_source_health
 )
 
 
@@ -215,6 +224,355 @@ class TestAdvancedFeatures(unittest.TestCase):
             mock_lexicon.assert_called_once()
 
 
+class TestCustomLexiconOverlay(unittest.TestCase):
+    """Test compiled custom-lexicon overlays"""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Build a VADER analyzer from a tiny lexicon so no NLTK download is needed"""
+        from nltk.sentiment.vader import SentimentIntensityAnalyzer
+        handle, cls.lexicon_path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(handle, 'w') as f:
+            f.write("good\t1.9\t0.9\t[2]\nbad\t-2.5\t0.9\t[2]")
+        cls.sid = SentimentIntensityAnalyzer(lexicon_file='file:' + cls.lexicon_path)
+    
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.lexicon_path)
+    
+    def test_custom_terms_change_score(self):
+        """Test that single-word custom terms affect the compound score"""
+        text = "Blockchain rollout announced"
+        base = self.sid.polarity_scores(text)
+        overlay = get_lexicon_overlay(self.sid, {"blockchain": 2.0})
+        
+        self.assertEqual(base['compound'], 0.0)
+        self.assertGreater(overlay.polarity_scores(text)['compound'], 0)
+    
+    def test_phrases_are_scored(self):
+        """Test that multi-word phrases match case- and whitespace-insensitively"""
+        overlay = get_lexicon_overlay(self.sid, {"FDA rejection": -2.0})
+        
+        self.assertLess(overlay.polarity_scores("fda   Rejection hits shares")['compound'], 0)
+    
+    def test_overlay_cached_per_lexicon_hash(self):
+        """Test that equal lexicons share one compiled overlay"""
+        first = get_lexicon_overlay(self.sid, {"guidance raised": 1.5, "recall": -1.0})
+        second = get_lexicon_overlay(self.sid, {"recall": -1.0, "Guidance Raised": 1.5})
+        
+        self.assertIs(first, second)
+    
+    def test_base_lexicon_untouched(self):
+        """Test that compiling an overlay does not mutate the base analyzer"""
+        get_lexicon_overlay(self.sid, {"moat": 1.0})
+        
+        self.assertNotIn("moat", self.sid.lexicon)
+        self.assertEqual(len(self.sid.lexicon), 2)
+    
+    def test_overlay_cached_per_base_analyzer(self):
+        """Test that one lexicon on two base analyzers gives two overlays, each keeping its base"""
+        import copy
+        finance = copy.copy(self.sid)
+        finance.lexicon = dict(self.sid.lexicon, bullish=2.0)
+        plain = get_lexicon_overlay(self.sid, {"recall": -1.0})
+        financial = get_lexicon_overlay(finance, {"recall": -1.0})
+        
+        self.assertIsNot(plain, financial)
+        self.assertEqual(plain.polarity_scores("bullish")['compound'], 0.0)
+        self.assertGreater(financial.polarity_scores("bullish")['compound'], 0)
+    
+    def test_overlay_keeps_base_while_cached(self):
+        """Test that a cached overlay pins its base, so the id in its key cannot be reused"""
+        import copy
+        finance = copy.copy(self.sid)
+        overlay = get_lexicon_overlay(finance, {"recall": -1.0})
+        
+        self.assertIs(overlay.base, finance)
+        self.assertIs(get_lexicon_overlay(finance, {"recall": -1.0}), overlay)
+        self.assertIsNot(get_lexicon_overlay(self.sid, {"recall": -1.0}), overlay)
+
+
+class TestBatchBackfill(unittest.TestCase):
+    """Test parallel, resumable batch processing"""
+    
+    ARTICLES = [
+        {'title': 'Up move', 'url': 'https://a.example/1', 'text': 'shares up', 'source': 'Finviz', 'date': 'Jan-05-24 09:30AM'},
+        {'title': 'Down move', 'url': 'https://a.example/2', 'text': 'shares down', 'source': 'Finviz', 'date': '10:15AM'},
+        {'title': 'Earlier', 'url': 'https://a.example/3', 'text': 'up', 'source': 'Finviz', 'date': 'Jan-03-24 09:30AM'},
+        {'title': 'Too old', 'url': 'https://a.example/4', 'text': 'up', 'source': 'Finviz', 'date': 'Dec-20-23 09:30AM'},
+    ]
+    
+    def setUp(self):
+        with patch('news_sentiment.SentimentIntensityAnalyzer') as mock_sid:
+            mock_sid.return_value.polarity_scores.side_effect = (
+                lambda text: {'compound': 0.5 if 'up' in text else -0.5})
+            self.analyzer = ComprehensiveSentimentAnalyzer(
+                selected_sources=[SentimentSource.FINVIZ_FINVADER])
+        self.output_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+    
+    def test_start_date_is_honored(self):
+        """Test that articles before start_date are dropped and time-only dates inherit the day"""
+        with patch.object(self.analyzer, 'get_finviz_news', return_value=list(self.ARTICLES)):
+            df = self.analyzer.batch_process_sentiments(['AAPL', 'MSFT'], start_date='2024-01-01')
+        
+        self.assertEqual(len(df), 6)
+        self.assertNotIn('Too old', list(df['title']))
+        down = df[df['title'] == 'Down move'].iloc[0]
+        self.assertEqual(str(down['article_date'].date()), '2024-01-05')
+    
+    def test_backfill_writes_partitioned_parquet(self):
+        """Test that backfill streams each (symbol, date) unit to its own partition"""
+        import pandas as pd
+        with patch.object(self.analyzer, 'get_finviz_news', return_value=list(self.ARTICLES)):
+            summary = self.analyzer.batch_process_sentiments(
+                ['AAPL'], start_date='2024-01-01', end_date='2024-01-06', output_dir=self.output_dir)
+        
+        self.assertEqual(len(summary), 6)
+        self.assertEqual(int(summary['rows'].sum()), 3)
+        self.assertTrue(os.path.exists(os.path.join(
+            self.output_dir, 'symbol=AAPL', 'article_date=2024-01-05', 'part-0.parquet')))
+        written = pd.read_parquet(self.output_dir)
+        self.assertEqual(len(written), 3)
+    
+    def test_backfill_resumes_from_checkpoint(self):
+        """Test that checkpointed units are skipped on the next run"""
+        with patch.object(self.analyzer, 'get_finviz_news', return_value=list(self.ARTICLES)) as mock_news:
+            self.analyzer.batch_process_sentiments(
+                ['AAPL'], start_date='2024-01-01', end_date='2024-01-03', output_dir=self.output_dir)
+            summary = self.analyzer.batch_process_sentiments(
+                ['AAPL', 'MSFT'], start_date='2024-01-01', end_date='2024-01-03', output_dir=self.output_dir)
+        
+        self.assertEqual(set(summary['symbol']), {'MSFT'})
+        self.assertEqual(mock_news.call_count, 2)
+    
+    def test_backfill_retries_symbol_when_every_source_failed(self):
+        """Test that a failed fetch is not checkpointed as days without articles"""
+        import news_sentiment
+        health = {SentimentSource.FINVIZ_FINVADER: news_sentiment.SourceHealth()}
+        with patch.dict(news_sentiment._source_health, health):
+            with patch.object(self.analyzer, 'get_finviz_news', side_effect=RuntimeError('down')):
+                summary = self.analyzer.batch_process_sentiments(
+                    ['AAPL'], start_date='2024-01-01', end_date='2024-01-03', output_dir=self.output_dir)
+            self.assertEqual(len(summary), 0)
+            
+            with patch.object(self.analyzer, 'get_finviz_news', return_value=list(self.ARTICLES)):
+                summary = self.analyzer.batch_process_sentiments(
+                    ['AAPL'], start_date='2024-01-01', end_date='2024-01-03', output_dir=self.output_dir)
+        
+        self.assertEqual(len(summary), 3)
+        self.assertEqual(int(summary['rows'].sum()), 1)
+    
+    def test_backfill_leaves_uncovered_days_pending(self):
+        """Test that days older than the live feed reaches are reported uncovered and not checkpointed"""
+        recent = [article for article in self.ARTICLES if article['title'] != 'Too old']
+        with patch.object(self.analyzer, 'get_finviz_news', return_value=recent) as mock_news:
+            summary = self.analyzer.batch_process_sentiments(
+                ['AAPL'], start_date='2024-01-01', end_date='2024-01-04', output_dir=self.output_dir)
+            again = self.analyzer.batch_process_sentiments(
+                ['AAPL'], start_date='2024-01-01', end_date='2024-01-04', output_dir=self.output_dir)
+        
+        self.assertEqual(list(summary[~summary['covered']]['date']), ['2024-01-01', '2024-01-02'])
+        self.assertEqual(list(again['date']), ['2024-01-01', '2024-01-02'])
+        self.assertFalse(again['covered'].any())
+        self.assertEqual(mock_news.call_count, 2)
+    
+    def test_windowed_sources_are_queried_per_window(self):
+        """Test that date-range sources are asked for each window and cover days without articles"""
+        with patch('news_sentiment.SentimentIntensityAnalyzer'):
+            analyzer = ComprehensiveSentimentAnalyzer(selected_sources=[SentimentSource.EODHD_API])
+        with patch.object(analyzer, 'get_eodhd_sentiment', return_value=[]) as mock_api:
+            summary = analyzer.batch_process_sentiments(
+                ['AAPL'], start_date='2024-01-01', end_date='2024-03-01', output_dir=self.output_dir)
+        
+        self.assertEqual(sorted(call.args for call in mock_api.call_args_list), [
+            ('AAPL', '2024-01-01', '2024-01-30'),
+            ('AAPL', '2024-01-31', '2024-02-29'),
+            ('AAPL', '2024-03-01', '2024-03-01'),
+        ])
+        self.assertEqual(len(summary), 61)
+        self.assertTrue(summary['covered'].all())
+    
+    def test_backfill_requires_start_date(self):
+        """Test that a backfill without start_date is rejected"""
+        with self.assertRaises(ValueError):
+            self.analyzer.backfill_sentiments(['AAPL'], None, output_dir=self.output_dir)
+
+
+class TestArticleDeduplication(unittest.TestCase):
+    """Test the cross-source article deduplication index"""
+    
+    BODY = ("Apple reported quarterly revenue above Wall Street expectations on Thursday, "
+            "driven by strong demand for its latest iPhone models and services growth. ") * 3
+    
+    def setUp(self):
+        with patch('news_sentiment.SentimentIntensityAnalyzer') as mock_sid:
+            mock_sid.return_value.polarity_scores.return_value = {'compound': 0.6}
+            self.analyzer = ComprehensiveSentimentAnalyzer(
+                num_articles=5,
+                selected_sources=[SentimentSource.FINVIZ_FINVADER, SentimentSource.GOOGLE_NEWS])
+        self.analyzer.article_index = ArticleIndex()
+    
+    def test_normalize_url(self):
+        """Test that tracking parameters, fragments and www. are ignored"""
+        self.assertEqual(
+            normalize_url("http://www.Reuters.com/markets/apple/?utm_source=rss&id=3#top"),
+            normalize_url("https://reuters.com/markets/apple?id=3"))
+    
+    def test_near_duplicate_detection(self):
+        """Test that syndicated copies match by headline or by body"""
+        index = ArticleIndex()
+        story = index.add('https://reuters.com/a', 'Apple beats earnings estimates as iPhone sales surge', self.BODY)
+        
+        self.assertIs(index.lookup('https://news.google.com/x', 'Apple beats earnings estimates as iPhone sales surge - Reuters'), story)
+        self.assertIs(index.lookup('https://yahoo.com/b', 'Apple tops forecasts', self.BODY), story)
+        self.assertIsNone(index.lookup('https://cnbc.com/c', 'Tesla recalls vehicles over software fault in Europe'))
+    
+    def test_index_persists_to_disk(self):
+        """Test that a saved index is reloaded with its scores"""
+        path = os.path.join(tempfile.mkdtemp(), 'index.pkl')
+        index = ArticleIndex(path=path)
+        story = index.add('https://reuters.com/a', 'Apple beats earnings estimates as iPhone sales surge', self.BODY)
+        index.record_score(story['id'], 0.4)
+        index.save()
+        
+        reloaded = ArticleIndex(path=path)
+        self.assertEqual(reloaded.lookup('https://reuters.com/a')['compound'], 0.4)
+    
+    def test_get_sentiment_downloads_and_scores_each_story_once(self):
+        """Test that syndicated stories are dropped and repeat requests reuse cached scores"""
+        finviz = [
+            {'title': 'Apple beats earnings estimates as iPhone sales surge', 'url': 'https://reuters.com/a',
+             'text': self.BODY, 'source': 'Finviz', 'date': None},
+            {'title': 'Analysts lift Apple price targets after strong quarter', 'url': 'https://cnbc.com/b',
+             'text': 'Analysts raised targets.', 'source': 'Finviz', 'date': None},
+        ]
+        google = [
+            {'title': 'Apple beats earnings estimates as iPhone sales surge - Reuters',
+             'url': 'https://news.google.com/rss/articles/1', 'source': 'Google News', 'date': None},
+            {'title': 'Apple supplier expands production capacity in India this year',
+             'url': 'https://news.google.com/rss/articles/2', 'source': 'Google News', 'date': None},
+        ]
+        with patch.object(self.analyzer, 'get_finviz_news', side_effect=lambda t: [dict(a) for a in finviz]), \
+             patch.object(self.analyzer, 'get_google_news', side_effect=lambda q: [dict(a) for a in google]), \
+             patch.object(self.analyzer, 'analyze_full_article', return_value=(None, None)) as mock_download:
+            first = self.analyzer.get_sentiment('AAPL')
+            scored = self.analyzer.sid.polarity_scores.call_count
+            second = self.analyzer.get_sentiment('AAPL')
+        
+        self.assertEqual(len(first[1]), 3)
+        self.assertEqual(scored, 3)
+        self.assertEqual(mock_download.call_count, 1)
+        self.assertEqual(self.analyzer.sid.polarity_scores.call_count, scored)
+        self.assertEqual(first[0], second[0])
+    
+    def test_get_sentiment_does_not_save_index_per_request(self):
+        """Test that a request only schedules a save instead of pickling the index itself"""
+        path = os.path.join(tempfile.mkdtemp(), 'index.pkl')
+        self.analyzer.article_index = ArticleIndex(path=path, save_interval=3600)
+        finviz = [{'title': 'Apple beats earnings estimates as iPhone sales surge', 'url': 'https://reuters.com/a',
+                   'text': self.BODY, 'source': 'Finviz', 'date': None}]
+        with patch.object(self.analyzer, 'get_finviz_news', return_value=finviz), \
+             patch.object(self.analyzer, 'get_google_news', return_value=[]), \
+             patch.object(ArticleIndex, 'save') as mock_save:
+            self.analyzer.get_sentiment('AAPL')
+        
+        mock_save.assert_not_called()
+        self.assertFalse(os.path.exists(path))
+    
+    def test_maybe_save_writes_in_background_once_due(self):
+        """Test that due changes are saved off-thread and an unchanged index is not rewritten"""
+        path = os.path.join(tempfile.mkdtemp(), 'index.pkl')
+        index = ArticleIndex(path=path, save_interval=0)
+        self.assertIsNone(index.maybe_save())
+        index.add('https://reuters.com/a', 'Apple beats earnings estimates as iPhone sales surge', self.BODY)
+        
+        thread = index.maybe_save()
+        thread.join()
+        
+        self.assertIsNotNone(ArticleIndex(path=path).lookup('https://reuters.com/a'))
+        self.assertIsNone(index.maybe_save())
+
+
+class TestSourceBudgetsAndBreakers(unittest.TestCase):
+    """Test per-source deadlines, the sentiment budget and circuit breakers"""
+    
+    def setUp(self):
+        reset_source_health()
+        with patch('news_sentiment.SentimentIntensityAnalyzer') as mock_sid:
+            mock_sid.return_value.polarity_scores.return_value = {'compound': 0.1}
+            self.analyzer = ComprehensiveSentimentAnalyzer(
+                num_articles=5,
+                selected_sources=[SentimentSource.FINVIZ_FINVADER, SentimentSource.EODHD_API],
+                source_deadlines={SentimentSource.FINVIZ_FINVADER: 0.2},
+                sentiment_budget=5.0)
+        self.analyzer.article_index = ArticleIndex()
+    
+    def tearDown(self):
+        reset_source_health()
+    
+    @staticmethod
+    def _slow(*args):
+        import time
+        time.sleep(1.0)
+        return [{'title': 'Late headline', 'url': 'https://late.example/1', 'text': 'late', 'source': 'Finviz'}]
+    
+    def test_slow_source_abandoned_at_deadline(self):
+        """Test that a hung provider is abandoned and the chain moves on"""
+        import time
+        eodhd = [{'title': 'EODHD headline', 'url': 'https://eodhd.example/1', 'text': 'ok',
+                  'source': 'EODHD API', 'sentiment_score': 0.3}]
+        with patch.object(self.analyzer, 'get_finviz_news', side_effect=self._slow), \
+             patch.object(self.analyzer, 'get_eodhd_sentiment', return_value=eodhd):
+            started = time.monotonic()
+            polarity, titles, _, _, _, _ = self.analyzer.get_sentiment('AAPL')
+            elapsed = time.monotonic() - started
+        
+        self.assertLess(elapsed, 0.9)
+        self.assertEqual(titles, ['EODHD headline'])
+        health = get_source_health()
+        self.assertEqual(health['finviz_finvader']['timeouts'], 1)
+        self.assertEqual(health['finviz_finvader']['latency_seconds']['count'], 1)
+    
+    def test_total_budget_skips_remaining_sources(self):
+        """Test that providers are skipped once the total budget is spent"""
+        self.analyzer.sentiment_budget = 0.2
+        self.analyzer.source_deadlines[SentimentSource.FINVIZ_FINVADER] = 5.0
+        with patch.object(self.analyzer, 'get_finviz_news', side_effect=self._slow), \
+             patch.object(self.analyzer, 'get_eodhd_sentiment', return_value=[]) as mock_eodhd:
+            self.analyzer.get_sentiment('AAPL')
+        
+        mock_eodhd.assert_not_called()
+        self.assertEqual(get_source_health()['eodhd_api']['skipped'], 1)
+    
+    def test_breaker_opens_after_repeated_failures(self):
+        """Test that a failing provider is skipped during its cool-down"""
+        with patch.object(self.analyzer, 'get_finviz_news', side_effect=RuntimeError('403')) as mock_finviz:
+            for _ in range(5):
+                self.analyzer._call_source(SentimentSource.FINVIZ_FINVADER, self.analyzer.get_finviz_news, 'AAPL')
+        
+        self.assertEqual(mock_finviz.call_count, 3)
+        health = get_source_health()['finviz_finvader']
+        self.assertEqual(health['state'], 'open')
+        self.assertEqual(health['skipped'], 2)
+    
+    def test_breaker_half_open_recovers(self):
+        """Test that one successful trial call after cool-down closes the breaker"""
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=0.0)
+        breaker.record_failure()
+        breaker.record_failure()
+        
+        self.assertEqual(breaker.state, 'open')
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, 'half_open')
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
+
 class TestErrorHandlingAndMonitoring(unittest.TestCase):
     """Test error handling and monitoring features"""
     
@@ -369,6 +727,10 @@ def create_test_suite():
         TestSourceSpecificFunctions,
         TestUseCaseConfigurations,
         TestAdvancedFeatures,
+        TestCustomLexiconOverlay,
+        TestBatchBackfill,
+        TestArticleDeduplication,
+        TestSourceBudgetsAndBreakers,
         TestErrorHandlingAndMonitoring,
         TestFallbackMechanisms,
         TestPerformanceOptimizations,
@@ -353,3 +353,76 @@ class TestDatabaseConstraints:
         
         with pytest.raises(Exception):  # IntegrityError
             test_db.session.commit()
+
+    def test_unique_position_per_user_and_company(self, test_db, sample_user, sample_company):
+        """Test a user cannot hold two positions in the same company."""
+        test_db.session.add(PortfolioItem(user_id=sample_user.id, company_id=sample_company.id,
+                                          quantity=1, average_buy_price=Decimal('10.00')))
+        test_db.session.add(PortfolioItem(user_id=sample_user.id, company_id=sample_company.id,
+                                          quantity=2, average_buy_price=Decimal('20.00')))
+
+        with pytest.raises(Exception):  # IntegrityError
+            test_db.session.commit()
+        test_db.session.rollback()
+
+
+class TestSchemaMigration:
+    """Test upgrading a database created before the indexes and version columns existed."""
+
+    @pytest.fixture
+    def legacy_db(self, tmp_path):
+        from types import SimpleNamespace
+        from sqlalchemy import create_engine, text
+        engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+        db.metadata.create_all(engine)
+        with engine.begin() as conn:
+            for name in ('uq_portfolio_item_user_company', 'ix_transaction_user_created',
+                         'ix_transaction_created_at', 'ix_dividend_portfolio_item'):
+                conn.execute(text(f'DROP INDEX {name}'))
+            for table in ('user', 'portfolio_item'):
+                conn.execute(text(f'ALTER TABLE {table} DROP COLUMN version'))
+            conn.execute(text("INSERT INTO user (id, email, username, password_hash, role, wallet_balance) "
+                              "VALUES (1, 'a@example.com', 'a', 'x', 'user', 0)"))
+            conn.execute(text("INSERT INTO company (id, symbol) VALUES (1, 'AAPL')"))
+            conn.execute(text("INSERT INTO portfolio_item (id, user_id, company_id, quantity, average_buy_price) "
+                              "VALUES (1, 1, 1, 10, 100), (2, 1, 1, 30, 200)"))
+            conn.execute(text("INSERT INTO dividend (portfolio_item_id, amount_per_share, total_amount) "
+                              "VALUES (2, 0.5, 15)"))
+        yield SimpleNamespace(engine=engine, metadata=db.metadata)
+        engine.dispose()
+
+    def test_upgrade_merges_duplicates_and_creates_indexes(self, legacy_db):
+        """Test duplicates are merged before the unique index is built."""
+        from sqlalchemy import inspect, text
+        from migrations import upgrade_schema
+
+        report = upgrade_schema(legacy_db)
+
+        assert report['merged_portfolio_items'] == 1
+        assert 'uq_portfolio_item_user_company' in report['created_indexes']
+        with legacy_db.engine.connect() as conn:
+            rows = conn.execute(text("SELECT id, quantity, average_buy_price FROM portfolio_item")).fetchall()
+            dividend_item = conn.execute(text("SELECT portfolio_item_id FROM dividend")).scalar()
+        assert [(r[0], r[1]) for r in rows] == [(1, 40)]
+        assert Decimal(str(rows[0][2])) == Decimal('175.00')
+        assert dividend_item == 1
+        indexes = {i['name'] for i in inspect(legacy_db.engine).get_indexes('transaction')}
+        assert {'ix_transaction_user_created', 'ix_transaction_created_at'} <= indexes
+
+    def test_upgrade_is_idempotent(self, legacy_db):
+        """Test a second run changes nothing."""
+        from migrations import upgrade_schema
+
+        upgrade_schema(legacy_db)
+        assert upgrade_schema(legacy_db) == {'added_columns': [], 'merged_portfolio_items': 0, 'created_indexes': []}
+
+    def test_upgrade_adds_version_columns(self, legacy_db):
+        """Test missing columns are added with their server default."""
+        from sqlalchemy import text
+        from migrations import upgrade_schema
+
+        report = upgrade_schema(legacy_db)
+
+        assert {'user.version', 'portfolio_item.version'} <= set(report['added_columns'])
+        with legacy_db.engine.connect() as conn:
+            assert conn.execute(text("SELECT version FROM user")).scalar() == 1
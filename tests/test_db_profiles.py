@@ -0,0 +1,65 @@
+"""
+Unit Tests for the Database Engine Profiles
+
+Tests for profile selection, engine options and the SQLite connection settings.
+"""
+
+import pytest
+from sqlalchemy import create_engine
+
+import db_profiles
+
+
+class TestProfileSelection:
+    """Test which profile applies to a database URL."""
+
+    @pytest.mark.parametrize('uri, expected', [
+        ('sqlite:///sams_database.db', 'sqlite'),
+        ('postgresql://localhost/sams', 'postgres'),
+        ('postgresql+psycopg2://localhost/sams', 'postgres'),
+        ('mysql://localhost/sams', 'default'),
+    ])
+    def test_auto_follows_backend(self, uri, expected, monkeypatch):
+        """Test 'auto' picks the profile from the URL scheme."""
+        monkeypatch.delenv('DATABASE_PROFILE', raising=False)
+        assert db_profiles.resolve_profile(uri) == expected
+
+    def test_environment_overrides_auto(self, monkeypatch):
+        """Test DATABASE_PROFILE selects a profile explicitly."""
+        monkeypatch.setenv('DATABASE_PROFILE', 'default')
+        assert db_profiles.resolve_profile('sqlite:///x.db') == 'default'
+
+    def test_unknown_profile_is_rejected(self):
+        """Test a typo in the profile fails at startup."""
+        with pytest.raises(ValueError):
+            db_profiles.resolve_profile('sqlite:///x.db', 'fast')
+
+
+class TestEngineOptions:
+    """Test the options passed to create_engine."""
+
+    def test_postgres_pool_and_timeouts(self):
+        """Test the Postgres profile sizes the pool and sets server timeouts."""
+        options = db_profiles.engine_options('postgresql://localhost/sams', 'postgres')
+
+        assert options['pool_pre_ping'] is True
+        assert options['pool_size'] == db_profiles.DB_POOL_SIZE
+        assert 'statement_timeout=' in options['connect_args']['options']
+        assert 'lock_timeout=' in options['connect_args']['options']
+
+    def test_default_profile_adds_nothing(self):
+        """Test the default profile keeps SQLAlchemy's defaults."""
+        assert db_profiles.engine_options('sqlite:///x.db', 'default') == {}
+
+    def test_sqlite_connections_use_wal(self, tmp_path):
+        """Test every SQLite connection gets WAL, the busy timeout and synchronous=NORMAL."""
+        uri = f"sqlite:///{tmp_path / 'profile.db'}"
+        engine = create_engine(uri, **db_profiles.engine_options(uri, 'sqlite'))
+        assert db_profiles.install(engine, 'sqlite') == 'sqlite'
+        db_profiles.install(engine, 'sqlite')
+
+        settings = db_profiles.describe(engine)
+        engine.dispose()
+
+        assert settings == {'journal_mode': 'wal', 'busy_timeout': db_profiles.SQLITE_BUSY_TIMEOUT_MS,
+                            'synchronous': 1}
@@ -125,13 +125,16 @@ class TestPerformance:
     @pytest.mark.slow
     def test_database_query_performance(self, test_db, sample_user, sample_company):
         """Test database query performance."""
-        from main import PortfolioItem, Transaction
+        from main import PortfolioItem, Transaction, Company
         
-        # Create bulk data
+        # Create bulk data (one position per company)
         for i in range(100):
+            company = Company(symbol=f'PERF{i:03d}', name=f'Perf Company {i}')
+            test_db.session.add(company)
+            test_db.session.flush()
             item = PortfolioItem(
                 user_id=sample_user.id,
-                company_id=sample_company.id,
+                company_id=company.id,
                 quantity=10,
                 average_buy_price=150.0
             )
@@ -262,6 +265,29 @@ class TestDeploymentReadiness:
         # App should be WSGI compatible
         assert callable(app)
     
+    def test_gunicorn_profile_preloads(self):
+        """Test the production profile preloads the app and uses threaded workers."""
+        import os
+        import runpy
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        profile = runpy.run_path(os.path.join(root, 'gunicorn.conf.py'))
+
+        assert profile['preload_app'] is True
+        assert profile['worker_class'] == 'gthread'
+        assert profile['workers'] >= 2 and profile['threads'] >= 2
+        assert callable(profile['when_ready']) and callable(profile['post_fork'])
+
+    def test_wsgi_preload_warms_shared_state(self, tmp_path, sample_stock_data):
+        """Test the master-side preload loads price history and the analyzer."""
+        import wsgi
+        sample_stock_data.to_csv(tmp_path / 'MSFT.csv', index=False)
+
+        with patch('news_sentiment.ComprehensiveSentimentAnalyzer') as mock_analyzer:
+            summary = wsgi.preload(str(tmp_path))
+
+        mock_analyzer.assert_called_once()
+        assert summary['price_history'] == ['MSFT']
+
     def test_logging_configuration(self):
         """Test logging is configured."""
         import logging
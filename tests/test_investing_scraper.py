@@ -0,0 +1,116 @@
+"""
+Unit Tests for the Optional Investing.com Scraper Plugin
+
+Tests for lazy loading of selenium and reuse of WebDriver sessions
+through the driver pool. No browser is launched: drivers are mocks.
+"""
+
+import subprocess
+import sys
+import threading
+
+import pytest
+from unittest.mock import patch, MagicMock, PropertyMock
+
+from investing_scraper import DriverPool, InvestingComScraper
+
+
+pytestmark = pytest.mark.unit
+
+
+class TestLazyPlugin:
+    """Test selenium stays off the news_sentiment import path."""
+
+    def test_news_sentiment_import_skips_selenium(self):
+        """Test importing news_sentiment loads neither selenium nor the plugin."""
+        probe = ("import sys, news_sentiment; "
+                 "print([m for m in ('selenium', 'webdriver_manager', 'investing_scraper') if m in sys.modules])")
+        result = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, timeout=120)
+        assert result.returncode == 0, result.stderr[-2000:]
+        assert result.stdout.strip().splitlines()[-1] == '[]'
+
+    def test_backward_compatible_import(self):
+        """Test InvestingComScraper is still importable from news_sentiment."""
+        from news_sentiment import InvestingComScraper as Scraper
+        assert Scraper is InvestingComScraper
+
+
+class TestDriverPool:
+    """Test WebDriver session reuse."""
+
+    def test_driver_reused_across_borrows(self):
+        """Test one browser serves consecutive borrows."""
+        factory = MagicMock(side_effect=lambda: MagicMock())
+        pool = DriverPool(max_size=2, factory=factory)
+        with pool.driver() as first:
+            pass
+        with pool.driver() as second:
+            pass
+        assert first is second
+        assert factory.call_count == 1
+
+    def test_failed_driver_is_discarded(self):
+        """Test a driver that raised is quit rather than returned."""
+        pool = DriverPool(max_size=1, factory=lambda: MagicMock())
+        with pytest.raises(RuntimeError):
+            with pool.driver() as broken:
+                raise RuntimeError('session crashed')
+        broken.quit.assert_called_once()
+        with pool.driver() as replacement:
+            assert replacement is not broken
+
+    def test_dead_idle_driver_is_replaced(self):
+        """Test an idle driver whose session died is relaunched."""
+        pool = DriverPool(max_size=1, factory=lambda: MagicMock())
+        with pool.driver() as driver:
+            type(driver).current_url = PropertyMock(side_effect=Exception('session gone'))
+        with pool.driver() as fresh:
+            assert fresh is not driver
+        assert pool.launched == 2
+
+    def test_pool_is_bounded(self):
+        """Test callers wait when every driver is borrowed."""
+        pool = DriverPool(max_size=1, factory=lambda: MagicMock())
+        borrowed = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            with pool.driver():
+                borrowed.set()
+                release.wait(2)
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        borrowed.wait(2)
+        with pytest.raises(TimeoutError):
+            with pool.driver(timeout=0.05):
+                pass
+        release.set()
+        holder.join(2)
+
+    def test_close_quits_all_drivers(self):
+        """Test close quits every launched driver."""
+        pool = DriverPool(max_size=2, factory=lambda: MagicMock())
+        with pool.driver() as driver:
+            pass
+        pool.close()
+        driver.quit.assert_called_once()
+
+
+class TestScraperUsesPool:
+    """Test get_news_links borrows drivers from the pool."""
+
+    @patch('investing_scraper.rate_limiter.acquire')
+    @patch('investing_scraper.time.sleep')
+    def test_repeated_calls_share_one_browser(self, mock_sleep, mock_acquire):
+        """Test two scrapes launch a single browser."""
+        driver = MagicMock()
+        driver.find_element.side_effect = Exception('no articles')
+        factory = MagicMock(return_value=driver)
+        scraper = InvestingComScraper(pool=DriverPool(max_size=1, factory=factory))
+
+        assert scraper.get_news_links('AAPL', 3, 'Apple Inc') == []
+        assert scraper.get_news_links('MSFT', 3) == []
+        assert factory.call_count == 1
+        driver.quit.assert_not_called()
+        assert driver.get.call_args_list[0].args[0] == 'https://uk.investing.com/equities/apple-inc-news'
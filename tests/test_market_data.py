@@ -0,0 +1,266 @@
+"""
+Unit Tests for the Market-Data Providers
+
+Tests for the replay provider, provider selection, the retry policy and the
+hedged fallback between providers.
+"""
+
+import random
+import time
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import market_data
+
+
+@pytest.fixture
+def replay_dir(tmp_path):
+    """A directory with one stored history in yfinance's column order and lower-case name."""
+    (tmp_path / 'tsla.csv').write_text(
+        'Date,Close,High,Low,Open,Volume\n'
+        '2024-01-02,10.0,11.0,9.0,9.5,100\n'
+        '2024-01-03,12.0,13.0,11.0,10.5,200\n'
+    )
+    return tmp_path
+
+
+@pytest.fixture
+def configured(monkeypatch):
+    """Restore the configured providers after the test."""
+    monkeypatch.setattr(market_data, '_providers', None)
+
+
+class StaticProvider(market_data.MarketDataProvider):
+    """Provider answering from a fixed frame, or failing."""
+
+    def __init__(self, name, frame=None, error=None, delay=0.0):
+        self.name = name
+        self.frame = frame if frame is not None else pd.DataFrame(columns=market_data.OHLCV_COLUMNS)
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+
+    def history(self, symbol, start, end, report=None):
+        self.calls += 1
+        started = time.monotonic()
+        time.sleep(self.delay)
+        if report is not None:
+            report.record(self.name, symbol, 1, time.monotonic() - started, 'error' if self.error else 'ok')
+        if self.error:
+            raise self.error
+        return self.frame
+
+
+def one_row():
+    return market_data.ohlcv(pd.DataFrame({'Date': ['2024-01-02'], 'Open': [1.0], 'High': [1.0],
+                                           'Low': [1.0], 'Close': [1.0], 'Volume': [5]}))
+
+
+class TestReplayProvider:
+    """Test serving the stored CSVs."""
+
+    def test_history_is_normalised(self, replay_dir):
+        """Test any-case file names are found and columns come back in OHLCV order."""
+        provider = market_data.ReplayProvider(str(replay_dir))
+        frame = provider.history('TSLA', datetime(2030, 1, 1), datetime(2030, 2, 1))
+
+        assert list(frame.columns) == market_data.OHLCV_COLUMNS
+        assert frame['Close'].tolist() == [10.0, 12.0]
+        assert frame['Adj Close'].tolist() == [10.0, 12.0]
+
+    def test_latest_closes_ignore_the_calendar(self, replay_dir):
+        """Test the last two stored rows are the quote, and unknown symbols are left out."""
+        provider = market_data.ReplayProvider(str(replay_dir))
+        assert provider.latest_closes(['TSLA', 'NOPE']) == {'TSLA': (12.0, 10.0)}
+
+    def test_latency_is_applied(self, replay_dir):
+        """Test every call waits for the configured latency."""
+        provider = market_data.ReplayProvider(str(replay_dir), latency=0.05)
+        started = time.perf_counter()
+        provider.latest_closes(['TSLA'])
+        assert time.perf_counter() - started >= 0.05
+
+
+class TestYFinanceQuotes:
+    """Test the yfinance quote path under rate limiting."""
+
+    def test_rate_limit_timeout_means_no_quotes(self, monkeypatch):
+        """Test quotes give up after the short quote timeout instead of raising."""
+        timeouts = []
+
+        def acquire(host, timeout=None):
+            timeouts.append(timeout)
+            raise market_data.rate_limiter.RateLimitTimeout(host)
+
+        monkeypatch.setattr(market_data.rate_limiter, 'acquire', acquire)
+        assert market_data.YFinanceProvider().latest_closes(['AAPL', 'MSFT']) == {}
+        assert timeouts == [market_data.QUOTE_ACQUIRE_TIMEOUT]
+        assert market_data.QUOTE_ACQUIRE_TIMEOUT < market_data.rate_limiter.DEFAULT_ACQUIRE_TIMEOUT
+
+
+class TestProviderSelection:
+    """Test building and falling back between providers."""
+
+    def test_alphavantage_needs_a_key(self, monkeypatch):
+        """Test Alpha Vantage is skipped without ALPHA_VANTAGE_API_KEY."""
+        monkeypatch.delenv('ALPHA_VANTAGE_API_KEY', raising=False)
+        assert [p.name for p in market_data.build_providers('yfinance,alphavantage')] == ['yfinance']
+
+        monkeypatch.setenv('ALPHA_VANTAGE_API_KEY', 'test-key')
+        providers = market_data.build_providers('yfinance,alphavantage')
+        assert [p.name for p in providers] == ['yfinance', 'alphavantage']
+        assert providers[1].api_key == 'test-key'
+
+    def test_unknown_provider_is_rejected(self):
+        """Test a typo in MARKET_DATA_PROVIDER fails loudly."""
+        with pytest.raises(ValueError):
+            market_data.build_providers('yahoo')
+
+    def test_history_falls_back_to_next_provider(self, configured):
+        """Test a failing or empty provider hands over to the next one."""
+        failing = StaticProvider('failing', error=RuntimeError('down'))
+        empty = StaticProvider('empty')
+        working = StaticProvider('working', one_row())
+        market_data.configure([failing, empty, working])
+
+        served, report = market_data.history('AAPL', datetime(2024, 1, 1), datetime(2024, 2, 1))
+
+        assert report.provider == 'working'
+        assert served['Close'].tolist() == [1.0]
+        assert (failing.calls, empty.calls) == (1, 1)
+
+    def test_history_raises_when_no_provider_has_data(self, configured):
+        """Test MarketDataError when every provider comes back empty."""
+        market_data.configure([StaticProvider('empty')])
+        with pytest.raises(market_data.MarketDataError):
+            market_data.history('AAPL', datetime(2024, 1, 1), datetime(2024, 2, 1))
+
+    def test_quotes_come_from_configured_provider(self, configured, replay_dir):
+        """Test the trade routes' price lookup goes through the provider layer."""
+        from main import get_latest_close_price
+        market_data.configure([market_data.ReplayProvider(str(replay_dir))])
+        assert get_latest_close_price('TSLA') == (12.0, 10.0)
+        assert get_latest_close_price('NOPE') is None
+
+
+class TestAlphaVantageProvider:
+    """Test the Alpha Vantage column mapping and NSE fallback."""
+
+    def test_daily_series_is_mapped_with_nse_fallback(self, monkeypatch):
+        """Test the NSE: symbol is tried after a failed lookup and columns are renamed."""
+        from alpha_vantage.timeseries import TimeSeries
+        monkeypatch.setattr(market_data.rate_limiter, 'acquire', lambda host, timeout=None: 0.0)
+        data = pd.DataFrame({'1. open': [2.0, 1.0], '2. high': [2.0, 1.0], '3. low': [2.0, 1.0],
+                             '4. close': [2.0, 1.0], '5. volume': [20, 10]},
+                            index=pd.DatetimeIndex(['2024-01-03', '2024-01-02'], name='date'))
+        symbols = []
+
+        def fake_get_daily(self, symbol, outputsize):
+            symbols.append(symbol)
+            if not symbol.startswith('NSE:'):
+                raise ValueError('Invalid API call')
+            return data, {}
+
+        monkeypatch.setattr(TimeSeries, 'get_daily', fake_get_daily)
+        frame = market_data.AlphaVantageProvider('test-key').history(
+            'TCS', datetime(2024, 1, 1), datetime(2024, 2, 1))
+
+        assert symbols == ['TCS', 'NSE:TCS']
+        assert frame['Close'].tolist() == [1.0, 2.0]
+        assert frame['Adj Close'].tolist() == [1.0, 2.0]
+
+
+class TestRetryPolicy:
+    """Test backoff, jitter and the deadline of a single provider's attempts."""
+
+    def test_backoff_grows_with_jitter_up_to_the_cap(self):
+        """Test each pause is random and bounded by base * 2**(n-1), capped at max_delay."""
+        policy = market_data.RetryPolicy(attempts=6, base_delay=0.5, max_delay=2.0, rng=random.Random(7))
+        for retry, bound in [(1, 0.5), (2, 1.0), (3, 2.0), (5, 2.0)]:
+            pauses = {policy.delay(retry) for _ in range(20)}
+            assert all(0 <= p <= bound for p in pauses)
+            assert len(pauses) > 1
+
+    def test_retries_until_data_and_times_each_attempt(self, monkeypatch):
+        """Test errors and empty frames are retried and every attempt is recorded."""
+        monkeypatch.setattr(market_data.time, 'sleep', lambda seconds: None)
+        outcomes = [RuntimeError('reset'), pd.DataFrame(), one_row()]
+
+        def fetch(timeout):
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        report = market_data.FetchReport('AAPL', deadline=5)
+        frame = market_data.RetryPolicy(attempts=3).call(fetch, report, 'yfinance', 'AAPL')
+
+        assert not frame.empty
+        assert [(a.number, a.outcome) for a in report.attempts] == [
+            (1, 'error: reset'), (2, 'empty'), (3, 'ok')]
+
+    def test_rate_limit_timeout_is_not_retried(self):
+        """Test a full rate-limit queue gives up at once."""
+        calls = []
+
+        def fetch(timeout):
+            calls.append(timeout)
+            raise market_data.rate_limiter.RateLimitTimeout('queue full')
+
+        report = market_data.FetchReport('AAPL', deadline=5)
+        with pytest.raises(market_data.rate_limiter.RateLimitTimeout):
+            market_data.RetryPolicy(attempts=3).call(fetch, report, 'yfinance', 'AAPL')
+        assert len(calls) == 1
+
+    def test_no_retry_sleeps_past_the_deadline(self):
+        """Test a backoff longer than the time left ends the attempts."""
+        report = market_data.FetchReport('AAPL', deadline=0.2)
+        policy = market_data.RetryPolicy(attempts=5, base_delay=10, max_delay=10, rng=random.Random(1))
+        started = time.monotonic()
+        frame = policy.call(lambda timeout: pd.DataFrame(), report, 'yfinance', 'AAPL')
+
+        assert frame.empty
+        assert time.monotonic() - started < 0.2
+        assert len(report.attempts) == 1
+
+
+class TestHedgedHistory:
+    """Test the hedged fallback and the total deadline."""
+
+    def test_fallback_starts_after_the_hedge_threshold(self, configured):
+        """Test a slow first provider is overtaken by the fallback started after hedge_after."""
+        slow = StaticProvider('slow', one_row(), delay=1.0)
+        fast = StaticProvider('fast', one_row())
+        market_data.configure([slow, fast])
+
+        started = time.monotonic()
+        _, report = market_data.history('AAPL', datetime(2024, 1, 1), datetime(2024, 2, 1), hedge_after=0.05)
+
+        assert report.provider == 'fast'
+        assert time.monotonic() - started < 0.5
+        assert [a.provider for a in report.attempts] == ['fast']
+        assert market_data.metrics()['providers']['fast']['served'] >= 1
+
+    def test_fallback_not_started_when_first_answers_in_time(self, configured):
+        """Test the fallback stays idle when the first provider beats the threshold."""
+        first = StaticProvider('first', one_row())
+        fallback = StaticProvider('fallback', one_row())
+        market_data.configure([first, fallback])
+
+        _, report = market_data.history('AAPL', datetime(2024, 1, 1), datetime(2024, 2, 1), hedge_after=1.0)
+
+        assert report.provider == 'first'
+        assert fallback.calls == 0
+
+    def test_deadline_bounds_the_request(self, configured):
+        """Test DeadlineExceeded once the total budget is spent, with the report attached."""
+        market_data.configure([StaticProvider('slow', one_row(), delay=1.0)])
+
+        started = time.monotonic()
+        with pytest.raises(market_data.DeadlineExceeded) as error:
+            market_data.history('AAPL', datetime(2024, 1, 1), datetime(2024, 2, 1), deadline=0.1)
+
+        assert time.monotonic() - started < 0.5
+        assert error.value.report.provider is None
@@ -0,0 +1,82 @@
+"""
+Unit Tests for Offline NLTK Resource Provisioning
+
+Tests for the local data directory, the provisioning command and the
+fail-fast error raised when a resource is missing.
+"""
+
+import os
+import zipfile
+
+import pytest
+from unittest.mock import patch
+
+import nltk
+import nltk_resources
+from nltk_resources import NLTKResourceError, check_resources, missing_resources, provision
+
+
+pytestmark = pytest.mark.unit
+
+
+def fake_download(name, download_dir, **kwargs):
+    """Stand-in for nltk.download that drops the expected file in place."""
+    path = os.path.join(download_dir, nltk_resources.REQUIRED_NLTK_DATA[name])
+    if path.endswith('.zip'):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr(name + '/README', name)
+    else:
+        # NLTK looks inside a PY3 subdirectory for some resources (e.g. punkt)
+        os.makedirs(os.path.join(path, 'PY3'), exist_ok=True)
+    return True
+
+
+class TestResourceCheck:
+    """Test detection of missing resources."""
+
+    def test_empty_dir_reports_everything_missing(self, tmp_path):
+        """Test an empty directory is missing every required resource."""
+        assert missing_resources(data_dir=str(tmp_path)) == list(nltk_resources.REQUIRED_NLTK_DATA)
+
+    def test_check_raises_clear_error(self, tmp_path):
+        """Test the error names the resource and the provisioning command."""
+        with pytest.raises(NLTKResourceError) as excinfo:
+            check_resources(['vader_lexicon'], data_dir=str(tmp_path))
+        assert excinfo.value.missing == ['vader_lexicon']
+        assert 'python nltk_resources.py' in str(excinfo.value)
+        assert isinstance(excinfo.value, LookupError)
+
+    def test_use_local_data_restricts_search_path(self, tmp_path):
+        """Test NLTK only searches the provisioned directory."""
+        original = list(nltk.data.path)
+        try:
+            nltk_resources.use_local_data(str(tmp_path))
+            assert nltk.data.path == [str(tmp_path)]
+        finally:
+            nltk.data.path[:] = original
+
+
+class TestProvisioning:
+    """Test the provisioning command."""
+
+    @patch('nltk.download', side_effect=fake_download)
+    def test_provision_downloads_only_missing(self, mock_download, tmp_path):
+        """Test provisioning fetches missing resources once."""
+        assert provision(str(tmp_path)) == list(nltk_resources.REQUIRED_NLTK_DATA)
+        assert provision(str(tmp_path)) == []
+        assert mock_download.call_count == len(nltk_resources.REQUIRED_NLTK_DATA)
+        check_resources(data_dir=str(tmp_path))
+
+    def test_check_mode_exit_code(self, tmp_path):
+        """Test --check fails on an unprovisioned directory without downloading."""
+        with patch('nltk.download') as mock_download:
+            assert nltk_resources.main(['--dir', str(tmp_path), '--check']) == 1
+            mock_download.assert_not_called()
+
+    def test_analyzer_fails_fast_without_lexicon(self):
+        """Test the analyzer raises NLTKResourceError when VADER is not provisioned."""
+        with patch('news_sentiment.SentimentIntensityAnalyzer', side_effect=LookupError('vader')):
+            from news_sentiment import ComprehensiveSentimentAnalyzer
+            with pytest.raises(NLTKResourceError):
+                ComprehensiveSentimentAnalyzer()
@@ -171,9 +171,13 @@ class TestPortfolioCalculations:
         for i in range(3):
             quantity = 10 * (i + 1)
             price = Decimal('100.00') + (i * 10)
+            # One position per company
+            company = sample_company if i == 0 else Company(symbol=f'INV{i}', name=f'Invested {i}')
+            test_db.session.add(company)
+            test_db.session.flush()
             portfolio_item = PortfolioItem(
                 user_id=sample_user.id,
-                company_id=sample_company.id,
+                company_id=company.id,
                 quantity=quantity,
                 average_buy_price=price
             )
@@ -263,6 +267,63 @@ class TestDashboardView:
         # Should show transaction type
         assert b'BUY' in response.data or b'SELL' in response.data
     
+    def test_dashboard_queries_do_not_grow_with_holdings(self, authenticated_client, test_db, sample_user,
+                                                         monkeypatch, count_queries, assert_max_queries):
+        """Test that dashboard loads companies eagerly instead of once per row."""
+        import main
+        quote_calls = []
+        
+        def fake_prices(symbols):
+            quote_calls.append(list(symbols))
+            return {symbol: (12.0, 11.0) for symbol in quote_calls[-1]}
+        
+        monkeypatch.setattr(main, 'get_latest_close_prices', fake_prices)
+        
+        def add_holdings(start, count):
+            for i in range(start, start + count):
+                company = Company(symbol=f'NPO{i}', name=f'Company {i}')
+                test_db.session.add(company)
+                test_db.session.flush()
+                test_db.session.add(PortfolioItem(user_id=sample_user.id, company_id=company.id,
+                                                  quantity=5, average_buy_price=Decimal('10.00')))
+                test_db.session.add(Transaction(user_id=sample_user.id, company_id=company.id, txn_type='BUY',
+                                                quantity=5, price=Decimal('10.00'), total_amount=Decimal('50.00')))
+            test_db.session.commit()
+        
+        add_holdings(0, 1)
+        with count_queries() as baseline:
+            assert authenticated_client.get('/dashboard').status_code == 200
+        
+        add_holdings(1, 10)
+        with assert_max_queries(len(baseline)):
+            response = authenticated_client.get('/dashboard')
+        assert response.status_code == 200
+        assert b'NPO10' in response.data
+        # One batched quote call per render, whatever the number of holdings
+        assert len(quote_calls) == 2 and len(quote_calls[-1]) == 11
+    
+    def test_dashboard_values_positions_from_ledger(self, authenticated_client, test_db, sample_user, monkeypatch):
+        """Test quantity and cost basis are read from the position ledger."""
+        import main
+        from main import PositionLedger
+        monkeypatch.setattr(main, 'get_latest_close_prices', lambda symbols: {'LDG': (30.0, 29.0)})
+        company = Company(symbol='LDG', name='Ledger Co')
+        test_db.session.add(company)
+        test_db.session.flush()
+        # The PortfolioItem is stale; the ledger holds 4 shares at an average cost of 25
+        test_db.session.add(PortfolioItem(user_id=sample_user.id, company_id=company.id,
+                                          quantity=1, average_buy_price=Decimal('99.00')))
+        test_db.session.add(PositionLedger(user_id=sample_user.id, company_id=company.id, quantity=4,
+                                           cost_basis=Decimal('100.00'), realized_pnl=0, dividends=0,
+                                           commissions=0))
+        test_db.session.commit()
+        
+        response = authenticated_client.get('/dashboard')
+        
+        assert response.status_code == 200
+        assert b'+5.00 (+20.00%)' in response.data
+        assert b'120.00' in response.data
+    
     def test_dashboard_empty_portfolio(self, authenticated_client, sample_user):
         """Test dashboard with empty portfolio."""
         response = authenticated_client.get('/dashboard')
@@ -196,3 +196,39 @@ class TestDataPreprocessing:
         
         assert len(df_cleaned) < len(df_with_na)
         assert df_cleaned['Close'].isna().sum() == 0
+
+
+class TestPriceHistoryCache:
+    """Test the in-memory cache of stored price history."""
+
+    def test_cache_serves_private_copies(self, tmp_path, monkeypatch, sample_stock_data):
+        """Test repeated loads reuse the parsed frame but hand out copies."""
+        import main
+        monkeypatch.chdir(tmp_path)
+        sample_stock_data.to_csv('TEST.csv', index=False)
+
+        with patch('main.pd.read_csv', wraps=pd.read_csv) as mock_read:
+            first = main.load_price_history('TEST')
+            first.loc[0, 'Close'] = -1
+            second = main.load_price_history('TEST')
+
+        assert mock_read.call_count == 1
+        assert second.loc[0, 'Close'] != -1
+
+    def test_cache_rereads_changed_file(self, tmp_path, monkeypatch, sample_stock_data):
+        """Test a rewritten CSV is picked up."""
+        import main
+        monkeypatch.chdir(tmp_path)
+        sample_stock_data.to_csv('TEST.csv', index=False)
+        main.load_price_history('TEST')
+        sample_stock_data.head(10).to_csv('TEST.csv', index=False)
+
+        assert len(main.load_price_history('TEST')) == 10
+
+    def test_preload_skips_non_price_csvs(self, tmp_path, sample_stock_data):
+        """Test preloading only keeps files with Date and Close columns."""
+        import main
+        sample_stock_data.to_csv(tmp_path / 'AAPL.csv', index=False)
+        pd.DataFrame({'Ticker': ['AAPL'], 'Name': ['Apple']}).to_csv(tmp_path / 'symbols.csv', index=False)
+
+        assert main.preload_price_history(str(tmp_path)) == ['AAPL']
@@ -0,0 +1,158 @@
+"""
+Unit Tests for the Price-History Prewarm Scheduler
+
+Tests for the exchange calendars, the freshness rule, bounded refresh runs
+and the symbols the scheduler picks up.
+"""
+
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+from dateutil import tz
+
+import price_scheduler
+import rate_limiter
+
+UTC = tz.UTC
+
+
+class TestCalendars:
+    """Test mapping symbols to calendars and computing closes."""
+
+    @pytest.mark.parametrize('symbol, exchange, expected', [
+        ('AAPL', 'NASDAQ', 'US'),
+        ('TCS', 'nse', 'IN'),
+        ('RELIANCE.NS', None, 'IN'),
+        ('VOD.L', None, 'UK'),
+        ('AAPL', None, 'US'),
+        ('XYZ', 'Unknown Exchange', 'US'),
+    ])
+    def test_calendar_for(self, symbol, exchange, expected):
+        """Test the exchange wins, then the yfinance suffix, then the default."""
+        assert price_scheduler.calendar_for(symbol, exchange) == expected
+
+    def test_last_close_skips_open_session_and_weekend(self):
+        """Test Monday before the close maps back to Friday's close."""
+        monday_morning = datetime(2024, 1, 8, 15, 0, tzinfo=UTC)  # 10:00 New York
+        close = price_scheduler.last_close('US', monday_morning)
+        assert close.date() == date(2024, 1, 5)
+        assert (close.hour, close.minute) == (16, 0)
+
+    def test_next_run_follows_the_close(self):
+        """Test the run is scheduled the delay after the next weekday close."""
+        friday_evening = datetime(2024, 1, 5, 23, 0, tzinfo=UTC)  # 18:00 New York, after the run
+        run = price_scheduler.next_run('US', friday_evening, timedelta(minutes=30))
+        assert run.date() == date(2024, 1, 8)
+        assert (run.hour, run.minute) == (16, 30)
+
+        before_close = datetime(2024, 1, 5, 9, 0, tzinfo=UTC)  # 14:30 Kolkata
+        run = price_scheduler.next_run('IN', before_close, timedelta(minutes=30))
+        assert run.date() == date(2024, 1, 5)
+        assert (run.hour, run.minute) == (16, 0)
+
+    def test_history_fresh_until_next_close(self):
+        """Test history ending at the last session stays fresh until the next close passes."""
+        tuesday_noon = datetime(2024, 1, 9, 17, 0, tzinfo=UTC)
+        old_write = datetime(2024, 1, 8, 12, 0, tzinfo=UTC).timestamp()
+        assert price_scheduler.is_fresh(date(2024, 1, 8), old_write, 'US', tuesday_noon)
+        assert not price_scheduler.is_fresh(date(2024, 1, 5), old_write, 'US', tuesday_noon)
+
+    def test_fetch_after_close_counts_as_fresh(self):
+        """Test a file fetched after the close is fresh even without that day's bar (holidays)."""
+        tuesday_evening = datetime(2024, 1, 9, 23, 0, tzinfo=UTC)
+        fetched = datetime(2024, 1, 9, 21, 30, tzinfo=UTC).timestamp()
+        assert price_scheduler.is_fresh(date(2024, 1, 8), fetched, 'US', tuesday_evening)
+
+    def test_fetch_before_the_bar_is_published_is_stale(self):
+        """Test a fetch between the close and close + delay may lack the bar and is not fresh."""
+        tuesday_evening = datetime(2024, 1, 9, 23, 0, tzinfo=UTC)
+        fetched = datetime(2024, 1, 9, 21, 10, tzinfo=UTC).timestamp()  # 16:10 New York
+        assert not price_scheduler.is_fresh(date(2024, 1, 8), fetched, 'US', tuesday_evening,
+                                            timedelta(minutes=30))
+        assert not price_scheduler.is_fresh(date(2024, 1, 8), None, 'US', tuesday_evening)
+
+
+class TestFetchRecords:
+    """Test the recorded download time of stored history."""
+
+    def test_recorded_fetch_round_trip(self, tmp_path):
+        """Test the time stored after a download is read back for the same file."""
+        path = tmp_path / 'AAPL.csv'
+        path.write_text('Date,Close\n2024-01-08,1.0\n')
+        price_scheduler.record_fetch(str(path), 1704750000.0)
+        assert price_scheduler.recorded_fetch(str(path)) == 1704750000.0
+
+    def test_copied_or_changed_file_has_no_fetch_time(self, tmp_path):
+        """Test a file without a record, or rewritten after it, does not count as fetched."""
+        path = tmp_path / 'AAPL.csv'
+        path.write_text('Date,Close\n2024-01-08,1.0\n')
+        assert price_scheduler.recorded_fetch(str(path)) is None
+
+        price_scheduler.record_fetch(str(path), 1704750000.0)
+        path.write_text('Date,Close\n2024-01-08,1.0\n2024-01-09,2.0\n')
+        assert price_scheduler.recorded_fetch(str(path)) is None
+
+
+class TestPrewarmRuns:
+    """Test a refresh run."""
+
+    def test_run_is_bounded_and_batch_priority(self, tmp_path):
+        """Test symbols on the calendar are refreshed with at most `concurrency` at once."""
+        active = []
+        peak = []
+        priorities = []
+        lock = threading.Lock()
+
+        def refresh(symbol):
+            with lock:
+                active.append(symbol)
+                peak.append(len(active))
+                priorities.append(rate_limiter._current_priority.get())
+            time.sleep(0.02)
+            with lock:
+                active.remove(symbol)
+            if symbol == 'BAD':
+                raise RuntimeError('no data')
+
+        symbols = [(f'S{i}', 'NASDAQ') for i in range(8)] + [('BAD', None), ('TCS', 'NSE')]
+        scheduler = price_scheduler.PrewarmScheduler(lambda: symbols, refresh, concurrency=3,
+                                                     lock_path=str(tmp_path / 'prewarm.lock'))
+        summary = scheduler.run_once(['US'])
+
+        assert summary['symbols'] == 9
+        assert summary['failed'] == {'BAD': 'no data'}
+        assert max(peak) <= 3
+        assert set(priorities) == {rate_limiter.BATCH}
+
+    def test_only_one_scheduler_owns_the_lock(self, tmp_path):
+        """Test a second scheduler (another gunicorn worker) stays idle."""
+        path = str(tmp_path / 'prewarm.lock')
+        first = price_scheduler.PrewarmScheduler(list, lambda s: None, lock_path=path)
+        second = price_scheduler.PrewarmScheduler(list, lambda s: None, lock_path=path)
+        try:
+            assert first._owns_lock()
+            assert not second._owns_lock()
+            first.stop()
+            assert second._owns_lock()
+        finally:
+            first.stop()
+            second.stop()
+
+
+class TestPrewarmSymbols:
+    """Test the symbols main hands to the scheduler."""
+
+    def test_companies_and_recent_predictions(self, test_db, sample_company):
+        """Test active companies and recently predicted symbols are prewarmed, stale ones are not."""
+        from main import PredictedSymbol, prewarm_symbols, record_prediction
+
+        record_prediction('tcs')
+        record_prediction('TCS')
+        test_db.session.add(PredictedSymbol(symbol='OLD', prediction_count=1,
+                                            last_predicted_at=datetime.utcnow() - timedelta(days=30)))
+        test_db.session.commit()
+
+        assert test_db.session.get(PredictedSymbol, 'TCS').prediction_count == 2
+        assert set(prewarm_symbols()) == {('AAPL', 'NASDAQ'), ('TCS', None)}
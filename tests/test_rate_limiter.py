@@ -0,0 +1,109 @@
+"""
+Unit Tests for the Shared Outbound Rate Limiter
+
+Tests for per-host token buckets, priority classes and queue-wait metrics.
+"""
+
+import threading
+import time
+
+import pytest
+from unittest.mock import patch, MagicMock
+
+import rate_limiter
+from rate_limiter import RateLimiter, RateLimitTimeout, INTERACTIVE, BATCH
+
+
+class TestTokenBucket:
+    """Test per-host token bucket pacing."""
+
+    def test_burst_is_immediate(self):
+        """Test calls within the burst do not queue."""
+        limiter = RateLimiter(limits={'example.com': (1.0, 3)})
+        waits = [limiter.acquire('example.com') for _ in range(3)]
+        assert max(waits) < 0.05
+
+    def test_refill_paces_calls(self):
+        """Test calls beyond the burst wait for the refill rate."""
+        limiter = RateLimiter(limits={'example.com': (20.0, 1)})
+        limiter.acquire('example.com')
+        waited = limiter.acquire('example.com')
+        assert 0.03 <= waited < 0.5
+
+    def test_subdomains_share_parent_bucket(self):
+        """Test api.example.com and www.example.com draw from example.com."""
+        limiter = RateLimiter(limits={'example.com': (0.01, 1)})
+        limiter.acquire('https://api.example.com/v1/news')
+        with pytest.raises(RateLimitTimeout):
+            limiter.acquire('https://www.example.com/', timeout=0.05)
+
+    def test_unknown_hosts_use_default(self):
+        """Test unlisted hosts get their own default bucket."""
+        limiter = RateLimiter(limits={}, default=(0.01, 1))
+        limiter.acquire('a.test')
+        assert limiter.acquire('b.test', timeout=0.05) < 0.05
+
+    def test_penalize_blocks_host(self):
+        """Test a 429 pause stops tokens until it expires."""
+        limiter = RateLimiter(limits={'example.com': (100.0, 5)})
+        limiter.penalize('example.com', 0.1)
+        waited = limiter.acquire('example.com')
+        assert waited >= 0.08
+        assert limiter.metrics()['example.com']['throttled'] == 1
+
+
+class TestPriorityClasses:
+    """Test interactive callers are served before batch callers."""
+
+    def test_interactive_overtakes_batch(self):
+        """Test a later interactive waiter is served before queued batch waiters."""
+        limiter = RateLimiter(limits={'example.com': (20.0, 1)})
+        limiter.acquire('example.com')
+        order = []
+
+        def worker(name, level):
+            limiter.acquire('example.com', level=level)
+            order.append(name)
+
+        batch = [threading.Thread(target=worker, args=(f'batch{i}', BATCH)) for i in range(3)]
+        for t in batch:
+            t.start()
+        time.sleep(0.01)
+        interactive = threading.Thread(target=worker, args=('interactive', INTERACTIVE))
+        interactive.start()
+        for t in batch + [interactive]:
+            t.join(2)
+        assert order[0] == 'interactive'
+        assert sorted(order[1:]) == ['batch0', 'batch1', 'batch2']
+
+    def test_priority_context(self):
+        """Test the priority context manager sets the class used by acquire."""
+        limiter = RateLimiter(limits={'example.com': (100.0, 5)})
+        with rate_limiter.priority(BATCH):
+            limiter.acquire('example.com')
+        limiter.acquire('example.com')
+        waits = limiter.metrics()['example.com']['wait_seconds']
+        assert waits['batch']['count'] == 1
+        assert waits['interactive']['count'] == 1
+
+
+class TestQueueMetrics:
+    """Test queue-wait metrics and the requests wrapper."""
+
+    def test_timeout_leaves_queue_empty(self):
+        """Test a timed-out waiter is removed from the queue."""
+        limiter = RateLimiter(limits={'example.com': (0.01, 1)})
+        limiter.acquire('example.com')
+        with pytest.raises(RateLimitTimeout):
+            limiter.acquire('example.com', timeout=0.05)
+        assert limiter.metrics()['example.com']['queue_depth'] == 0
+
+    @patch('requests.get')
+    def test_limited_get_pauses_host_on_429(self, mock_get):
+        """Test a 429 with Retry-After penalizes the host in the shared limiter."""
+        response = MagicMock(status_code=429, headers={'Retry-After': '0.05'})
+        mock_get.return_value = response
+        with patch.object(rate_limiter, 'limiter', RateLimiter()):
+            assert rate_limiter.limited_get('https://finnhub.io/api/v1/news', timeout=5) is response
+            assert rate_limiter.metrics()['finnhub.io']['throttled'] == 1
+        mock_get.assert_called_once_with('https://finnhub.io/api/v1/news', timeout=5)
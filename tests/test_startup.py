@@ -0,0 +1,80 @@
+"""
+Startup-Time Benchmark
+
+Guards the import budget of main.py: importing the app must be fast, must
+not pull in model/scraper libraries and must not touch the network.
+Each check runs in a fresh interpreter so earlier imports do not hide costs.
+
+The budget defaults to STARTUP_BUDGET_SECONDS (3.0s, generous for shared CI
+runners) and can be tightened through the environment variable of the same name.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+pytestmark = pytest.mark.integration
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_BUDGET_SECONDS = float(os.environ.get('STARTUP_BUDGET_SECONDS', '3.0'))
+HEAVY_MODULES = [
+    'statsmodels', 'sklearn', 'matplotlib', 'yfinance', 'alpha_vantage', 'textblob',
+    'nltk', 'news_sentiment', 'selenium', 'webdriver_manager', 'newspaper', 'keras',
+    'tensorflow',
+]
+
+# Runs in a child interpreter: blocks sockets, imports main, reports timing
+PROBE = """
+import json, socket, sys, time
+attempts = []
+def refuse(self, address, *args, **kwargs):
+    attempts.append(str(address))
+    raise OSError('network access during import')
+socket.socket.connect = refuse
+socket.socket.connect_ex = refuse
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    'seconds': elapsed,
+    'loaded': [m for m in %r if m in sys.modules],
+    'connects': attempts,
+}))
+"""
+
+
+def probe_import():
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE % (HEAVY_MODULES,)],
+        cwd=REPO_ROOT, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.fixture(scope='module')
+def report():
+    # Warm the bytecode cache so the timed run measures imports, not compilation
+    probe_import()
+    return probe_import()
+
+
+class TestStartup:
+    """Test importing main.py stays cheap."""
+
+    def test_import_within_budget(self, report):
+        """Test main.py imports within the startup budget."""
+        print(f"main.py import: {report['seconds']:.2f}s (budget {STARTUP_BUDGET_SECONDS:.1f}s)")
+        assert report['seconds'] < STARTUP_BUDGET_SECONDS
+
+    def test_heavy_dependencies_are_lazy(self, report):
+        """Test model and scraper libraries are not imported with the app."""
+        assert report['loaded'] == []
+
+    def test_no_network_at_import(self, report):
+        """Test importing main.py opens no connections."""
+        assert report['connects'] == []
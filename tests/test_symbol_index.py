@@ -0,0 +1,84 @@
+"""
+Unit Tests for the Symbol Index
+
+Tests for loading the ticker universe, symbol resolution including the NSE
+mapping, and prefix search.
+"""
+
+import pytest
+
+import symbol_index
+
+
+@pytest.fixture
+def index(tmp_path):
+    """An index read from a small Yahoo-style ticker file."""
+    path = tmp_path / 'tickers.csv'
+    path.write_text(
+        'Ticker,Name,Exchange,Category Name,Country\n'
+        'AAPL,Apple Inc.,NMS,Electronic Equipment,USA\n'
+        'AAP,Advance Auto Parts Inc.,NYQ,Auto Parts Stores,USA\n'
+        'AAPL,Duplicate Row,NMS,,USA\n'
+        'TCS.NS,Tata Consultancy Services Limited,NSI,Information Technology Services,India\n'
+        'TCS.BO,Tata Consultancy Services Limited,BSE,Information Technology Services,India\n'
+        'RELIANCE.BO,Reliance Industries Limited,BSE,Oil & Gas Refining,India\n'
+        'MSFT,Microsoft Corporation,NMS,Software,USA\n',
+        encoding='utf-8',
+    )
+    return symbol_index.SymbolIndex.from_csv(str(path))
+
+
+class TestLookup:
+    """Test exact lookups and resolution."""
+
+    def test_first_row_wins(self, index):
+        """Test duplicate tickers keep the first row, any case."""
+        assert len(index) == 6
+        assert index.get('aapl').name == 'Apple Inc.'
+
+    @pytest.mark.parametrize('symbol, expected', [
+        ('TCS', 'TCS.NS'),
+        ('NSE:TCS', 'TCS.NS'),
+        ('BSE:TCS', 'TCS.BO'),
+        ('reliance', 'RELIANCE.BO'),
+        ('MSFT', 'MSFT'),
+    ])
+    def test_resolve_suffixes_and_prefixes(self, index, symbol, expected):
+        """Test bare, NSE: and BSE: forms find the suffixed listing."""
+        assert index.resolve(symbol).symbol == expected
+
+    def test_name_falls_back_to_symbol(self, index):
+        """Test unknown symbols keep their symbol as the company name."""
+        assert index.name_for('TCS') == 'Tata Consultancy Services Limited'
+        assert index.name_for('NOPE') == 'NOPE'
+
+    def test_alpha_vantage_forms(self, index):
+        """Test known Indian listings try the exchange form first; others keep the old order."""
+        assert index.alpha_vantage_symbols('TCS') == ['NSE:TCS', 'TCS']
+        assert index.alpha_vantage_symbols('RELIANCE') == ['BSE:RELIANCE', 'RELIANCE', 'NSE:RELIANCE']
+        assert index.alpha_vantage_symbols('AAPL') == ['AAPL', 'NSE:AAPL']
+
+    def test_missing_file_gives_empty_index(self, tmp_path):
+        """Test a deployment without the ticker file still resolves names to symbols."""
+        index = symbol_index.SymbolIndex.from_csv(str(tmp_path / 'missing.csv'))
+        assert len(index) == 0
+        assert index.name_for('AAPL') == 'AAPL'
+        assert index.search('A') == []
+
+
+class TestPrefixSearch:
+    """Test autocomplete search."""
+
+    def test_exact_symbol_first_then_prefixes(self, index):
+        """Test the exact symbol leads, followed by symbol prefixes in order."""
+        assert [l.symbol for l in index.search('aap')] == ['AAP', 'AAPL']
+
+    def test_name_prefix_matches(self, index):
+        """Test company names match after symbols, without duplicates."""
+        assert [l.symbol for l in index.search('tata')] == ['TCS.BO', 'TCS.NS']
+        assert [l.symbol for l in index.search('m')] == ['MSFT']
+
+    def test_limit(self, index):
+        """Test results stop at the limit."""
+        assert len(index.search('a', limit=1)) == 1
+        assert index.search('a', limit=0) == []
@@ -0,0 +1,139 @@
+"""
+Concurrency Tests for Trade Execution
+
+Parallel buys, sells, top-ups and dividends from many threads against the
+local database; balances, positions, the ledger and the admin analytics
+must match the committed transactions afterwards.
+"""
+
+import threading
+from decimal import Decimal
+
+import pytest
+
+from main import app, db, User, Company, PortfolioItem, Transaction
+
+
+pytestmark = pytest.mark.slow
+
+TOKEN = 'concurrency-token'
+PRICE = Decimal('100.00')
+
+
+@pytest.fixture
+def trader(test_db, sample_user, monkeypatch):
+    """User with 100 AAPL shares bought at $100 and a fixed $100 quote."""
+    import main
+    monkeypatch.setattr(main, 'get_latest_close_price', lambda symbol: (float(PRICE), float(PRICE)))
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = sample_user.id
+        sess['user_role'] = sample_user.role
+        sess['csrf_token'] = TOKEN
+    assert client.post('/trade/buy', data={'symbol': 'AAPL', 'quantity': '100',
+                                           'csrf_token': TOKEN}).status_code == 302
+    return sample_user.id
+
+
+def run_parallel(user_id, requests, threads=8):
+    """Send (path, form) requests from `threads` clients at once."""
+    barrier = threading.Barrier(threads)
+    errors = []
+    statuses = []
+
+    def worker(batch):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+            sess['user_role'] = 'user'
+            sess['csrf_token'] = TOKEN
+        barrier.wait()
+        for path, form in batch:
+            try:
+                statuses.append(client.post(path, data=dict(form, csrf_token=TOKEN)).status_code)
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+    pool = [threading.Thread(target=worker, args=(requests[i::threads],)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    assert errors == []
+    return statuses
+
+
+def fresh(model, **filters):
+    db.session.expire_all()
+    return model.query.filter_by(**filters).first()
+
+
+class TestConcurrentTrades:
+    """Invariants that must hold however the requests interleave."""
+
+    def test_parallel_sells_never_oversell(self, trader):
+        """Test 20 parallel sells of 10 shares drain exactly 100 shares."""
+        statuses = run_parallel(trader, [('/trade/sell', {'symbol': 'AAPL', 'quantity': '10'})] * 20)
+
+        assert statuses == [302] * 20
+        company = fresh(Company, symbol='AAPL')
+        assert fresh(PortfolioItem, user_id=trader, company_id=company.id).quantity == 0
+        assert Transaction.query.filter_by(user_id=trader, txn_type='SELL').count() == 10
+        # 10000 - 10000 spent + 10 * 1000 sold
+        assert fresh(User, id=trader).wallet_balance == Decimal('10000.00')
+
+    def test_mixed_load_keeps_books_consistent(self, trader):
+        """Test balance, position, ledger and analytics agree with the history."""
+        from main import check_position_ledger, rebuild_analytics, TransactionTypeStats, AnalyticsTotals
+
+        requests = (
+            [('/trade/buy', {'symbol': 'AAPL', 'quantity': '3'})] * 15
+            + [('/trade/sell', {'symbol': 'AAPL', 'quantity': '7'})] * 15
+            + [('/funds/topup', {'amount': '25.00'})] * 10
+            + [('/dividends/record', {'symbol': 'AAPL', 'amount_per_share': '0.10'})] * 5
+        )
+        run_parallel(trader, requests)
+
+        txns = Transaction.query.filter_by(user_id=trader).all()
+        bought = sum(t.quantity for t in txns if t.txn_type == 'BUY')
+        sold = sum(t.quantity for t in txns if t.txn_type == 'SELL')
+        company = fresh(Company, symbol='AAPL')
+        assert fresh(PortfolioItem, user_id=trader, company_id=company.id).quantity == bought - sold >= 0
+
+        spent = sum(t.total_amount + t.commission_amount for t in txns if t.txn_type == 'BUY')
+        received = sum(t.total_amount - t.commission_amount for t in txns if t.txn_type == 'SELL')
+        dividends = sum(t.total_amount for t in txns if t.txn_type == 'DIVIDEND')
+        expected = Decimal('10000.00') - spent + received + dividends + 10 * Decimal('25.00')
+        assert fresh(User, id=trader).wallet_balance == expected
+
+        assert check_position_ledger() == []
+        incremental = sorted((s.txn_type, s.txn_count, s.quantity) for s in TransactionTypeStats.query.all())
+        transaction_count = fresh(AnalyticsTotals, id=1).transaction_count
+        rebuild_analytics()
+        db.session.expire_all()
+        assert sorted((s.txn_type, s.txn_count, s.quantity) for s in TransactionTypeStats.query.all()) == incremental
+        assert transaction_count == len(txns)
+
+    def test_stale_write_is_retried(self, trader):
+        """Test an update based on an outdated row fails the version check and is re-run."""
+        from main import run_in_transaction
+
+        attempts = []
+        table = User.__table__
+
+        def top_up():
+            attempts.append(1)
+            # Plain read, no lock: only the version column can catch the race
+            user = db.session.get(User, trader, populate_existing=True)
+            if len(attempts) == 1:
+                # Another writer commits between our read and our write
+                with db.engine.begin() as conn:
+                    conn.execute(table.update().where(table.c.id == trader)
+                                 .values(wallet_balance=table.c.wallet_balance + 1, version=table.c.version + 1))
+            user.wallet_balance = user.wallet_balance + Decimal('5.00')
+
+        before = fresh(User, id=trader).wallet_balance
+        run_in_transaction(top_up)
+
+        assert len(attempts) == 2
+        assert fresh(User, id=trader).wallet_balance == before + Decimal('6.00')
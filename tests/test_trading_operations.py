@@ -265,6 +265,51 @@ class TestCommissionCalculations:
         txn = Transaction.query.filter_by(txn_type='SELL').order_by(Transaction.created_at.desc()).first()
         assert txn.commission_amount > 0
 
+    def test_tiered_commission_by_notional(self, test_db, sample_broker):
+        """Test larger orders fall into cheaper notional tiers."""
+        from main import CommissionTier, calculate_commission, get_active_broker
+        test_db.session.add_all([
+            CommissionTier(broker_id=sample_broker.id, basis='notional', min_amount=Decimal('10000'),
+                           commission_rate=Decimal('0.25')),
+            CommissionTier(broker_id=sample_broker.id, basis='notional', min_amount=Decimal('100000'),
+                           commission_rate=Decimal('0.10')),
+        ])
+        test_db.session.commit()
+        broker = get_active_broker()
+        
+        assert calculate_commission(Decimal('9999.00'), broker) == Decimal('50.00')
+        assert calculate_commission(Decimal('10000.00'), broker) == Decimal('25.00')
+        assert calculate_commission(Decimal('200000.00'), broker) == Decimal('200.00')
+        # A Broker row gives the same answer as the cached schedule
+        assert calculate_commission(Decimal('10000.00'), sample_broker) == Decimal('25.00')
+    
+    def test_tiered_commission_by_quantity(self, test_db, sample_broker):
+        """Test share-count tiers use the order quantity."""
+        from main import CommissionTier, calculate_commission, get_active_broker
+        test_db.session.add(CommissionTier(broker_id=sample_broker.id, basis='quantity', min_amount=Decimal('500'),
+                                           commission_rate=Decimal('0.20')))
+        test_db.session.commit()
+        broker = get_active_broker()
+        
+        assert calculate_commission(Decimal('1000.00'), broker, quantity=100) == Decimal('5.00')
+        assert calculate_commission(Decimal('1000.00'), broker, quantity=500) == Decimal('2.00')
+    
+    def test_description_shows_tier_rate(self, trading_client, test_db, sample_broker):
+        """Test transactions priced by a tier describe the tier's rate, not the base rate."""
+        from main import CommissionTier
+        test_db.session.add(CommissionTier(broker_id=sample_broker.id, basis='quantity', min_amount=Decimal('50'),
+                                           commission_rate=Decimal('0.20')))
+        test_db.session.commit()
+        post_form(trading_client, '/trade/buy', symbol='AAPL', quantity='10')
+        post_form(trading_client, '/trade/buy', symbol='AAPL', quantity='50')
+        post_form(trading_client, '/trade/sell', symbol='AAPL', quantity='50')
+        
+        txns = Transaction.query.order_by(Transaction.id).all()
+        assert [t.commission_amount for t in txns] == [Decimal('5.00'), Decimal('10.00'), Decimal('10.00')]
+        assert '(0.50% commission)' in txns[0].description
+        assert '(0.20% commission)' in txns[1].description
+        assert '(0.20% commission)' in txns[2].description
+
 
 class TestBrokerIntegration:
     """Test cases for broker management."""
@@ -288,6 +333,49 @@ class TestBrokerIntegration:
         txn = Transaction.query.filter_by(txn_type='BUY').first()
         assert txn.broker_id == sample_broker.id
     
+    def test_active_broker_is_cached(self, test_db, sample_broker, count_queries):
+        """Test repeated lookups are served without querying the database."""
+        from main import get_active_broker
+        first = get_active_broker()
+        
+        with count_queries() as statements:
+            second = get_active_broker()
+        
+        assert statements == []
+        assert second is first
+        assert second.id == sample_broker.id
+    
+    def test_broker_writes_invalidate_cache(self, admin_client, test_db, sample_broker):
+        """Test admin broker and tier writes are visible to the next lookup."""
+        from main import get_active_broker, calculate_commission
+        assert get_active_broker().id == sample_broker.id
+        with admin_client.session_transaction() as sess:
+            sess['csrf_token'] = 'broker-token'
+        
+        admin_client.post('/admin/brokers', data={'name': 'Cheaper', 'commission_rate': '0.10',
+                                                  'csrf_token': 'broker-token'})
+        cheaper = get_active_broker()
+        assert cheaper.name == 'Cheaper'
+        
+        response = admin_client.post(f'/admin/brokers/{cheaper.id}/tiers', data={
+            'basis': 'notional', 'min_amount': '5000', 'commission_rate': '0.05', 'csrf_token': 'broker-token'})
+        assert response.status_code == 302
+        assert calculate_commission(Decimal('5000.00'), get_active_broker()) == Decimal('2.50')
+    
+    def test_commission_tier_rejects_mixed_basis(self, admin_client, test_db, sample_broker):
+        """Test a broker's tiers cannot mix notional and quantity thresholds."""
+        from main import CommissionTier
+        with admin_client.session_transaction() as sess:
+            sess['csrf_token'] = 'broker-token'
+        form = {'min_amount': '100', 'commission_rate': '0.20', 'csrf_token': 'broker-token'}
+        
+        admin_client.post(f'/admin/brokers/{sample_broker.id}/tiers', data=dict(form, basis='notional'))
+        admin_client.post(f'/admin/brokers/{sample_broker.id}/tiers', data=dict(form, basis='quantity'))
+        admin_client.post(f'/admin/brokers/{sample_broker.id}/tiers', data=dict(form, basis='volume'))
+        
+        assert [t.basis for t in CommissionTier.query.all()] == ['notional']
+        assert b'Add tier' in admin_client.get('/admin').data
+    
     def test_admin_can_add_broker(self, admin_client, test_db):
         """Test admin can add new broker."""
         data = {
@@ -345,3 +433,554 @@ class TestTransactionHistory:
         assert response.status_code == 200
         # Should contain transaction information
         assert b'transaction' in response.data.lower() or b'BUY' in response.data or b'SELL' in response.data
+
+    @pytest.fixture
+    def history(self, test_db, sample_user, sample_admin):
+        """30 transactions over 3 days, in pairs sharing a timestamp, plus one of another user."""
+        from datetime import datetime, timedelta
+        companies = [Company(symbol='AAPL'), Company(symbol='MSFT')]
+        test_db.session.add_all(companies)
+        test_db.session.flush()
+        start = datetime(2024, 3, 1, 9, 30)
+        test_db.session.add_all([
+            Transaction(user_id=sample_user.id, company_id=companies[i % 2].id,
+                        txn_type='BUY' if i % 3 else 'SELL', quantity=i + 1, price=Decimal('10.00'),
+                        total_amount=Decimal(10 * (i + 1)), created_at=start + timedelta(hours=5 * (i // 2)))
+            for i in range(30)
+        ])
+        test_db.session.add(Transaction(user_id=sample_admin.id, company_id=companies[0].id, txn_type='BUY',
+                                        quantity=1, price=Decimal('1.00'), total_amount=Decimal('1.00'),
+                                        created_at=start))
+        test_db.session.commit()
+    
+    def test_keyset_pages_cover_history_once(self, authenticated_client, history):
+        """Test following next_cursor returns every row once, newest first, across equal timestamps."""
+        seen, cursor = [], None
+        while True:
+            response = authenticated_client.get('/transactions/history', query_string={
+                'limit': 7, **({'cursor': cursor} if cursor else {})})
+            assert response.status_code == 200
+            body = response.get_json()
+            seen.extend(body['transactions'])
+            cursor = body['next_cursor']
+            if cursor is None:
+                break
+        
+        assert len(seen) == 30
+        assert len({t['id'] for t in seen}) == 30
+        keys = [(t['created_at'], t['id']) for t in seen]
+        assert keys == sorted(keys, reverse=True)
+    
+    def test_history_filters(self, authenticated_client, history):
+        """Test symbol, type and inclusive date range filters combine."""
+        body = authenticated_client.get('/transactions/history', query_string={
+            'symbol': 'msft', 'type': 'buy', 'start': '2024-03-02', 'end': '2024-03-02', 'limit': 100}).get_json()
+        
+        assert body['transactions']
+        assert all(t['symbol'] == 'MSFT' and t['type'] == 'BUY' and t['created_at'].startswith('2024-03-02')
+                   for t in body['transactions'])
+        assert body['next_cursor'] is None
+    
+    def test_history_rejects_bad_parameters(self, authenticated_client, history):
+        """Test malformed cursors and filters are a 400, not a server error."""
+        for params in ({'cursor': 'not-a-cursor'}, {'type': 'GIFT'}, {'start': '03/01/2024'},
+                       {'start': '2024-03-05', 'end': '2024-03-01'}):
+            response = authenticated_client.get('/transactions/history', query_string=params)
+            assert response.status_code == 400
+            assert response.get_json()['errors']
+    
+    def test_history_csv_streams_in_batches(self, authenticated_client, history, monkeypatch):
+        """Test the CSV export returns every matching row across several keyset batches."""
+        import csv
+        import main
+        monkeypatch.setattr(main, 'HISTORY_CSV_BATCH', 4)
+        batches = []
+        query = main.transaction_history_query
+        monkeypatch.setattr(main, 'transaction_history_query', lambda *a: batches.append(a) or query(*a))
+        
+        response = authenticated_client.get('/transactions/history.csv', query_string={'symbol': 'AAPL'})
+        rows = list(csv.DictReader(response.get_data(as_text=True).splitlines()))
+        
+        assert response.mimetype == 'text/csv'
+        assert len(rows) == 15
+        assert {row['symbol'] for row in rows} == {'AAPL'}
+        assert len(batches) == 4
+    
+    def test_admin_history_spans_users(self, admin_client, history, sample_user):
+        """Test the admin history covers every user and filters by user_id."""
+        everyone = admin_client.get('/admin/transactions', query_string={'limit': 100}).get_json()
+        one = admin_client.get('/admin/transactions', query_string={'limit': 100, 'user_id': sample_user.id})
+        
+        assert len(everyone['transactions']) == 31
+        assert len(one.get_json()['transactions']) == 30
+    
+    def test_history_requires_admin_for_all_users(self, authenticated_client, history):
+        """Test regular users cannot read the cross-user history."""
+        assert authenticated_client.get('/admin/transactions').status_code == 403
+
+
+@pytest.fixture
+def trading_client(authenticated_client, monkeypatch):
+    """Authenticated client with a CSRF token and a fixed $100 quote."""
+    import main
+    monkeypatch.setattr(main, 'get_latest_close_price', lambda symbol: (100.0, 99.0))
+    with authenticated_client.session_transaction() as sess:
+        sess['csrf_token'] = 'trading-token'
+    return authenticated_client
+
+
+def post_form(client, path, **data):
+    """Submit a trade form and expect the redirect back to the dashboard."""
+    response = client.post(path, data=dict(data, csrf_token='trading-token'))
+    assert response.status_code == 302
+
+
+class TestAdminAnalytics:
+    """Test cases for the incrementally maintained admin analytics."""
+    
+    def test_trades_update_aggregates(self, trading_client, test_db, sample_broker):
+        """Test buys, sells and dividends are folded into the aggregate tables."""
+        from main import TransactionTypeStats, SymbolStats, AnalyticsTotals
+        post_form(trading_client, '/trade/buy', symbol='AAPL', quantity='10')
+        post_form(trading_client, '/trade/buy', symbol='MSFT', quantity='2')
+        post_form(trading_client, '/trade/sell', symbol='AAPL', quantity='4')
+        post_form(trading_client, '/dividends/record', symbol='AAPL', amount_per_share='0.50')
+        
+        types = {s.txn_type: s for s in TransactionTypeStats.query.all()}
+        assert types['BUY'].txn_count == 2
+        assert types['BUY'].quantity == 12
+        assert types['SELL'].total_amount == Decimal('400.00')
+        assert types['DIVIDEND'].total_amount == Decimal('3.00')
+        
+        aapl = Company.query.filter_by(symbol='AAPL').first()
+        assert test_db.session.get(SymbolStats, aapl.id).quantity == 10 + 4 + 6
+        
+        totals = test_db.session.get(AnalyticsTotals, 1)
+        assert totals.transaction_count == 4
+        assert totals.total_volume == 16
+        expected_commission = sum(Decimal(t.commission_amount) for t in Transaction.query.all())
+        assert totals.total_commission == expected_commission
+    
+    def test_rebuild_matches_incremental(self, trading_client, test_db, sample_broker):
+        """Test rebuilding from history reproduces the maintained aggregates."""
+        from main import TransactionTypeStats, SymbolStats, AnalyticsTotals, rebuild_analytics
+        post_form(trading_client, '/trade/buy', symbol='AAPL', quantity='7')
+        post_form(trading_client, '/trade/sell', symbol='AAPL', quantity='3')
+        
+        def snapshot():
+            test_db.session.expire_all()
+            return (
+                sorted((s.txn_type, s.txn_count, s.quantity, s.total_amount, s.commission_amount)
+                       for s in TransactionTypeStats.query.all()),
+                sorted((s.company_id, s.quantity, s.total_value) for s in SymbolStats.query.all()),
+                [(t.transaction_count, t.total_commission, t.total_volume) for t in AnalyticsTotals.query.all()],
+            )
+        
+        incremental = snapshot()
+        report = rebuild_analytics()
+        assert report == {'transaction_types': 2, 'symbols': 1, 'transactions': 2}
+        assert snapshot() == incremental
+    
+    def test_admin_dashboard_reads_aggregates(self, admin_client, test_db, sample_transactions, count_queries):
+        """Test the admin page shows rebuilt aggregates without loading transactions."""
+        from main import rebuild_analytics
+        rebuild_analytics()
+        
+        with count_queries() as statements:
+            response = admin_client.get('/admin')
+        
+        assert response.status_code == 200
+        assert b'11.50' in response.data  # 7.50 + 4.00 commission
+        # Only the 25 most recent rows are selected from the transaction table
+        scans = [s for s in statements if 'FROM "transaction"' in s and 'LIMIT' not in s]
+        assert scans == []
+
+
+class TestPositionLedger:
+    """Test cases for the per-position ledger and its consistency checker."""
+    
+    def ledger(self, test_db, symbol):
+        from main import PositionLedger
+        test_db.session.expire_all()
+        company = Company.query.filter_by(symbol=symbol).first()
+        return PositionLedger.query.filter_by(company_id=company.id).one()
+    
+    def test_buy_and_sell_use_average_cost(self, trading_client, test_db, monkeypatch):
+        """Test sales book proceeds minus average cost as realized P&L."""
+        import main
+        post_form(trading_client, '/trade/buy', symbol='AAPL', quantity='10')
+        monkeypatch.setattr(main, 'get_latest_close_price', lambda symbol: (130.0, 100.0))
+        post_form(trading_client, '/trade/buy', symbol='AAPL', quantity='10')
+        post_form(trading_client, '/trade/sell', symbol='AAPL', quantity='5')
+        
+        row = self.ledger(test_db, 'AAPL')
+        # Average cost (1000 + 1300) / 20 = 115; sold 5 at 130
+        assert row.quantity == 15
+        assert abs(Decimal(str(row.cost_basis)) - Decimal('1725')) < Decimal('0.01')
+        assert abs(Decimal(str(row.realized_pnl)) - Decimal('75')) < Decimal('0.01')
+    
+    def test_dividends_and_commissions_accumulate(self, trading_client, test_db, sample_broker):
+        """Test dividends and broker commissions are tracked per position."""
+        post_form(trading_client, '/trade/buy', symbol='MSFT', quantity='4')
+        post_form(trading_client, '/dividends/record', symbol='MSFT', amount_per_share='1.25')
+        
+        row = self.ledger(test_db, 'MSFT')
+        assert Decimal(str(row.dividends)) == Decimal('5.00')
+        assert Decimal(str(row.commissions)) == Transaction.query.filter_by(txn_type='BUY').one().commission_amount
+    
+    def test_dashboard_realized_profit_from_ledger(self, trading_client, test_db, sample_user):
+        """Test the dashboard totals match the ledger after trading."""
+        from main import get_ledger_totals
+        post_form(trading_client, '/trade/buy', symbol='AAPL', quantity='10')
+        post_form(trading_client, '/trade/sell', symbol='AAPL', quantity='10')
+        post_form(trading_client, '/trade/buy', symbol='AAPL', quantity='2')
+        post_form(trading_client, '/dividends/record', symbol='AAPL', amount_per_share='2.00')
+        
+        totals = get_ledger_totals(sample_user.id)
+        assert totals['realized_pnl'] == Decimal('0')
+        assert totals['dividends'] == Decimal('4.00')
+        assert trading_client.get('/dashboard').status_code == 200
+    
+    def test_checker_accepts_traded_history(self, trading_client, test_db, sample_broker, monkeypatch):
+        """Test replaying history reproduces the ledger maintained by trades."""
+        import main
+        from main import check_position_ledger
+        for price, symbol, side, quantity in [(100.0, 'AAPL', 'buy', 7), (111.0, 'AAPL', 'buy', 3),
+                                              (97.5, 'AAPL', 'sell', 4), (50.0, 'TSLA', 'buy', 9),
+                                              (55.0, 'TSLA', 'sell', 9)]:
+            monkeypatch.setattr(main, 'get_latest_close_price', lambda s, p=price: (p, p))
+            post_form(trading_client, f'/trade/{side}', symbol=symbol, quantity=str(quantity))
+        
+        assert check_position_ledger() == []
+    
+    def test_checker_reports_and_rebuild_repairs(self, trading_client, test_db):
+        """Test a tampered ledger row is reported and fixed by a rebuild."""
+        from main import PositionLedger, check_position_ledger, rebuild_position_ledger
+        post_form(trading_client, '/trade/buy', symbol='AAPL', quantity='10')
+        PositionLedger.query.update({'quantity': 99})
+        test_db.session.commit()
+        
+        mismatches = check_position_ledger()
+        assert len(mismatches) == 1
+        assert mismatches[0]['expected']['quantity'] == 10
+        
+        rebuild_position_ledger()
+        test_db.session.commit()
+        assert check_position_ledger() == []
+    
+    def test_sell_without_ledger_row_rebuilds_position(self, trading_client, test_db, sample_portfolio_item,
+                                                       sample_user):
+        """Test positions that predate the ledger are rebuilt from their history on the next sale."""
+        from main import check_position_ledger
+        test_db.session.add(Transaction(user_id=sample_user.id, company_id=sample_portfolio_item.company_id,
+                                        txn_type='BUY', quantity=10, price=Decimal('150.00'),
+                                        total_amount=Decimal('1500.00')))
+        test_db.session.commit()
+        
+        post_form(trading_client, '/trade/sell', symbol='AAPL', quantity='4')
+        
+        row = self.ledger(test_db, 'AAPL')
+        assert row.quantity == 6
+        assert abs(Decimal(str(row.realized_pnl)) - Decimal('-200')) < Decimal('0.01')
+        assert check_position_ledger() == []
+    
+    @pytest.mark.parametrize('path, form, quantity', [
+        ('/trade/buy', {'symbol': 'AAPL', 'quantity': '5'}, 15),
+        ('/dividends/record', {'symbol': 'AAPL', 'amount_per_share': '1.00'}, 10),
+    ])
+    def test_buy_and_dividend_without_ledger_row_rebuild_position(self, trading_client, test_db,
+                                                                  sample_portfolio_item, sample_user,
+                                                                  path, form, quantity):
+        """Test buys and dividends on positions that predate the ledger keep their earlier history."""
+        from main import check_position_ledger
+        test_db.session.add(Transaction(user_id=sample_user.id, company_id=sample_portfolio_item.company_id,
+                                        txn_type='BUY', quantity=10, price=Decimal('150.00'),
+                                        total_amount=Decimal('1500.00')))
+        test_db.session.commit()
+        
+        post_form(trading_client, path, **form)
+        
+        assert self.ledger(test_db, 'AAPL').quantity == quantity
+        assert check_position_ledger() == []
+
+
+class TestBulkOrders:
+    """Test cases for the all-or-nothing basket endpoint."""
+    
+    @pytest.fixture
+    def quotes(self, trading_client, monkeypatch):
+        """Record every batched quote lookup and serve fixed prices."""
+        import main
+        calls = []
+        prices = {'AAPL': (100.0, 99.0), 'MSFT': (50.0, 49.0), 'TSLA': (20.0, 21.0)}
+        
+        def fake_prices(symbols):
+            symbols = list(symbols)
+            calls.append(symbols)
+            return {s: prices[s] for s in symbols if s in prices}
+        
+        monkeypatch.setattr(main, 'get_latest_close_prices', fake_prices)
+        return calls
+    
+    def post_basket(self, client, orders, token='trading-token'):
+        return client.post('/trade/bulk', json={'orders': orders}, headers={'X-CSRF-Token': token})
+    
+    def test_basket_fills_all_legs_with_one_quote_lookup(self, trading_client, test_db, sample_user, quotes,
+                                                         sample_broker, monkeypatch):
+        """Test a rebalance is priced once, sells before buys and reports each leg."""
+        import main
+        post_form(trading_client, '/trade/buy', symbol='AAPL', quantity='10')
+        broker_lookups = []
+        real_get_active_broker = main.get_active_broker
+        monkeypatch.setattr(main, 'get_active_broker',
+                            lambda: broker_lookups.append(1) or real_get_active_broker())
+        
+        response = self.post_basket(trading_client, [
+            {'symbol': 'MSFT', 'side': 'buy', 'quantity': 4},
+            {'symbol': 'AAPL', 'side': 'sell', 'quantity': 6},
+            {'symbol': 'TSLA', 'side': 'buy', 'quantity': 5},
+        ])
+        
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['status'] == 'filled'
+        assert [leg['leg'] for leg in body['legs']] == [0, 1, 2]
+        assert body['legs'][1]['total'] == 600.0
+        assert len(quotes) == 1 and sorted(quotes[0]) == ['AAPL', 'MSFT', 'TSLA']
+        assert len(broker_lookups) == 1
+        sides = [t.txn_type for t in Transaction.query.order_by(Transaction.id).all()]
+        assert sides == ['BUY', 'SELL', 'BUY', 'BUY']
+        test_db.session.refresh(sample_user)
+        assert float(sample_user.wallet_balance) == body['wallet_balance']
+    
+    def test_rejected_leg_rolls_back_whole_basket(self, trading_client, test_db, sample_user, quotes):
+        """Test nothing is booked when one leg cannot be filled."""
+        post_form(trading_client, '/trade/buy', symbol='AAPL', quantity='10')
+        test_db.session.refresh(sample_user)
+        balance = sample_user.wallet_balance
+        txn_count = Transaction.query.count()
+        
+        response = self.post_basket(trading_client, [
+            {'symbol': 'MSFT', 'side': 'buy', 'quantity': 1},
+            {'symbol': 'AAPL', 'side': 'sell', 'quantity': 11},
+        ])
+        
+        assert response.status_code == 409
+        assert response.get_json()['errors'] == [{'leg': 1, 'error': 'Not enough shares to sell.'}]
+        test_db.session.expire_all()
+        assert Transaction.query.count() == txn_count
+        assert User.query.get(sample_user.id).wallet_balance == balance
+        assert Company.query.filter_by(symbol='MSFT').first() is None
+    
+    def test_invalid_legs_are_reported(self, trading_client, quotes):
+        """Test validation errors name the offending legs before any quote is fetched."""
+        response = self.post_basket(trading_client, [
+            {'symbol': 'AAPL', 'side': 'hold', 'quantity': 1},
+            {'symbol': '', 'side': 'buy', 'quantity': 1},
+            {'symbol': 'MSFT', 'side': 'buy', 'quantity': '-3'},
+        ])
+        
+        assert response.status_code == 400
+        assert [e['leg'] for e in response.get_json()['errors']] == [0, 1, 2]
+        assert quotes == []
+    
+    @pytest.mark.parametrize('body', [[{'symbol': 'AAPL', 'side': 'buy', 'quantity': 1}], 'orders', None])
+    def test_non_object_body_is_rejected(self, trading_client, quotes, body):
+        """Test valid JSON that is not an object gets the same 400 rejection, not a 500."""
+        response = trading_client.post('/trade/bulk', json=body, headers={'X-CSRF-Token': 'trading-token'})
+        
+        assert response.status_code == 400
+        assert response.get_json()['status'] == 'rejected'
+        assert quotes == []
+    
+    def test_unpriced_symbol_rejects_basket(self, trading_client, quotes):
+        """Test a symbol without a quote rejects the basket."""
+        response = self.post_basket(trading_client, [{'symbol': 'NOPE', 'side': 'buy', 'quantity': 1}])
+        
+        assert response.status_code == 422
+        assert Transaction.query.count() == 0
+    
+    def test_basket_requires_csrf_header(self, trading_client, quotes):
+        """Test the JSON endpoint enforces the CSRF token."""
+        response = self.post_basket(trading_client, [{'symbol': 'AAPL', 'side': 'buy', 'quantity': 1}],
+                                    token='wrong')
+        assert response.status_code == 400
+    
+    def test_batched_quotes_from_one_download(self, monkeypatch):
+        """Test latest closes are read per symbol from a single multi-ticker download."""
+        import pandas as pd
+        import yfinance as yf
+        from main import get_latest_close_prices
+        
+        downloads = []
+        index = pd.date_range('2024-01-01', periods=3)
+        columns = pd.MultiIndex.from_product([['Close', 'Open'], ['AAPL', 'MSFT', 'NODATA']])
+        frame = pd.DataFrame([[1, 10, None, 0, 0, 0], [2, 20, None, 0, 0, 0], [3, None, None, 0, 0, 0]],
+                             index=index, columns=columns, dtype=float)
+        
+        def fake_download(symbols, start, end):
+            downloads.append(symbols)
+            return frame
+        
+        monkeypatch.setattr(yf, 'download', fake_download)
+        prices = get_latest_close_prices(['MSFT', 'AAPL', 'NODATA', 'AAPL'])
+        
+        assert downloads == [['AAPL', 'MSFT', 'NODATA']]
+        assert prices == {'AAPL': (3.0, 2.0), 'MSFT': (20.0, 10.0)}
+
+
+class TestBulkDividends:
+    """Test cases for paying a dividend to every holder of a company."""
+    
+    @pytest.fixture
+    def holders(self, test_db, sample_company):
+        """Five users holding 1..5 AAPL shares, plus one with an emptied position."""
+        users = [User(email=f'holder{i}@example.com', username=f'holder{i}', password_hash='x',
+                      wallet_balance=Decimal('100.00')) for i in range(6)]
+        test_db.session.add_all(users)
+        test_db.session.flush()
+        test_db.session.add_all([PortfolioItem(user_id=u.id, company_id=sample_company.id, quantity=i,
+                                               average_buy_price=Decimal('10.00')) for i, u in enumerate(users)])
+        test_db.session.commit()
+        return [u.id for u in users]
+    
+    def pay(self, client, company, amount, **form):
+        with client.session_transaction() as sess:
+            sess['csrf_token'] = 'dividend-token'
+        return client.post(f'/admin/companies/{company.id}/dividend',
+                           data=dict(form, amount_per_share=amount, csrf_token='dividend-token'))
+    
+    def test_pays_every_holder(self, admin_client, test_db, sample_company, holders):
+        """Test wallets, dividends, transactions, ledger and analytics after a payout."""
+        from main import Dividend, DividendPayout, AnalyticsTotals, check_position_ledger, rebuild_analytics
+        from main import TransactionTypeStats
+        response = self.pay(admin_client, sample_company, '0.125', payable_date='2024-06-30')
+        assert response.status_code == 302
+        # Second payout goes through the existing ledger rows
+        self.pay(admin_client, sample_company, '1.00')
+        
+        test_db.session.expire_all()
+        balances = [test_db.session.get(User, uid).wallet_balance for uid in holders]
+        # 0.125 * n rounded to cents, plus 1.00 * n
+        assert balances == [Decimal('100.00'), Decimal('101.12'), Decimal('102.25'), Decimal('103.38'),
+                            Decimal('104.50'), Decimal('105.62')]
+        first = DividendPayout.query.order_by(DividendPayout.id).first()
+        assert (first.holder_count, first.total_amount) == (5, Decimal('1.87'))
+        assert str(first.payable_date) == '2024-06-30'
+        assert Dividend.query.filter_by(payout_id=first.id).count() == 5
+        assert Transaction.query.filter_by(txn_type='DIVIDEND').count() == 10
+        assert check_position_ledger() == []
+        
+        incremental = test_db.session.get(TransactionTypeStats, 'DIVIDEND')
+        assert (incremental.txn_count, incremental.total_amount) == (10, Decimal('16.87'))
+        assert test_db.session.get(AnalyticsTotals, 1).transaction_count == 10
+        rebuild_analytics()
+        assert test_db.session.get(TransactionTypeStats, 'DIVIDEND').total_amount == Decimal('16.87')
+    
+    def test_statement_count_independent_of_holders(self, test_db, sample_company, holders, count_queries):
+        """Test a payout issues the same statements for 5 or 50 holders."""
+        from main import pay_company_dividend, Company
+        other = Company(symbol='MSFT', name='Microsoft')
+        test_db.session.add(other)
+        test_db.session.flush()
+        extra = [User(email=f'extra{i}@example.com', username=f'extra{i}', password_hash='x') for i in range(50)]
+        test_db.session.add_all(extra)
+        test_db.session.flush()
+        test_db.session.add_all([PortfolioItem(user_id=u.id, company_id=other.id, quantity=2) for u in extra])
+        test_db.session.commit()
+        
+        with count_queries() as few:
+            pay_company_dividend(sample_company.id, Decimal('0.10'))
+        with count_queries() as many:
+            pay_company_dividend(other.id, Decimal('0.10'))
+        test_db.session.commit()
+        
+        assert len(few) == len(many)
+        assert Transaction.query.filter_by(company_id=other.id).count() == 50
+    
+    def test_no_holders_is_rejected(self, admin_client, test_db, sample_company):
+        """Test a company nobody holds is rejected without leaving a payout behind."""
+        from main import DividendPayout
+        response = self.pay(admin_client, sample_company, '0.50')
+        
+        assert response.status_code == 302
+        assert DividendPayout.query.count() == 0
+    
+    def test_invalid_amount_is_rejected(self, admin_client, test_db, sample_company, holders):
+        """Test non-positive or malformed amounts are not paid."""
+        for amount in ('0', '-1', 'abc'):
+            self.pay(admin_client, sample_company, amount)
+        
+        assert Transaction.query.count() == 0
+
+
+class TestDataExport:
+    """Test cases for the streamed CSV and Parquet exports."""
+    
+    @pytest.fixture
+    def traded(self, trading_client, test_db, sample_admin, monkeypatch):
+        """Seven trades and a dividend for the user, and one trade by someone else."""
+        import main
+        monkeypatch.setattr(main, 'EXPORT_CHUNK_ROWS', 3)
+        for symbol, side, quantity in [('AAPL', 'buy', 10), ('MSFT', 'buy', 5), ('AAPL', 'sell', 4),
+                                       ('TSLA', 'buy', 1), ('MSFT', 'buy', 2), ('TSLA', 'sell', 1),
+                                       ('AAPL', 'buy', 3)]:
+            post_form(trading_client, f'/trade/{side}', symbol=symbol, quantity=str(quantity))
+        post_form(trading_client, '/dividends/record', symbol='AAPL', amount_per_share='0.25')
+        test_db.session.add(Transaction(user_id=sample_admin.id, company_id=1, txn_type='BUY', quantity=1,
+                                        price=Decimal('1.00'), total_amount=Decimal('1.00')))
+        test_db.session.commit()
+        return trading_client
+    
+    def test_transactions_csv_is_streamed_in_chunks(self, traded):
+        """Test the CSV holds only the user's rows, oldest first, produced chunk by chunk."""
+        import csv
+        response = traded.get('/export/transactions.csv', buffered=False)
+        chunks = list(response.response)
+        response.close()
+        rows = list(csv.DictReader(b''.join(chunks).decode().splitlines()))
+        
+        assert response.mimetype == 'text/csv'
+        assert len(chunks) > 3
+        assert [row['type'] for row in rows] == ['BUY', 'BUY', 'SELL', 'BUY', 'BUY', 'SELL', 'BUY', 'DIVIDEND']
+        assert rows[2]['symbol'] == 'AAPL' and rows[2]['total_amount'] == '400.00'
+    
+    def test_portfolio_parquet_keeps_types(self, traded):
+        """Test the Parquet export is readable with exact decimals and the ledger totals."""
+        import io
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        response = traded.get('/export/portfolio.parquet')
+        table = pq.read_table(io.BytesIO(response.data))
+        rows = {row['symbol']: row for row in table.to_pylist()}
+        
+        assert response.mimetype == 'application/vnd.apache.parquet'
+        assert table.schema.field('average_buy_price').type == pa.decimal128(12, 2)
+        assert rows['AAPL']['quantity'] == 9
+        assert rows['AAPL']['dividends'] == Decimal('2.2500')
+        assert rows['TSLA']['realized_pnl'] == Decimal('0.0000')
+    
+    def test_dividends_export_in_both_formats(self, traded):
+        """Test dividends export as CSV and Parquet with the same content."""
+        import csv
+        import io
+        import pyarrow.parquet as pq
+        rows = list(csv.DictReader(traded.get('/export/dividends.csv').get_data(as_text=True).splitlines()))
+        table = pq.read_table(io.BytesIO(traded.get('/export/dividends.parquet').data)).to_pylist()
+        
+        assert [(r['symbol'], r['total_amount']) for r in rows] == [('AAPL', '2.25')]
+        assert [(r['symbol'], r['total_amount']) for r in table] == [('AAPL', Decimal('2.25'))]
+    
+    def test_empty_parquet_export_is_valid(self, authenticated_client):
+        """Test an export with no rows is still a readable file with the schema."""
+        import io
+        import pyarrow.parquet as pq
+        table = pq.read_table(io.BytesIO(authenticated_client.get('/export/transactions.parquet').data))
+        
+        assert table.num_rows == 0
+        assert 'commission_amount' in table.column_names
+    
+    def test_unknown_export_is_not_found(self, authenticated_client):
+        """Test unknown datasets and formats are a 404."""
+        assert authenticated_client.get('/export/wallets.csv').status_code == 404
+        assert authenticated_client.get('/export/transactions.xlsx').status_code == 404
@@ -137,6 +137,32 @@ class TestAdminRoutes:
         response = admin_client.get('/admin')
         assert response.status_code == 200
     
+    def test_admin_dashboard_queries_do_not_grow_with_transactions(self, admin_client, test_db,
+                                                                   count_queries, assert_max_queries):
+        """Test admin dashboard loads transaction users and companies eagerly."""
+        from decimal import Decimal
+        from main import User, Company, Transaction
+        
+        def add_trades(start, count):
+            for i in range(start, start + count):
+                user = User(email=f'n{i}@example.com', username=f'n{i}', password_hash='x')
+                company = Company(symbol=f'ADM{i}', name=f'Company {i}')
+                test_db.session.add_all([user, company])
+                test_db.session.flush()
+                test_db.session.add(Transaction(user_id=user.id, company_id=company.id, txn_type='BUY',
+                                                quantity=1, price=Decimal('10.00'), total_amount=Decimal('10.00')))
+            test_db.session.commit()
+        
+        add_trades(0, 1)
+        with count_queries() as baseline:
+            assert admin_client.get('/admin').status_code == 200
+        
+        add_trades(1, 10)
+        with assert_max_queries(len(baseline)):
+            response = admin_client.get('/admin')
+        assert response.status_code == 200
+        assert b'ADM10' in response.data
+    
     def test_add_broker_route(self, admin_client):
         """Test add broker route."""
         data = {
@@ -159,6 +185,74 @@ class TestAdminRoutes:
         response = admin_client.post('/admin/companies', data=data, follow_redirects=True)
         assert response.status_code == 200
 
+    def test_sentiment_health_requires_admin(self, authenticated_client):
+        """Test sentiment provider health is admin-only."""
+        response = authenticated_client.get('/admin/sentiment-health', follow_redirects=False)
+        assert response.status_code in [302, 403]
+
+    def test_sentiment_health_reports_breakers(self, admin_client):
+        """Test sentiment provider health exposes breaker state and latency."""
+        response = admin_client.get('/admin/sentiment-health')
+        assert response.status_code == 200
+        finviz = response.get_json()['finviz_finvader']
+        assert finviz['state'] in ['closed', 'open', 'half_open']
+        assert 'buckets' in finviz['latency_seconds']
+
+    def test_rate_limits_requires_admin(self, authenticated_client):
+        """Test rate limiter metrics are admin-only."""
+        response = authenticated_client.get('/admin/rate-limits', follow_redirects=False)
+        assert response.status_code in [302, 403]
+
+    def test_rate_limits_reports_queue_waits(self, admin_client):
+        """Test rate limiter metrics expose per-host queue waits."""
+        import rate_limiter
+        rate_limiter.acquire('finance.yahoo.com')
+        response = admin_client.get('/admin/rate-limits')
+        assert response.status_code == 200
+        yahoo = response.get_json()['finance.yahoo.com']
+        assert yahoo['wait_seconds']['interactive']['count'] >= 1
+
+    def test_market_data_requires_admin(self, authenticated_client):
+        """Test market-data fetch metrics are admin-only."""
+        response = authenticated_client.get('/admin/market-data', follow_redirects=False)
+        assert response.status_code in [302, 403]
+
+    def test_market_data_reports_attempts(self, admin_client, monkeypatch):
+        """Test market-data metrics expose the serving provider and attempt timings."""
+        from datetime import datetime
+        import market_data
+        monkeypatch.setattr(market_data, '_providers', None)
+        market_data.configure('replay')
+        market_data.history('AAPL', datetime(2024, 1, 1), datetime(2024, 2, 1))
+        response = admin_client.get('/admin/market-data')
+        assert response.status_code == 200
+        metrics = response.get_json()
+        assert metrics['providers']['replay']['served'] >= 1
+        assert metrics['recent'][-1]['attempts'][0]['provider'] == 'replay'
+
+
+class TestSymbolSearch:
+    """Test the symbol autocomplete endpoint."""
+
+    def test_companies_and_ticker_index(self, client, test_db, sample_company, monkeypatch):
+        """Test listed companies come first, then matches from the ticker index."""
+        import symbol_index
+        index = symbol_index.SymbolIndex([
+            symbol_index.Listing('AAPL', 'Apple Inc.', 'NMS', 'USA'),
+            symbol_index.Listing('AAP', 'Advance Auto Parts Inc.', 'NYQ', 'USA'),
+        ])
+        monkeypatch.setattr(symbol_index, '_index', index)
+
+        response = client.get('/symbols/search?q=aa')
+        assert response.status_code == 200
+        assert [r['symbol'] for r in response.get_json()] == ['AAPL', 'AAP']
+        assert response.get_json()[0]['exchange'] == 'NASDAQ'
+
+    def test_empty_prefix_and_limit(self, client, test_db, sample_company):
+        """Test an empty query returns nothing and the limit is honoured."""
+        assert client.get('/symbols/search?q=').get_json() == []
+        assert len(client.get('/symbols/search?q=A&limit=1').get_json()) == 1
+
 
 class TestPredictRoute:
     """Test stock prediction route."""
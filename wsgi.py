@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Production WSGI entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The gunicorn profile imports this module once in the master (preload_app)
+and calls preload() before forking, so the model libraries, the VADER
+lexicon, the article dedup index, the ticker index and the stored price
+history are loaded once and shared copy-on-write by every worker.
+"""
+import os
+import time
+
+from main import app, preload_price_history
+
+# Directory holding the stored {SYMBOL}.csv price history
+PRICE_HISTORY_DIR = os.environ.get('PRICE_HISTORY_DIR', os.path.dirname(os.path.abspath(__file__)))
+
+
+def preload(price_history_dir: str = None) -> dict:
+    """
+    Warm everything the request path would otherwise load lazily.
+    Raises NLTKResourceError if the lexicon is not provisioned, so a
+    misconfigured node fails at boot rather than on the first /predict.
+    """
+    started = time.monotonic()
+
+    # Model and market-data libraries used by /predict and the trade routes
+    import sklearn.linear_model
+    import sklearn.preprocessing
+    import sklearn.metrics
+    import yfinance
+    import alpha_vantage.timeseries
+
+    # Lexicon (nltk caches the file) and the shared article index
+    import news_sentiment
+    news_sentiment.ComprehensiveSentimentAnalyzer()
+
+    # Ticker universe for company names and the symbol autocomplete
+    import symbol_index
+    tickers = len(symbol_index.get_index())
+
+    symbols = preload_price_history(price_history_dir or PRICE_HISTORY_DIR)
+    return {
+        'price_history': symbols,
+        'tickers': tickers,
+        'seconds': round(time.monotonic() - started, 2),
+    }
+
+
+if __name__ == '__main__':
+    print(preload())